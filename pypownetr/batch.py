@@ -0,0 +1,167 @@
+import os
+import json
+import time
+import signal
+import argparse
+import itertools
+import traceback
+import concurrent.futures
+import pandas as pd
+import pyomo.environ as pyo
+from pyomo.opt import SolverFactory
+from .data import PowerNetDataCambodian
+from .model import _PowerNetPyomoModel
+from .solver import solve_powernet, save_solns
+
+
+default_constraints = {'logical': True, 'up_down_time': True, 'ramp_rate': True, 'capacity': True, 'power_balance': True, 'transmission': True, 'reserve_and_zero_sum': True}
+
+# Datasets and instances built by the process, reused by its following jobs (see _job_instance)
+_worker = {'data': {}, 'instances': {}}
+
+
+def expand_sweep(spec):
+    """
+    Jobs of a sweep specification, the cross product of
+    - 'data': dataset directory (or list of them);
+    - 'years': simulation years;
+    - 'days': [start, last] day ranges (default [[1, 365]]);
+    - 'solvers': solver names of the Pyomo Solver Factory;
+    - 'overrides': dicts of scalar parameters of the data (_PowerNetPyomoModel.instance_params, e.g. TransLoss),
+      'constraints' (merged into the constraints of create_model), 'solver_options' and 'solve' (keyword
+      arguments of solve_powernet, e.g. {'reduction': true}); default [{}].
+    Jobs are numbered from 'run_no' (default 1), which keys their outputs as run_no of the solver CLI.
+    """
+    datasets = spec['data'] if isinstance(spec['data'], list) else [spec['data']]
+    product = itertools.product(datasets, spec['years'], spec.get('days', [[1, 365]]), spec['solvers'], spec.get('overrides', [{}]))
+    jobs = []
+    for run_no, (data, year, (start, last), solver_name, overrides) in enumerate(product, spec.get('run_no', 1)):
+        unknown = set(overrides) - set(_PowerNetPyomoModel.instance_params) - {'constraints', 'solver_options', 'solve'}
+        if unknown:
+            raise ValueError(f'Unknown overrides {sorted(unknown)} (expected {_PowerNetPyomoModel.instance_params}, constraints, solver_options or solve)')
+        jobs.append({'run_no': run_no, 'data': data, 'year': year, 'start': start, 'last': last, 'solver': solver_name, 'overrides': overrides})
+    return jobs
+
+
+def _job_instance(job, cache_dir):
+    #Instance of the dataset, year, formulation and scalar parameters of job, built on the first job that needs it.
+    #ini_on is reset to the data since solve_powernet carries it over from day to day.
+    overrides = job['overrides']
+    params = {name: value for name, value in overrides.items() if name in _PowerNetPyomoModel.instance_params}
+    constraints = dict(default_constraints, **overrides.get('constraints', {}))
+    data_key = (job['data'], job['year'])
+    if data_key not in _worker['data']:
+        _worker['data'][data_key] = PowerNetDataCambodian(job['data'], job['year'], cache_dir=cache_dir)
+    net_data = _worker['data'][data_key]
+    key = data_key + (json.dumps(constraints, sort_keys=True), json.dumps(params, sort_keys=True))
+    if key not in _worker['instances']:
+        defaults = {name: getattr(net_data, name) for name in params}
+        for name, value in params.items():
+            setattr(net_data, name, value)
+        try:
+            instance = _PowerNetPyomoModel(net_data).create_instance(constraints=constraints)
+        finally:
+            for name, value in defaults.items():
+                setattr(net_data, name, value)
+        _worker['instances'][key] = (instance, {j: pyo.value(instance.ini_on[j]) for j in instance.Generators})
+    instance, ini_on = _worker['instances'][key]
+    for j, x in ini_on.items():
+        instance.ini_on[j] = x
+    return net_data, instance, key
+
+
+def _timeout(signum, frame):
+    raise TimeoutError
+
+
+def _check_timeout(timeout):
+    if timeout is not None and not hasattr(signal, 'SIGALRM'):
+        raise ValueError('timeout needs signal.SIGALRM, which is not available on this platform')
+
+
+def run_job(job, out_dir, cache_dir=None, timeout=None):
+    """
+    Solve one job of expand_sweep and save its outputs to out_dir as the solver CLI does. Returns its row of the
+    summary table.
+    timeout: seconds after which the job is stopped, on a best effort basis. It is raised by SIGALRM (ValueError where
+    it is not available), whose handler only runs once control returns to the interpreter: a solve inside a solver
+    library (e.g. appsi_highs) is only stopped when it returns, and the job then reports a timeout. Set a time limit
+    in the solver_options of the job to bound the solve itself.
+    """
+    _check_timeout(timeout)
+    row = {'run_no': job['run_no'], 'data': os.path.basename(os.path.normpath(job['data'])), 'year': job['year'], 'start': job['start'],
+           'last': job['last'], 'solver': job['solver'], 'overrides': json.dumps(job['overrides'], sort_keys=True),
+           'status': 'ok', 'build_s': 0.0, 'solve_s': 0.0, 'system_cost': None, 'error': None}
+    key = None
+    if timeout is not None:
+        signal.signal(signal.SIGALRM, _timeout)
+        signal.alarm(int(timeout))
+    try:
+        t0 = time.perf_counter()
+        net_data, instance, key = _job_instance(job, cache_dir)
+        solver = SolverFactory(job['solver'])
+        for option, value in job['overrides'].get('solver_options', {}).items():
+            solver.options[option] = value
+        t1 = time.perf_counter()
+        solns = solve_powernet(instance, None, solver, year=job['year'], start_day=job['start'], last_day=job['last'],
+                               timeseries=net_data.timeseries, **job['overrides'].get('solve', {}))
+        t2 = time.perf_counter()
+        save_solns(solns, os.path.join(out_dir, f"out_camb_R{job['run_no']}_{job['year']}"))
+        row.update({'build_s': t1 - t0, 'solve_s': t2 - t1, 'system_cost': sum(cost for _, cost in solns['system_cost'])})
+    except TimeoutError:
+        row.update({'status': 'timeout', 'error': f'stopped after {timeout}s'})
+    except Exception as e:
+        row.update({'status': 'failed', 'error': f'{type(e).__name__}: {e}'})
+        traceback.print_exc()
+    finally:
+        if timeout is not None:
+            signal.alarm(0)
+    if key is not None and (row['status'] != 'ok' or job['overrides'].get('solve', {}).get('lazy_lines')):
+        #the instance may have been left with the bounds of an interrupted solve, or the line limits left out by lazy_lines
+        _worker['instances'].pop(key, None)
+    return row
+
+
+def run_sweep(spec, out_dir, workers=1, cache_dir=None, timeout=None, max_pending=None):
+    """
+    Run the jobs of a sweep specification (see expand_sweep) on a pool of workers, each reusing the datasets and
+    instances of its previous jobs. At most max_pending jobs (default 2 per worker) are queued at a time.
+    timeout as in run_job. Returns the summary table (one row per job, in run order), also written to
+    out_dir/batch_summary.csv.
+    """
+    _check_timeout(timeout)
+    jobs = expand_sweep(spec)
+    os.makedirs(out_dir, exist_ok=True)
+    max_pending = max_pending or 2 * workers
+    rows = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for job in jobs:
+            if len(pending) >= max_pending:
+                done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                rows += [future.result() for future in done]
+            pending.add(pool.submit(run_job, job, out_dir, cache_dir, timeout))
+        rows += [future.result() for future in concurrent.futures.as_completed(pending)]
+    summary = pd.DataFrame(rows).sort_values('run_no').reset_index(drop=True)
+    summary.to_csv(os.path.join(out_dir, 'batch_summary.csv'), index=False)
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Run a sweep of PyPowNet simulations')
+    parser.add_argument('spec', type=str, help='Sweep specification (.json, see pypownetr.batch.expand_sweep)')
+    parser.add_argument('--out-dir', type=str, default='.', help='Directory of the outputs and of batch_summary.csv')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Worker processes')
+    parser.add_argument('--timeout', type=float, default=None, help='Seconds after which a job is stopped (best effort: a solve inside a solver library is only stopped when it returns, see run_job)')
+    parser.add_argument('--max-pending', type=int, default=None, help='Jobs queued at a time (default: 2 per worker)')
+    parser.add_argument('--cache-dir', type=str, default=os.environ.get('PYPOWNETR_CACHE_DIR'), help='Cache of the parsed datasets (default: $PYPOWNETR_CACHE_DIR, no cache if unset)')
+    args = parser.parse_args()
+
+    with open(args.spec) as f:
+        spec = json.load(f)
+    summary = run_sweep(spec, args.out_dir, args.workers, args.cache_dir, args.timeout, args.max_pending)
+    print(summary.drop(columns=['error']).to_string(index=False))
+    failed = summary[summary['status'] != 'ok']
+    for _, row in failed.iterrows():
+        print(f"R{row['run_no']} {row['status']}: {row['error']}")
+    print(f'Complete: {len(summary) - len(failed)} of {len(summary)} jobs, summary is saved to {os.path.join(args.out_dir, "batch_summary.csv")}')
@@ -0,0 +1,563 @@
+import os
+import io
+import time
+import argparse
+import resource
+import tempfile
+import tracemalloc
+import multiprocessing
+import concurrent.futures
+import pandas as pd
+import pyomo.environ as pyo
+from pyomo.opt import SolverFactory
+from .data import PowerNetDataCambodian
+from .model import _PowerNetPyomoModel
+from .solver import solve_powernet, set_horizon_inputs, set_persistent_instance
+from .parallel import solve_powernet_parallel
+from .synthetic import PowerNetDataSynthetic, scaled_node_counts, write_synthetic_dataset
+
+
+def _reference_export_model_data_fp(net_data, f):
+    """
+    Value-by-value .dat writer that the bulk exporters of _PowerNetData replaced.
+    It is kept as the reference for the byte-identical check and the speedup measurement.
+    """
+    for prefix, node_type in [('GD', 'gd_nodes'), ('GN', 'gn_nodes')]:
+        for z in net_data.node_lists[node_type]:
+            z_int = net_data.node_lists[node_type].index(z)
+            f.write('set %s%dGens :=\n' % (prefix, z_int+1))
+            for gen in range(0, len(net_data.df_gen)):
+                if net_data.df_gen.loc[gen, 'node'] == z:
+                    f.write(net_data.df_gen.loc[gen, 'name'].replace(' ', '_') + ' ')
+            f.write(';\n\n')
+
+    for f_type in net_data.get_fuel_types():
+        rename_map = {'imp_viet': 'Imp_Viet', 'imp_thai': 'Imp_Thai'}
+        f.write(f'set {rename_map.get(f_type, f_type.capitalize())} :=\n')
+        for gen in range(0, len(net_data.df_gen)):
+            if net_data.df_gen.loc[gen, 'typ'] == f_type:
+                f.write(net_data.df_gen.loc[gen, 'name'].replace(' ', '_') + ' ')
+        f.write(';\n\n')
+
+    net_data.export_domains_node_sets(f)
+    net_data.export_params_simulator_period_and_horizon(f)
+
+    f.write('param h_import_cost := %d;' % net_data.h_import_cost)
+    f.write('\n\n')
+    f.write('param:' + '\t')
+    for c in net_data.df_gen.columns:
+        if c != 'name':
+            f.write(c + '\t')
+    f.write(':=\n\n')
+    for i in range(0, len(net_data.df_gen)):
+        for c in net_data.df_gen.columns:
+            if c == 'name':
+                f.write(net_data.df_gen.loc[i, 'name'].replace(' ', '_') + '\t')
+            else:
+                f.write(str((net_data.df_gen.loc[i, c])) + '\t')
+        f.write('\n')
+    f.write(';\n\n')
+
+    f.write('param:' + '\t' + 'lines:' + '\t' + 'linemva' + '\t' +'linesus :=' + '\n')
+    for p in range(0, len(net_data.df_paths)):
+        source = net_data.df_paths.loc[p, 'source']
+        sink = net_data.df_paths.loc[p, 'sink']
+        listed_again = False
+        for q in range(p+1, len(net_data.df_paths)):
+            if net_data.df_paths.loc[q, 'source'] == source and net_data.df_paths.loc[q, 'sink'] == sink:
+                listed_again = True
+        if not listed_again:
+            f.write(source + '\t' + sink + '\t' + str(net_data.df_paths.loc[p, 'linemva']) + '\t' + str(net_data.df_paths.loc[p, 'linesus']) + '\n')
+    f.write(';\n\n')
+
+    for param_name, df_ts, nodes in [
+        ('SimDemand', net_data.df_load, net_data._get_demand_nodes()),
+        ('SimHydro', net_data.df_hydro, net_data.node_lists['h_nodes']),
+        ('SimHydroImport', net_data.df_hydro_import, net_data.node_lists['h_imports'])]:
+        f.write('param:' + '\t' + param_name + ':=' + '\n')
+        for z in nodes:
+            for h in range(0, len(df_ts)):
+                f.write(z + '\t' + str(h+1) + '\t' + str(df_ts.loc[h, z]) + '\n')
+        f.write(';\n\n')
+
+    f.write('param' + '\t' + 'SimReserves:=' + '\n')
+    for h in range(0, len(net_data.df_load)):
+        f.write(str(h+1) + '\t' + str(net_data.df_reserves.loc[h, 'Reserve']) + '\n')
+    f.write(';\n\n')
+
+
+def _synthetic_data(n_nodes, sim_hours=8760, seed=0):
+    return PowerNetDataSynthetic(sim_hours=sim_hours, seed=seed, **scaled_node_counts(n_nodes))
+
+
+def _time_call(fn, repeat=1):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def benchmark_export(net_data, label, repeat=1, reference=True):
+    """
+    Time the bulk .dat export (and optionally the per-value reference writer) for net_data
+    and check that both produce the same bytes.
+    """
+    bulk_fp = io.StringIO()
+    bulk_time = _time_call(lambda: net_data.export_model_data_fp(io.StringIO()), repeat)
+    net_data.export_model_data_fp(bulk_fp)
+    row = {'dataset': label, 'bulk_s': bulk_time, 'size_mb': len(bulk_fp.getvalue()) / 2**20}
+    if reference:
+        ref_fp = io.StringIO()
+        row['reference_s'] = _time_call(lambda: _reference_export_model_data_fp(net_data, ref_fp))
+        row['speedup'] = row['reference_s'] / row['bulk_s']
+        row['identical'] = ref_fp.getvalue() == bulk_fp.getvalue()
+    return row
+
+
+def _peak_memory_mb(fn):
+    #Peak of Python allocations (tracemalloc) while running fn
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 2**20
+    finally:
+        tracemalloc.stop()
+
+
+def benchmark_instance(net_data, label, memory=True):
+    """
+    Time (and trace peak memory of) building the Pyomo instance through a temporary .dat file
+    versus through the in-memory data dict.
+    """
+    pyomo_model = _PowerNetPyomoModel(net_data)
+    model = pyomo_model.create_model()
+
+    def via_dat():
+        data_path = pyomo_model.get_data_path()
+        try:
+            model.create_instance(data_path)
+        finally:
+            os.remove(data_path)
+
+    def via_dict():
+        model.create_instance(pyomo_model.get_data_dict())
+
+    rows = []
+    for path_name, fn in [('dat', via_dat), ('dict', via_dict)]:
+        row = {'dataset': label, 'data_path': path_name, 'instance_s': _time_call(fn)}
+        if memory:
+            row['peak_mb'] = _peak_memory_mb(fn)
+        rows.append(row)
+    return rows
+
+
+def _max_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _scaling_run(n_nodes, units_per_node, line_density, solver_name, sim_hours, solver_options=None):
+    #One system size, in a fresh process so that the peak RSS belongs to this size only
+    row = {'nodes': n_nodes}
+    with tempfile.TemporaryDirectory() as dataset_dir:
+        node_counts = scaled_node_counts(n_nodes)
+        write_synthetic_dataset(dataset_dir, units_per_node=units_per_node, line_density=line_density, sim_hours=sim_hours, **node_counts)
+        t0 = time.perf_counter()
+        net_data = PowerNetDataCambodian(dataset_dir)
+        row['units'] = len(net_data.df_gen)
+        row['lines'] = len(net_data.df_trans1)
+        row['load_s'] = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        net_data.export_model_data_fp(io.StringIO())
+        row['export_dat_s'] = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        pyomo_model = _PowerNetPyomoModel(net_data)
+        model_data = pyomo_model.get_data_dict()
+        row['export_dict_s'] = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        model = pyomo_model.create_model()
+        model.create_instance(model_data)
+        row['build_s'] = time.perf_counter() - t0
+        row['build_rss_mb'] = _max_rss_mb()
+
+        if solver_name is not None:
+            solver = SolverFactory(solver_name)
+            for key, value in (solver_options or {}).items():
+                solver.options[key] = value
+            t0 = time.perf_counter()
+            solve_powernet(model, model_data, solver, start_day=1, last_day=1)
+            row['solve_day_s'] = time.perf_counter() - t0
+            row['solve_rss_mb'] = _max_rss_mb()
+    return row
+
+
+def benchmark_scaling(sizes, units_per_node=2, line_density=1.0, solver_name=None, sim_hours=8760, solver_options=None):
+    """
+    Time each phase (data load, export, instance build and, with a solver, one day solved including
+    the instance build) on synthetic systems of increasing size. solver_options (e.g. a relative MIP gap
+    or a time limit) are passed to the solver as is.
+    """
+    rows = []
+    for n_nodes in sizes:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+            rows.append(pool.submit(_scaling_run, n_nodes, units_per_node, line_density, solver_name, sim_hours, solver_options).result())
+        print(rows[-1], flush=True)
+    return rows
+
+
+def benchmark_persistent(net_data, label, solver_name='appsi_highs', days=3, solver_options=None):
+    """
+    Per-day overhead of handing a changed day to the solver, outside the optimisation itself:
+    - lp_file: writing the LP file, as file-based solvers do each day (process start and result parsing excluded);
+    - set_instance: translating the whole instance into the solver;
+    - auto_update: updating a persistent solver with its default change detection;
+    - persistent: updating a persistent solver set up by set_persistent_instance (param values only).
+    Then the wall time of solving the days with solve_powernet, without and with persistent=True.
+    """
+    pyomo_model = _PowerNetPyomoModel(net_data)
+    model = pyomo_model.create_model()
+    model_data = pyomo_model.get_data_dict()
+    instance = model.create_instance(model_data)
+
+    def new_solver():
+        solver = SolverFactory(solver_name)
+        for key, value in (solver_options or {}).items():
+            solver.options[key] = value
+        return solver
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        lp_path = os.path.join(tmp_dir, 'day.lp')
+        times = []
+        for day in range(1, days+1):
+            set_horizon_inputs(instance, day)
+            times.append(_time_call(lambda: instance.write(lp_path, format='lp')))
+        rows.append({'dataset': label, 'path': 'lp_file', 'per_day_s': sum(times) / days})
+
+    solver = new_solver()
+    times = []
+    for day in range(1, days+1):
+        set_horizon_inputs(instance, day)
+        times.append(_time_call(lambda: solver.set_instance(instance)))
+    rows.append({'dataset': label, 'path': 'set_instance', 'per_day_s': sum(times) / days})
+
+    for path_name in ['auto_update', 'persistent']:
+        solver = new_solver()
+        if path_name == 'persistent':
+            push_updates = set_persistent_instance(solver, instance)
+        else:
+            solver.set_instance(instance)
+            push_updates = lambda: None
+        times = []
+        for day in range(1, days+1):
+            set_horizon_inputs(instance, day)
+            times.append(_time_call(lambda: (push_updates(), solver.update())))
+        rows.append({'dataset': label, 'path': path_name, 'per_day_s': sum(times) / days})
+
+    for persistent in [False, True]:
+        t0 = time.perf_counter()
+        solns = solve_powernet(model, model_data, new_solver(), start_day=1, last_day=days, persistent=persistent)
+        rows.append({'dataset': label, 'path': f'solve_powernet(persistent={persistent})', 'per_day_s': (time.perf_counter() - t0) / days,
+                     'system_cost': sum(cost for _, cost in solns['system_cost'])})
+    return rows
+
+
+# Formulations compared by benchmark_formulations, as overrides of the constraints dict of create_model
+all_constraints = {'logical': True, 'up_down_time': True, 'ramp_rate': True, 'capacity': True, 'power_balance': True, 'transmission': True, 'reserve_and_zero_sum': True}
+formulations = {
+    'pairwise': {},
+    'aggregated': {'up_down_time': 'aggregated'},
+    'tight': {'logical': 'tight'},
+    'tight_aggregated': {'logical': 'tight', 'up_down_time': 'aggregated'},
+    'ptdf': {'network': 'ptdf'},
+    'kron': {'network': 'kron'},
+}
+
+
+def _mip_node_count(solver):
+    # branch-and-bound nodes of the last solve (HiGHS through appsi only)
+    try:
+        return solver._solver_model.getInfo().mip_node_count
+    except AttributeError:
+        return float('nan')
+
+
+def _count_nodes(solver, counts):
+    solve = solver.solve
+    def counted_solve(*args, **kwds):
+        results = solve(*args, **kwds)
+        counts.append(_mip_node_count(solver))
+        return results
+    solver.solve = counted_solve
+    return solver
+
+
+def benchmark_formulations(net_data, label, names, solver_name='appsi_highs', start_day=1, days=7, solver_options=None):
+    """
+    Compare model formulations: number of variables and constraints, rule calls and instance build time, the LP relaxation
+    bound of the first day (higher is tighter) and the wall time, branch-and-bound nodes and cost of solving
+    the days in sequence.
+    """
+    rows = []
+    for name in names:
+        constraints = dict(all_constraints, **formulations[name])
+        pyomo_model = _PowerNetPyomoModel(net_data)
+        model = pyomo_model.create_model(constraints=constraints)
+        model_data = pyomo_model.get_data_dict()
+        row = {'dataset': label, 'formulation': name}
+
+        t0 = time.perf_counter()
+        instance = model.create_instance(model_data)
+        row['build_s'] = time.perf_counter() - t0
+        row['variables'] = sum(len(v) for v in instance.component_objects(pyo.Var, active=True))
+        row['constraints'] = sum(len(c) for c in instance.component_objects(pyo.Constraint, active=True))
+        row['rule_calls'] = sum(len(c.index_set()) for c in instance.component_objects(pyo.Constraint, active=True))
+
+        def new_solver():
+            solver = SolverFactory(solver_name)
+            for key, value in (solver_options or {}).items():
+                solver.options[key] = value
+            return solver
+
+        set_horizon_inputs(instance, start_day)
+        pyo.TransformationFactory('core.relax_integer_vars').apply_to(instance)
+        new_solver().solve(instance)
+        row['lp_bound'] = pyo.value(instance.SystemCost)
+
+        node_counts = []
+        t0 = time.perf_counter()
+        solns = solve_powernet(model, model_data, _count_nodes(new_solver(), node_counts), start_day=start_day, last_day=start_day+days-1)
+        row['solve_s'] = time.perf_counter() - t0
+        row['mip_nodes'] = sum(node_counts)
+        row['system_cost'] = sum(cost for _, cost in solns['system_cost'])
+        row['lp_gap_day1'] = (solns['system_cost'][0][1] - row['lp_bound']) / solns['system_cost'][0][1]
+        rows.append(row)
+    return rows
+
+
+def benchmark_lazy_lines(net_data, label, networks=('angle', 'ptdf'), solver_name='appsi_highs', start_day=1, days=3, solver_options=None):
+    """
+    Solve the days with all line limits in the model and with the lazy line-limit loop of solve_powernet,
+    for each network formulation: total time (instance build and solves), cost, solves and line limits added.
+    """
+    rows = []
+    for network in networks:
+        for lazy_lines in [False, True]:
+            pyomo_model = _PowerNetPyomoModel(net_data)
+            model = pyomo_model.create_model(constraints=dict(all_constraints, network=network))
+            solver = SolverFactory(solver_name)
+            for key, value in (solver_options or {}).items():
+                solver.options[key] = value
+            t0 = time.perf_counter()
+            solns = solve_powernet(model, pyomo_model.get_data_dict(), solver, start_day=start_day, last_day=start_day+days-1, lazy_lines=lazy_lines)
+            row = {'dataset': label, 'network': network, 'lazy_lines': lazy_lines, 'total_s': time.perf_counter() - t0,
+                   'system_cost': sum(cost for _, cost in solns['system_cost'])}
+            if lazy_lines:
+                row['solves'] = sum(iterations for _, iterations, _, _ in solns['line_limits'])
+                row['added'] = sum(added for _, _, added, _ in solns['line_limits'])
+                row['active'] = solns['line_limits'][-1][3]
+            rows.append(row)
+    return rows
+
+
+def benchmark_heuristic(net_data, label, solver_name='appsi_highs', start_day=1, days=7, max_gap=None, solver_options=None, exact=True):
+    """
+    Solve the days as MIPs (if exact) and with the relax-and-repair heuristic of solve_powernet:
+    total time, cost, gap of the heuristic days to their LP bound and the days dispatched by each step.
+    """
+    rows = []
+    for heuristic in ([False] if exact else []) + [True]:
+        pyomo_model = _PowerNetPyomoModel(net_data)
+        model = pyomo_model.create_model(constraints=all_constraints)
+        solver = SolverFactory(solver_name)
+        for key, value in (solver_options or {}).items():
+            solver.options[key] = value
+        t0 = time.perf_counter()
+        solns = solve_powernet(model, pyomo_model.get_data_dict(), solver, start_day=start_day, last_day=start_day+days-1,
+                               heuristic=heuristic, heuristic_max_gap=max_gap)
+        row = {'dataset': label, 'mode': 'heuristic' if heuristic else 'mip', 'days': days, 'total_s': time.perf_counter() - t0,
+               'system_cost': sum(cost for _, cost in solns['system_cost'])}
+        if heuristic:
+            gaps = [gap for _, _, _, gap, _ in solns['heuristic']]
+            row['mean_gap'] = sum(gaps) / len(gaps)
+            row['max_gap'] = max(gaps)
+            steps = [step for _, _, _, _, step in solns['heuristic']]
+            for step in ['rounded', 'partial_mip', 'mip']:
+                row[f'{step}_days'] = steps.count(step)
+        rows.append(row)
+    return rows
+
+
+def _time_solves(solver, times):
+    solve = solver.solve
+    def timed_solve(*args, **kwds):
+        t0 = time.perf_counter()
+        results = solve(*args, **kwds)
+        times.append(time.perf_counter() - t0)
+        return results
+    solver.solve = timed_solve
+    return solver
+
+
+def benchmark_warm_start(net_data, label, solver_name='cbc', start_day=1, days=7, solver_options=None, incumbent_options=None):
+    """
+    Solve the days cold and warm started from the previous day's commitment (warm_start of solve_powernet):
+    total time, time of the MIP solves (and of building the incumbents) and cost. With incumbent_options
+    (solver options stopping at the first integer solution, e.g. {'maxSolutions': 1} for cbc) the days are
+    solved again to time the first incumbent: the stopped solves, plus the incumbent builds when warm started.
+    """
+    rows = []
+    for warm_start in [False, True]:
+        row = {'dataset': label, 'warm_start': warm_start, 'days': days}
+        for options, first_incumbent in [(solver_options, False)] + ([(dict(solver_options or {}, **incumbent_options), True)] if incumbent_options else []):
+            pyomo_model = _PowerNetPyomoModel(net_data)
+            model = pyomo_model.create_model(constraints=all_constraints)
+            solver = SolverFactory(solver_name)
+            for key, value in (options or {}).items():
+                solver.options[key] = value
+            solve_times = []
+            t0 = time.perf_counter()
+            solns = solve_powernet(model, pyomo_model.get_data_dict(), _time_solves(solver, solve_times), start_day=start_day, last_day=start_day+days-1, warm_start=warm_start)
+            total_s = time.perf_counter() - t0
+            if warm_start:
+                repair_s = sum(repair for _, _, repair, _ in solns['warm_start'])
+                mip_s = sum(solve for _, _, _, solve in solns['warm_start'])
+            else:
+                repair_s, mip_s = 0.0, sum(solve_times)
+            if first_incumbent:
+                row['first_incumbent_s'] = repair_s + mip_s
+                continue
+            row.update({'total_s': total_s, 'mip_s': mip_s, 'repair_s': repair_s, 'system_cost': sum(cost for _, cost in solns['system_cost'])})
+            if warm_start:
+                row['warm_days'] = sum(warm for _, warm, _, _ in solns['warm_start'])
+        rows.append(row)
+    return rows
+
+
+def benchmark_parallel(net_data, label, solver_name='appsi_highs', start_day=1, days=28, workers=(1, 2, 4), solver_options=None):
+    """
+    Wall time of solve_powernet_parallel for each worker count against the sequential solve_powernet, with its
+    speedup, the days re-solved by the reconciliation sweep and whether the system cost matches the sequential run.
+    """
+    pyomo_model = _PowerNetPyomoModel(net_data)
+    solver = SolverFactory(solver_name)
+    for key, value in (solver_options or {}).items():
+        solver.options[key] = value
+    instance = pyomo_model.create_instance(constraints=all_constraints)
+    t0 = time.perf_counter()
+    sequential = solve_powernet(instance, None, solver, start_day=start_day, last_day=start_day+days-1, timeseries=net_data.timeseries)
+    sequential_s = time.perf_counter() - t0
+    rows = [{'dataset': label, 'workers': 0, 'days': days, 'total_s': sequential_s, 'speedup': 1.0, 'resolved_days': 0, 'matches': True}]
+    for n_workers in workers:
+        t0 = time.perf_counter()
+        solns = solve_powernet_parallel(net_data, solver_name, start_day=start_day, last_day=start_day+days-1, workers=n_workers,
+                                        constraints=all_constraints, solver_options=solver_options)
+        total_s = time.perf_counter() - t0
+        rows.append({'dataset': label, 'workers': n_workers, 'days': days, 'total_s': total_s, 'speedup': sequential_s / total_s,
+                     'resolved_days': sum(resolved for _, resolved, _ in solns['parallel']),
+                     'matches': solns['system_cost'] == sequential['system_cost']})
+    return rows
+
+
+def _parse_solver_options(options):
+    #KEY=VALUE strings to a dict of solver options (numbers converted to float)
+    solver_options = {}
+    for option in options:
+        key, value = option.split('=', 1)
+        try:
+            value = float(value)
+        except ValueError:
+            pass
+        solver_options[key] = value
+    return solver_options
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Run PyPowNet Benchmarks')
+    parser.add_argument('benchmark', type=str, choices=['export', 'instance', 'scaling', 'persistent', 'formulation', 'lazy', 'heuristic', 'warm_start', 'parallel'], help='Benchmark to run')
+    parser.add_argument('--data', type=str, default=os.path.join(os.path.dirname(__file__), "datasets", "kamal0013", "camb_2016"), help='Power system data')
+    parser.add_argument('--year', type=int, default=2016, help='year of simulation (e.g. 2016)')
+    parser.add_argument('--nodes', type=int, nargs='+', default=[100, 500], help='Node counts of the synthetic systems')
+    parser.add_argument('--no-reference', action='store_true', help='Skip the (slow) per-value reference writer')
+    parser.add_argument('--units-per-node', type=int, default=2, help='Thermal units per gd/gn node of the synthetic systems')
+    parser.add_argument('--line-density', type=float, default=1.0, help='Extra lines per node of the synthetic systems')
+    parser.add_argument('--hours', type=int, default=8760, help='Hours of the synthetic time series')
+    parser.add_argument('--solver', type=str, default=None, help='Solver used by the scaling benchmark to solve one day (default: no solve) and by the persistent benchmark (default: appsi_highs)')
+    parser.add_argument('--days', type=int, default=3, help='Days solved by the persistent, formulation, lazy, heuristic, warm_start and parallel benchmarks (365 for a full year)')
+    parser.add_argument('--start', type=int, default=1, help='First day solved by the formulation, lazy, heuristic, warm_start and parallel benchmarks')
+    parser.add_argument('--formulations', type=str, nargs='+', default=list(formulations), choices=list(formulations), help='Formulations compared by the formulation benchmark')
+    parser.add_argument('--networks', type=str, nargs='+', default=['angle', 'ptdf'], choices=['angle', 'ptdf'], help='Network formulations compared by the lazy benchmark')
+    parser.add_argument('--linemva-scale', type=float, default=1.0, help='Scale of the Cambodian line capacities in the lazy benchmark (below 1 for binding lines)')
+    parser.add_argument('--max-gap', type=float, default=None, help='Gap above which the heuristic benchmark falls back to the MIP')
+    parser.add_argument('--no-exact', action='store_true', help='Skip the MIP run of the heuristic benchmark')
+    parser.add_argument('--incumbent-option', type=str, action='append', default=[], metavar='KEY=VALUE', help='Solver option stopping at the first integer solution, timing the first incumbent in the warm_start benchmark (e.g. maxSolutions=1 for cbc), repeatable')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4], help='Worker counts of the parallel benchmark')
+    parser.add_argument('--synthetic', action='store_true', help='Also run the persistent, formulation, lazy, heuristic and warm_start benchmarks on the synthetic systems of --nodes')
+    parser.add_argument('--solver-option', type=str, action='append', default=[], metavar='KEY=VALUE', help='Solver option of the scaling and persistent benchmarks (e.g. mip_rel_gap=0.01), repeatable')
+    parser.add_argument('--no-memory', action='store_true', help='Skip the (slower) traced run for peak memory')
+    parser.add_argument('--reference-max-nodes', type=int, default=100, help='Largest synthetic system timed with the reference writer (it is O(nodes^2 x paths))')
+    args = parser.parse_args()
+
+    if args.benchmark == 'export':
+        rows = [benchmark_export(PowerNetDataCambodian(args.data, args.year), 'camb', reference=not args.no_reference)]
+        for n_nodes in args.nodes:
+            reference = not args.no_reference and n_nodes <= args.reference_max_nodes
+            rows.append(benchmark_export(_synthetic_data(n_nodes), f'synthetic_{n_nodes}', reference=reference))
+        print(pd.DataFrame(rows).to_string(index=False))
+    elif args.benchmark == 'instance':
+        rows = benchmark_instance(PowerNetDataCambodian(args.data, args.year), 'camb', memory=not args.no_memory)
+        for n_nodes in args.nodes:
+            rows += benchmark_instance(_synthetic_data(n_nodes), f'synthetic_{n_nodes}', memory=not args.no_memory)
+        print(pd.DataFrame(rows).to_string(index=False))
+    elif args.benchmark == 'scaling':
+        rows = benchmark_scaling(args.nodes, args.units_per_node, args.line_density, args.solver, args.hours, _parse_solver_options(args.solver_option))
+        print(pd.DataFrame(rows).to_string(index=False))
+    elif args.benchmark == 'persistent':
+        solver_name = args.solver or 'appsi_highs'
+        solver_options = _parse_solver_options(args.solver_option)
+        rows = benchmark_persistent(PowerNetDataCambodian(args.data, args.year), 'camb', solver_name, args.days, solver_options)
+        for n_nodes in (args.nodes if args.synthetic else []):
+            rows += benchmark_persistent(_synthetic_data(n_nodes), f'synthetic_{n_nodes}', solver_name, args.days, solver_options)
+        print(pd.DataFrame(rows).to_string(index=False))
+    elif args.benchmark == 'formulation':
+        solver_name = args.solver or 'appsi_highs'
+        solver_options = _parse_solver_options(args.solver_option)
+        rows = benchmark_formulations(PowerNetDataCambodian(args.data, args.year), 'camb', args.formulations, solver_name, args.start, args.days, solver_options)
+        for n_nodes in (args.nodes if args.synthetic else []):
+            rows += benchmark_formulations(_synthetic_data(n_nodes), f'synthetic_{n_nodes}', args.formulations, solver_name, args.start, args.days, solver_options)
+        print(pd.DataFrame(rows).to_string(index=False))
+    elif args.benchmark == 'lazy':
+        solver_name = args.solver or 'appsi_highs'
+        solver_options = _parse_solver_options(args.solver_option)
+        net_data = PowerNetDataCambodian(args.data, args.year)
+        net_data.df_paths['linemva'] = net_data.df_paths['linemva'] * args.linemva_scale
+        rows = benchmark_lazy_lines(net_data, f'camb_x{args.linemva_scale}', args.networks, solver_name, args.start, args.days, solver_options)
+        for n_nodes in (args.nodes if args.synthetic else []):
+            rows += benchmark_lazy_lines(_synthetic_data(n_nodes), f'synthetic_{n_nodes}', args.networks, solver_name, args.start, args.days, solver_options)
+        print(pd.DataFrame(rows).to_string(index=False))
+    elif args.benchmark == 'heuristic':
+        solver_name = args.solver or 'appsi_highs'
+        solver_options = _parse_solver_options(args.solver_option)
+        rows = benchmark_heuristic(PowerNetDataCambodian(args.data, args.year), 'camb', solver_name, args.start, args.days, args.max_gap, solver_options, exact=not args.no_exact)
+        for n_nodes in (args.nodes if args.synthetic else []):
+            rows += benchmark_heuristic(_synthetic_data(n_nodes), f'synthetic_{n_nodes}', solver_name, args.start, args.days, args.max_gap, solver_options, exact=not args.no_exact)
+        print(pd.DataFrame(rows).to_string(index=False))
+    elif args.benchmark == 'warm_start':
+        solver_name = args.solver or 'cbc'
+        solver_options = _parse_solver_options(args.solver_option)
+        incumbent_options = _parse_solver_options(args.incumbent_option)
+        rows = benchmark_warm_start(PowerNetDataCambodian(args.data, args.year), 'camb', solver_name, args.start, args.days, solver_options, incumbent_options)
+        for n_nodes in (args.nodes if args.synthetic else []):
+            rows += benchmark_warm_start(_synthetic_data(n_nodes), f'synthetic_{n_nodes}', solver_name, args.start, args.days, solver_options, incumbent_options)
+        print(pd.DataFrame(rows).to_string(index=False))
+    elif args.benchmark == 'parallel':
+        solver_name = args.solver or 'appsi_highs'
+        solver_options = _parse_solver_options(args.solver_option)
+        rows = benchmark_parallel(PowerNetDataCambodian(args.data, args.year), 'camb', solver_name, args.start, args.days, args.workers, solver_options)
+        for n_nodes in (args.nodes if args.synthetic else []):
+            rows += benchmark_parallel(_synthetic_data(n_nodes), f'synthetic_{n_nodes}', solver_name, args.start, args.days, args.workers, solver_options)
+        print(pd.DataFrame(rows).to_string(index=False))
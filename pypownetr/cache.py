@@ -0,0 +1,123 @@
+import os
+import json
+import types
+import pickle
+import shutil
+import hashlib
+import tempfile
+import pandas as pd
+
+
+def hash_files(paths, chunk_size=1 << 20):
+    """
+    SHA-256 over the names and contents of the given files (in the given order).
+    """
+    h = hashlib.sha256()
+    for path in paths:
+        h.update(os.path.basename(path).encode('utf-8'))
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                h.update(chunk)
+    return h.hexdigest()
+
+
+def hash_params(params):
+    """
+    SHA-256 of a JSON-serialisable description of parameters (keys are sorted).
+    """
+    return hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+class _ContentCache:
+    """
+    Directory of cache entries named '<slot>-<key>'. The slot identifies what is cached
+    (e.g. a dataset directory and year) and the key hashes everything it was derived from.
+    Storing an entry evicts the entries of the same slot with another key.
+    """
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+
+    def _entry_path(self, slot, key):
+        return os.path.join(self.cache_dir, f'{slot}-{key}')
+
+
+    def has(self, slot, key):
+        return os.path.exists(self._entry_path(slot, key))
+
+
+    def evict_stale(self, slot, key):
+        for entry in os.listdir(self.cache_dir):
+            if entry.startswith(f'{slot}-') and entry != f'{slot}-{key}':
+                entry_path = os.path.join(self.cache_dir, entry)
+                if os.path.isdir(entry_path):
+                    shutil.rmtree(entry_path, ignore_errors=True)
+                else:
+                    os.remove(entry_path)
+
+
+class DataFrameCache(_ContentCache):
+    """
+    Cache of named DataFrames. Each entry is a directory with one pickle per frame
+    (pandas pickles hold the column blocks as raw numpy buffers, so loading is a memory copy).
+    """
+    def load(self, slot, key):
+        entry_path = self._entry_path(slot, key)
+        if not os.path.isdir(entry_path):
+            return None
+        with open(os.path.join(entry_path, 'frames.json')) as f:
+            names = json.load(f)
+        return {name: pd.read_pickle(os.path.join(entry_path, f'{name}.pkl')) for name in names}
+
+
+    def store(self, slot, key, frames):
+        #Written to a temporary directory first so that concurrent readers never see partial entries
+        tmp_path = tempfile.mkdtemp(prefix=f'.{slot}-', dir=self.cache_dir)
+        for name, df in frames.items():
+            df.to_pickle(os.path.join(tmp_path, f'{name}.pkl'), protocol=5)
+        with open(os.path.join(tmp_path, 'frames.json'), 'w') as f:
+            json.dump(list(frames), f)
+        try:
+            os.rename(tmp_path, self._entry_path(slot, key))
+        except OSError:
+            #Another process stored the same entry in the meantime
+            shutil.rmtree(tmp_path, ignore_errors=True)
+        self.evict_stale(slot, key)
+
+
+def _dropped_function(name):
+    def dropped(*args, **kwds):
+        raise RuntimeError(f'{name} was not cached with the instance (rebuild it without the cache)')
+    return dropped
+
+
+class _InstancePickler(pickle.Pickler):
+    #Rules of the model components are local functions, which pickle cannot store. They are not called again once the
+    #instance is constructed, so they are replaced by stubs raising an error if they ever are.
+    def reducer_override(self, obj):
+        if isinstance(obj, types.FunctionType) and ('<locals>' in obj.__qualname__ or obj.__name__ == '<lambda>'):
+            return _dropped_function, (obj.__qualname__,)
+        return NotImplemented
+
+
+class InstanceCache(_ContentCache):
+    """
+    Cache of constructed Pyomo model instances. Each entry is one pickle of the instance
+    (loading it restores the components without calling their rules again).
+    """
+    def load(self, slot, key):
+        entry_path = self._entry_path(slot, key)
+        if not os.path.isfile(entry_path):
+            return None
+        with open(entry_path, 'rb') as f:
+            return pickle.load(f)
+
+
+    def store(self, slot, key, instance):
+        #Written to a temporary file first so that concurrent readers never see partial entries
+        fd, tmp_path = tempfile.mkstemp(prefix=f'.{slot}-', dir=self.cache_dir)
+        with os.fdopen(fd, 'wb') as f:
+            _InstancePickler(f, protocol=5).dump(instance)
+        os.replace(tmp_path, self._entry_path(slot, key))
+        self.evict_stale(slot, key)
@@ -0,0 +1,49 @@
+import os
+import pickle
+import tempfile
+import pyomo.environ as pyo
+
+
+def save_checkpoint(path, checkpoint):
+    #Written to a temporary file first, so an interrupted write leaves the previous checkpoint in place
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(checkpoint, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def load_checkpoint(path):
+    #None if there is no checkpoint yet (the run starts from its first day)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def carry_over_state(instance, lazy_limits=()):
+    """
+    State of instance that the following days of solve_powernet depend on: ini_on, the on values of the last
+    solution (used by warm_start) and the active line limits (added by lazy_lines, constraint names in lazy_limits).
+    """
+    return {
+        'ini_on': {j: pyo.value(instance.ini_on[j]) for j in instance.Generators},
+        'on': {index: v.value for index, v in instance.on.items()},
+        'active_limits': {name: [index for index, c in getattr(instance, name).items() if c.active] for name in lazy_limits},
+    }
+
+
+def restore_carry_over_state(instance, state, lazy_limits=()):
+    for j, x in state['ini_on'].items():
+        instance.ini_on[j] = x
+    for index, x in state['on'].items():
+        instance.on[index].value = x
+    for name in lazy_limits:
+        con = getattr(instance, name)
+        for index in state['active_limits'][name]:
+            con[index].activate()
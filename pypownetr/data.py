@@ -1,9 +1,20 @@
 import csv
+import inspect
 import pandas as pd
 import numpy as np
 import os
+from .cache import DataFrameCache, hash_files, hash_params
+from .timeseries import TimeSeriesStore
+from .network import ptdf_matrix, kron_reduction
 
 class _PowerNetData:
+    #TimeSeriesStore of the hourly series; when set, the series are read from it window by window
+    #and are neither loaded into the DataFrames nor exported to the model data
+    timeseries = None
+
+    #Types of nodes, in the order of node_lists
+    node_types = ['h_nodes', 'h_imports', 's_nodes', 'w_nodes', 'gn_nodes', 'gd_nodes', 'tn_nodes', 'td_nodes']
+
     def __init__(self):
         #self.export_dat_path = export_dat_path #Output
         self.set_simulation_params()
@@ -41,6 +52,11 @@ class _PowerNetData:
         #Unit cost of hydro import
         self.h_import_cost = 48
 
+        if self.timeseries is not None:
+            self.SimDays = self.timeseries.n_days
+            self.SimHours = self.timeseries.n_periods
+            self.HorizonHours = self.timeseries.periods_per_day
+
         
 
     def construct_power_system(self):
@@ -55,6 +71,9 @@ class _PowerNetData:
             'tn_nodes': [] ##Transformers without demand
         }
 
+        #reference node of the voltage angles
+        self.ref_node = None
+
         #read parameters for dispatchable resources (coal/gas/oil/biomass generators, imports) 
         self.df_gen = None
 
@@ -105,32 +124,88 @@ class _PowerNetData:
             self.export_model_data_fp(f)
         print(f'Complete: data is saved to {out_fpath}')
 
-    
+
+    def export_model_data_dict(self, rename_map={'imp_viet': 'Imp_Viet', 'imp_thai': 'Imp_Thai'}):
+        """
+        Same content as export_model_data_fp, as a Pyomo data dict for create_instance().
+        Indexed parameters map their index to the value and sets map None to their members.
+        """
+        data = {}
+
+        ###### generator sets by generator nodes
+        gens_by_node = self._get_unit_names_by('node')
+        for prefix, node_type in [('GD', 'gd_nodes'), ('GN', 'gn_nodes')]:
+            for z_int, z in enumerate(self.node_lists[node_type]):
+                data['%s%dGens' % (prefix, z_int+1)] = {None: gens_by_node.get(z, [])}
+
+        ####### generator sets by type
+        gens_by_type = self._get_unit_names_by('typ')
+        for f_type in self.get_fuel_types():
+            opt_varname = rename_map[f_type] if f_type in rename_map else f_type.capitalize()
+            data[opt_varname] = {None: gens_by_type.get(f_type, [])}
+
+        ####### node sets (empty sets are left out as in the .dat file)
+        node_sets = [('nodes', self._get_all_nodes()), ('sources', self._get_all_nodes()), ('sinks', self._get_all_nodes())]
+        node_sets += list(self.node_lists.items())
+        node_sets.append(('d_nodes', self._get_demand_nodes()))
+        for set_label, set_content in node_sets:
+            if set_content:
+                data[set_label] = {None: list(set_content)}
+
+        ####### simulation period, horizon and system-wide parameters
+        data['SimHours'] = {None: self.SimHours}
+        data['SimDays'] = {None: self.SimDays}
+        data['HorizonHours'] = {None: self.HorizonHours}
+        data['TransLoss'] = {None: round(self.TransLoss, 3)}
+        data['n1criterion'] = {None: round(self.n1criterion, 3)}
+        data['spin_margin'] = {None: round(self.spin_margin, 3)}
+        data['h_import_cost'] = {None: int(self.h_import_cost)}
+
+        ####### parameters of generators
+        unit_names = self._get_unit_names().tolist()
+        for c in self.df_gen.columns:
+            if c != 'name':
+                data[c] = dict(zip(unit_names, self.df_gen[c].tolist()))
+
+        ####### transmission lines
+        lines = self._get_lines()
+        pairs = list(zip(lines['source'], lines['sink']))
+        data['lines'] = {None: pairs}
+        for param_name in ['linemva', 'linesus']:
+            data[param_name] = dict(zip(pairs, lines[param_name].tolist()))
+
+        ####### hourly time series
+        if self.timeseries is not None:
+            return {None: data}
+        for param_name, df_ts, nodes in [
+            ('SimDemand', self.df_load, self._get_demand_nodes()),
+            ('SimHydro', self.df_hydro, self.node_lists['h_nodes']),
+            ('SimHydroImport', self.df_hydro_import, self.node_lists['h_imports'])]:
+            if nodes:
+                hours = range(1, len(df_ts)+1)
+                data[param_name] = {(z, h): v for z in nodes for h, v in zip(hours, df_ts[z].tolist())}
+        data['SimReserves'] = dict(zip(range(1, len(self.df_reserves)+1), self.df_reserves['Reserve'].tolist()))
+
+        return {None: data}
+
+
+    def _get_unit_names(self):
+        return self.df_gen['name'].str.replace(' ', '_', regex=False)
+
+
+    def _get_unit_names_by(self, column):
+        #Unit names grouped by the values of a column of df_gen (in the order of df_gen)
+        return self._get_unit_names().groupby(self.df_gen[column], sort=False).apply(list).to_dict()
+
+
     def export_nodes(self, f):
         ###### generator sets by generator nodes
-        for z in self.node_lists['gd_nodes']:
-            # node string
-            z_int = self.node_lists['gd_nodes'].index(z)
-            f.write('set GD%dGens :=\n' % (z_int+1))
-            # pull relevant generators
-            for gen in range(0, len(self.df_gen)):
-                if self.df_gen.loc[gen, 'node'] == z:
-                    unit_name = self.df_gen.loc[gen, 'name']
-                    unit_name = unit_name.replace(' ', '_')
-                    f.write(unit_name + ' ')
-            f.write(';\n\n')    
-        
-        for z in self.node_lists['gn_nodes']:
-            # node string
-            z_int = self.node_lists['gn_nodes'].index(z)
-            f.write('set GN%dGens :=\n' % (z_int+1))
-            # pull relevant generators
-            for gen in range(0,len(self.df_gen)):
-                if self.df_gen.loc[gen, 'node'] == z:
-                    unit_name = self.df_gen.loc[gen,'name']
-                    unit_name = unit_name.replace(' ','_')
-                    f.write(unit_name + ' ')
-            f.write(';\n\n')
+        gens_by_node = self._get_unit_names_by('node')
+        for prefix, node_type in [('GD', 'gd_nodes'), ('GN', 'gn_nodes')]:
+            for z_int, z in enumerate(self.node_lists[node_type]):
+                f.write('set %s%dGens :=\n' % (prefix, z_int+1))
+                f.write(''.join(unit_name + ' ' for unit_name in gens_by_node.get(z, [])))
+                f.write(';\n\n')
 
 
     def get_fuel_types(self):
@@ -143,18 +218,14 @@ class _PowerNetData:
 
     def export_generators_by_fuel_type(self, f, rename_map={'imp_viet': 'Imp_Viet', 'imp_thai': 'Imp_Thai'}):
         ####### generator sets by type
+        gens_by_type = self._get_unit_names_by('typ')
         for f_type in self.get_fuel_types():
             if f_type in rename_map:
                 opt_varname = rename_map[f_type]
             else:
                 opt_varname = f_type.capitalize()
             f.write(f'set {opt_varname} :=\n')
-            # pull relevant generators
-            for gen in range(0,len(self.df_gen)):
-                if self.df_gen.loc[gen,'typ'] == f_type:
-                    unit_name = self.df_gen.loc[gen,'name']
-                    unit_name = unit_name.replace(' ','_')
-                    f.write(unit_name + ' ')
+            f.write(''.join(unit_name + ' ' for unit_name in gens_by_type.get(f_type, [])))
             f.write(';\n\n')
 
 
@@ -196,6 +267,11 @@ class _PowerNetData:
         f.write('\n\n')
 
 
+    def _to_str_column(self, values):
+        #str() of each element, as written by the per-value exporter
+        return [str(v) for v in values.tolist()]
+
+
     def export_params_import_and_generators(self, f):
         ######=================================================########
         ######               Segment A.7                       ########
@@ -206,43 +282,67 @@ class _PowerNetData:
             
         ####### create parameter matrix for generators
         f.write('param:' + '\t')
-        for c in self.df_gen.columns:
-            if c != 'name':
-                f.write(c + '\t')
+        f.write(''.join(c + '\t' for c in self.df_gen.columns if c != 'name'))
         f.write(':=\n\n')
-        for i in range(0,len(self.df_gen)):    
-            for c in self.df_gen.columns:
-                if c == 'name':
-                    unit_name = self.df_gen.loc[i,'name']
-                    unit_name = unit_name.replace(' ','_')
-                    f.write(unit_name + '\t')  
-                else:
-                    f.write(str((self.df_gen.loc[i,c])) + '\t')               
-            f.write('\n')
+        str_columns = []
+        for c in self.df_gen.columns:
+            if c == 'name':
+                str_columns.append(self._get_unit_names().tolist())
+            else:
+                str_columns.append(self._to_str_column(self.df_gen[c]))
+        f.write(''.join('\t'.join(row) + '\t\n' for row in zip(*str_columns)))
         f.write(';\n\n')     
 
 
+    def _get_lines(self):
+        #Directed transmission lines; the last path listed for a (source, sink) pair wins
+        return self.df_paths.drop_duplicates(['source', 'sink'], keep='last')
+
+
+    def get_ptdf(self):
+        """
+        PTDF of the directed lines over all nodes (see network.ptdf_matrix), computed once per dataset.
+        """
+        if getattr(self, '_ptdf', None) is None:
+            self._ptdf = self.compute_ptdf()
+        return self._ptdf
+
+
+    def compute_ptdf(self):
+        return ptdf_matrix(self._get_all_nodes(), self._get_lines(), self.ref_node)
+
+
+    def get_network_equivalent(self):
+        """
+        Network equivalent without the transformers without demand (tn_nodes), which only pass power through
+        (see network.kron_reduction), computed once per dataset.
+        """
+        if getattr(self, '_network_equivalent', None) is None:
+            eliminate = [z for z in self.node_lists['tn_nodes'] if z != self.ref_node]
+            self._network_equivalent = kron_reduction(self._get_all_nodes(), self._get_lines(), eliminate)
+        return self._network_equivalent
+
+
     def export_params_tranmission_network(self, f):
         ######=================================================########
         ######               Segment A.8                       ########
         ######=================================================########
 
-        ####### create parameter matrix for transmission paths (source and sink connections)
-        f.write('param:' + '\t' + 'linemva' + '\t' +'linesus :=' + '\n')
-        for z in self._get_all_nodes():
-            for x in self._get_all_nodes():           
-                f.write(z + '\t' + x + '\t')
-                match = 0
-                for p in range(0, len(self.df_paths)):
-                    source = self.df_paths.loc[p, 'source']
-                    sink = self.df_paths.loc[p, 'sink']
-                    if source == z and sink == x:
-                        match = 1
-                        p_match = p
-                if match > 0:
-                    f.write(str(self.df_paths.loc[p_match, 'linemva']) + '\t' + str(self.df_paths.loc[p_match, 'linesus']) + '\n')
-                else:
-                    f.write('0' + '\t' + '0' + '\n')
+        ####### create parameter matrix for transmission lines (source and sink connections)
+        lines = self._get_lines()
+        f.write('param:' + '\t' + 'lines:' + '\t' + 'linemva' + '\t' +'linesus :=' + '\n')
+        f.write(''.join(
+            z + '\t' + x + '\t' + mva + '\t' + sus + '\n'
+            for z, x, mva, sus in zip(lines['source'], lines['sink'], self._to_str_column(lines['linemva']), self._to_str_column(lines['linesus']))))
+        f.write(';\n\n')
+
+
+    def _export_node_time_series(self, f, param_name, df_ts, nodes):
+        #Write a node-hour parameter block from the columns of an hourly time series
+        f.write('param:' + '\t' + param_name + ':=' + '\n')
+        hours = [str(h+1) for h in range(0, len(df_ts))]
+        for z in nodes:
+            f.write(''.join(z + '\t' + h + '\t' + v + '\n' for h, v in zip(hours, self._to_str_column(df_ts[z]))))
         f.write(';\n\n')
 
 
@@ -252,45 +352,82 @@ class _PowerNetData:
         ######=================================================########
 
         ####### Hourly timeseries (load, hydro, solar, wind, reserve)
+        if self.timeseries is not None:
+            return
         # load (hourly)
-        f.write('param:' + '\t' + 'SimDemand:=' + '\n')      
-        for z in self._get_demand_nodes():
-            for h in range(0,len(self.df_load)): 
-                f.write(z + '\t' + str(h+1) + '\t' + str(self.df_load.loc[h,z]) + '\n')
-        f.write(';\n\n')
+        self._export_node_time_series(f, 'SimDemand', self.df_load, self._get_demand_nodes())
 
 
     def export_params_renewable_supply(self, f):
+        if self.timeseries is not None:
+            return
         # hydro (hourly)
-        f.write('param:' + '\t' + 'SimHydro:=' + '\n')      
-        for z in self.node_lists['h_nodes']:
-            for h in range(0,len(self.df_hydro)): 
-                f.write(z + '\t' + str(h+1) + '\t' + str(self.df_hydro.loc[h,z]) + '\n')
-        f.write(';\n\n')
+        self._export_node_time_series(f, 'SimHydro', self.df_hydro, self.node_lists['h_nodes'])
 
         # hydro_import (hourly)
-        f.write('param:' + '\t' + 'SimHydroImport:=' + '\n')      
-        for z in  self.node_lists['h_imports']:
-            for h in range(0, len(self.df_hydro_import)): 
-                f.write(z + '\t' + str(h+1) + '\t' + str(self.df_hydro_import.loc[h,z]) + '\n')
-        f.write(';\n\n')
+        self._export_node_time_series(f, 'SimHydroImport', self.df_hydro_import, self.node_lists['h_imports'])
             
         ###### System-wide hourly reserve
         f.write('param' + '\t' + 'SimReserves:=' + '\n')
-        for h in range(0, len(self.df_load)):
-            f.write(str(h+1) + '\t' + str(self.df_reserves.loc[h,'Reserve']) + '\n')
+        f.write(''.join(
+            str(h+1) + '\t' + v + '\n'
+            for h, v in enumerate(self._to_str_column(self.df_reserves['Reserve']))))
         f.write(';\n\n')
             
 
     
 
 class PowerNetDataCambodian(_PowerNetData):
-    def __init__(self, dataset_dir=os.path.join("datasets", "kamal0013", "camb_2016"), year=2016):
+    #Frames read from the dataset directory (and derived from it) that can be cached on disk
+    cached_frames = ['df_gen', 'df_gen_deratef', 'df_hydro', 'df_hydro_import', 'df_load', 'df_trans1', 'df_reserves', 'df_trans2', 'df_paths']
+
+    def __init__(self, dataset_dir=os.path.join("datasets", "kamal0013", "camb_2016"), year=2016, cache_dir=None, timeseries_dir=None):
+        """
+        cache_dir: optional directory of a DataFrameCache holding the frames read from dataset_dir.
+        Entries are keyed by the content of the source .csv files, the year and the parameters used to derive the frames.
+        timeseries_dir: optional TimeSeriesStore (see timeseries.convert_csv_dataset) replacing the hourly .csv series.
+        """
         self.year = year #simulation year (varies for climate-dependent inputs)
         self.dataset_dir = dataset_dir
+        self.cache_dir = cache_dir
+        if timeseries_dir is not None:
+            self.timeseries = TimeSeriesStore(timeseries_dir)
         super(PowerNetDataCambodian, self).__init__()
 
 
+    def get_series_file(self, series, year):
+        #.csv file of an hourly series (hydro, hydro_import or load) of a year; years without their own load file use the 2016 load
+        fpath = os.path.join(self.dataset_dir, f'data_camb_{series}_{year}.csv')
+        if series == 'load' and not os.path.exists(fpath):
+            fpath = os.path.join(self.dataset_dir, 'data_camb_load_2016.csv')
+        return fpath
+
+
+    def get_reserves(self, df_load):
+        #hourly minimum reserve as a function of load (e.g., 15% of current load)
+        #TODO: exclude columns [noname],Year,Month,Day,Hour
+        return pd.DataFrame((df_load.iloc[:, 4:].sum(axis=1)*self.res_margin).values,columns=['Reserve'])
+
+
+    def get_source_files(self):
+        fpaths = [os.path.join(self.dataset_dir, fname) for fname in ['data_camb_genparams.csv', 'data_camb_genparams_deratef.csv', 'data_camb_transparam.csv']]
+        if os.path.exists(os.path.join(self.dataset_dir, 'data_camb_nodes.csv')):
+            fpaths.append(os.path.join(self.dataset_dir, 'data_camb_nodes.csv'))
+        if self.timeseries is None:
+            fpaths += [self.get_series_file(series, self.year) for series in ['hydro', 'hydro_import', 'load']]
+        return fpaths
+
+
+    def get_cache_slot_and_key(self):
+        slot = hash_params({'dataset_dir': os.path.abspath(self.dataset_dir), 'year': self.year, 'timeseries': self.timeseries is not None})[:16]
+        key = hash_params({
+            'files': hash_files(self.get_source_files()),
+            'year': self.year,
+            'gen_cost': self.gen_cost,
+            'res_margin': self.res_margin})
+        return slot, key
+
+
     def construct_power_system(self):
         #Unit cost of generation / import of each fuel type
         #TODO: Move to .csv
@@ -306,7 +443,44 @@ class PowerNetDataCambodian(_PowerNetData):
         #Unit cost of hydro import
         self.h_import_cost = 48
 
-    
+        if self.cache_dir is None:
+            self.read_power_system()
+        else:
+            self.read_power_system_cached()
+
+        ######=================================================########
+        ######               Segment A.3                       ########
+        ######=================================================########
+
+        ####======== Lists of Nodes of the Power System ========########
+        #data_camb_nodes.csv (columns node, type) overrides the Cambodian node lists
+        nodes_path = os.path.join(self.dataset_dir, 'data_camb_nodes.csv')
+        if os.path.exists(nodes_path):
+            df_nodes = pd.read_csv(nodes_path, header=0)
+            self.node_lists = {node_type: df_nodes.loc[df_nodes['type'] == node_type, 'node'].tolist() for node_type in self.node_types}
+            self.ref_node = self.node_lists['gd_nodes'][0]
+            self.types = list(self.gen_cost.keys())
+            return
+
+        self.node_lists = {
+            'h_nodes': ['TTYh','LRCh','ATYh','KIR1h','KIR3h','KMCh'],
+            'h_imports': ['Salabam'],
+            's_nodes': [],
+            'w_nodes': [],
+            'gn_nodes': ['STH','Thai','Viet'], ##Geothermoplants nodes without demand
+            'gd_nodes': ['GS1','GS2','GS3','GS5','GS7','KPCM','KPT','SHV','SRP'], ##Geothermoplant nodes with demand
+            'tn_nodes': ['IE','KPCG','OSM','PRST'], ##Transformers without demand
+            'td_nodes': ['GS4','GS6','BTB','BMC','STR','TKO','KPS'], ##Transformers with demand
+        }
+
+        #reference node of the voltage angles
+        self.ref_node = 'GS1'
+
+        ##list of types of dispatchable units
+        self.types = ['coal_st','oil_ic','oil_st','imp_viet','imp_thai','slack'] ##,'biomass_st','gas_cc','gas_st'
+
+
+    def read_power_system(self):
         ######=================================================########
         ######               Segment A.2                       ########
         ######=================================================########
@@ -320,46 +494,138 @@ class PowerNetDataCambodian(_PowerNetData):
         self.df_gen_deratef = pd.read_csv(os.path.join(self.dataset_dir, 'data_camb_genparams_deratef.csv'), header=0)
         self.df_gen['deratef'] = self.df_gen_deratef[f'deratef_{self.year}']
 
-        ##hourly ts of dispatchable hydropower at each domestic dam
-        self.df_hydro = pd.read_csv(os.path.join(self.dataset_dir, f'data_camb_hydro_{self.year}.csv'), header=0)
-
-        ##hourly ts of dispatchable hydropower at each import dam
-        self.df_hydro_import = pd.read_csv(os.path.join(self.dataset_dir, f'data_camb_hydro_import_{self.year}.csv'), header=0)
-
-        ##hourly ts of load at substation-level
-        self.df_load = pd.read_csv(os.path.join(self.dataset_dir, 'data_camb_load_2016.csv'), header=0) 
-
         #capacity and susceptence of each transmission line (one direction)
         self.df_trans1 = pd.read_csv(os.path.join(self.dataset_dir, 'data_camb_transparam.csv'), header=0)
 
-        #hourly minimum reserve as a function of load (e.g., 15% of current load)
-        #TODO: exclude columns [noname],Year,Month,Day,Hour
-        self.df_reserves = pd.DataFrame((self.df_load.iloc[:, 4:].sum(axis=1)*self.res_margin).values,columns=['Reserve'])
-
         #capacity and susceptence of each transmission line (both directions)
         self.df_trans2 = pd.DataFrame([self.df_trans1['sink'], self.df_trans1['source'], self.df_trans1['linemva'], self.df_trans1['linesus']]).transpose()
         self.df_trans2.columns = ['source','sink','linemva','linesus']
         self.df_paths = pd.concat([self.df_trans1, self.df_trans2], axis=0)
         self.df_paths.index = np.arange(len(self.df_paths))
 
-        ######=================================================########
-        ######               Segment A.3                       ########
-        ######=================================================########
+        if self.timeseries is not None:
+            #hourly series are read from the store window by window
+            self.df_hydro = self.df_hydro_import = self.df_load = self.df_reserves = None
+            return
 
-        ####======== Lists of Nodes of the Power System ========########
-        self.node_lists = {
-            'h_nodes': ['TTYh','LRCh','ATYh','KIR1h','KIR3h','KMCh'],
-            'h_imports': ['Salabam'],
-            's_nodes': [],
-            'w_nodes': [],
-            'gn_nodes': ['STH','Thai','Viet'], ##Geothermoplants nodes without demand
-            'gd_nodes': ['GS1','GS2','GS3','GS5','GS7','KPCM','KPT','SHV','SRP'], ##Geothermoplant nodes with demand
-            'tn_nodes': ['IE','KPCG','OSM','PRST'], ##Transformers without demand
-            'td_nodes': ['GS4','GS6','BTB','BMC','STR','TKO','KPS'], ##Transformers with demand
-        }
+        ##hourly ts of dispatchable hydropower at each domestic dam
+        self.df_hydro = pd.read_csv(self.get_series_file('hydro', self.year), header=0)
 
-        ##list of types of dispatchable units
-        self.types = ['coal_st','oil_ic','oil_st','imp_viet','imp_thai','slack'] ##,'biomass_st','gas_cc','gas_st'
+        ##hourly ts of dispatchable hydropower at each import dam
+        self.df_hydro_import = pd.read_csv(self.get_series_file('hydro_import', self.year), header=0)
+
+        ##hourly ts of load at substation-level
+        self.df_load = pd.read_csv(self.get_series_file('load', self.year), header=0)
+
+        #hourly minimum reserve as a function of load (e.g., 15% of current load)
+        self.df_reserves = self.get_reserves(self.df_load)
+
+
+    def read_power_system_cached(self):
+        cache = DataFrameCache(self.cache_dir)
+        slot, key = self.get_cache_slot_and_key()
+        frames = cache.load(slot, key)
+        if frames is None:
+            self.read_power_system()
+            cache.store(slot, key, {name: getattr(self, name) for name in self.cached_frames if getattr(self, name, None) is not None})
+        else:
+            for name, df in frames.items():
+                setattr(self, name, df)
+
+
+    def compute_ptdf(self):
+        #cached next to the dataset frames, keyed by the network it is computed from and the code of network.py
+        if self.cache_dir is None:
+            return super(PowerNetDataCambodian, self).compute_ptdf()
+        cache = DataFrameCache(self.cache_dir)
+        slot = hash_params({'dataset_dir': os.path.abspath(self.dataset_dir), 'ptdf': True})[:16]
+        key = hash_params({'nodes': self._get_all_nodes(), 'ref_node': self.ref_node,
+                           'lines': self._get_lines()[['source', 'sink', 'linesus']].values.tolist(),
+                           'code': hash_files([inspect.getfile(ptdf_matrix)])})
+        frames = cache.load(slot, key)
+        if frames is None:
+            frames = {'ptdf': super(PowerNetDataCambodian, self).compute_ptdf()}
+            cache.store(slot, key, frames)
+        return frames['ptdf']
+
+
+class PowerNetDataCambodianYears:
+    """
+    Cambodian dataset for a sweep over simulation years.
+    The network, generator and node data do not depend on the year and are read once (through the dataset
+    cache if cache_dir is given); each year only adds its derate factors and its hourly series.
+    Indexing with a year (or iterating) gives a PowerNetDataCambodianYear view that shares the static frames
+    and reads its hydro series on first access. Years falling back to the same load file share one load frame.
+    """
+    def __init__(self, dataset_dir=os.path.join("datasets", "kamal0013", "camb_2016"), years=(2016,), cache_dir=None):
+        self.dataset_dir = dataset_dir
+        self.years = list(years)
+        #static frames, together with the series of the first year
+        self.static = PowerNetDataCambodian(dataset_dir, self.years[0], cache_dir=cache_dir)
+        self._loads = {self.static.get_series_file('load', self.static.year): (self.static.df_load, self.static.df_reserves)}
+
+
+    def read_series(self, series, year):
+        """
+        DataFrame of an hourly series (hydro, hydro_import, load or reserves) of a year.
+        """
+        if series in ['load', 'reserves']:
+            fpath = self.static.get_series_file('load', year)
+            if fpath not in self._loads:
+                df_load = pd.read_csv(fpath, header=0)
+                self._loads[fpath] = (df_load, self.static.get_reserves(df_load))
+            return self._loads[fpath][0 if series == 'load' else 1]
+        if year == self.static.year:
+            return getattr(self.static, f'df_{series}')
+        return pd.read_csv(self.static.get_series_file(series, year), header=0)
+
+
+    def __getitem__(self, year):
+        return PowerNetDataCambodianYear(self, year)
+
+
+    def __iter__(self):
+        for year in self.years:
+            yield self[year]
+
+
+class PowerNetDataCambodianYear(PowerNetDataCambodian):
+    """
+    One year of a PowerNetDataCambodianYears. Static frames are shared with the other years
+    (df_gen is a copy holding the derate factors of the year) and the hourly series are read lazily.
+    """
+    def __init__(self, years_data, year):
+        self.years_data = years_data
+        self._series = {}
+        super(PowerNetDataCambodianYear, self).__init__(years_data.dataset_dir, year)
+
+
+    def read_power_system(self):
+        static = self.years_data.static
+        self.df_gen_deratef = static.df_gen_deratef
+        self.df_gen = static.df_gen.assign(deratef=self.df_gen_deratef[f'deratef_{self.year}'])
+        self.df_trans1 = static.df_trans1
+        self.df_trans2 = static.df_trans2
+        self.df_paths = static.df_paths
+
+
+    def get_ptdf(self):
+        return self.years_data.static.get_ptdf()
+
+
+    def get_network_equivalent(self):
+        return self.years_data.static.get_network_equivalent()
+
+
+    def _get_series(self, series):
+        if series not in self._series:
+            self._series[series] = self.years_data.read_series(series, self.year)
+        return self._series[series]
+
+    df_hydro = property(lambda self: self._get_series('hydro'))
+    df_hydro_import = property(lambda self: self._get_series('hydro_import'))
+    df_load = property(lambda self: self._get_series('load'))
+    df_reserves = property(lambda self: self._get_series('reserves'))
 
 
 if __name__ == '__main__':
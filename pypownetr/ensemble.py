@@ -0,0 +1,131 @@
+import argparse
+import numpy as np
+import pandas as pd
+import pyomo.environ as pyo
+from scipy.signal import lfilter
+from pyomo.opt import SolverFactory
+from .data import PowerNetDataCambodian
+from .model import _PowerNetPyomoModel
+from .solver import solve_powernet, periods_per_day
+from .timeseries import ArrayTimeSeries
+
+
+def base_series(net_data):
+    """
+    {series: (nodes, node x period array)} of the load, hydro and hydro import series of the year of net_data,
+    from its TimeSeriesStore if it has one, otherwise from df_load, df_hydro and df_hydro_import.
+    All the load columns are kept since they all count in the reserves (see get_reserves of the data).
+    """
+    if net_data.timeseries is not None:
+        store = net_data.timeseries
+        return {series: (store.nodes[series], np.asarray(store.get_array(series))) for series in ['load', 'hydro', 'hydro_import'] if store.has_series(series)}
+    series = {'load': (list(net_data.df_load.columns[4:]), net_data.df_load.iloc[:, 4:].to_numpy(dtype=float).T)}
+    for name, df_ts, nodes in [('hydro', net_data.df_hydro, net_data.node_lists['h_nodes']), ('hydro_import', net_data.df_hydro_import, net_data.node_lists['h_imports'])]:
+        if nodes:
+            series[name] = (nodes, df_ts[nodes].to_numpy(dtype=float).T)
+    return series
+
+
+def ar1_noise(rng, n_members, n_nodes, n_periods, rho, node_corr):
+    """
+    Standard normal noise of shape (member x node x period), autocorrelated in time (AR(1) with coefficient rho,
+    filtered along the periods) and correlated across nodes (a share node_corr of the variance is common to all nodes).
+    """
+    common = rng.standard_normal((n_members, 1, n_periods))
+    own = rng.standard_normal((n_members, n_nodes, n_periods))
+    shocks = np.sqrt(node_corr) * common + np.sqrt(1 - node_corr) * own
+    #x[t] = rho * x[t-1] + sqrt(1 - rho^2) * shock[t], started from the stationary distribution
+    shocks[:, :, 0] /= np.sqrt(1 - rho**2)
+    return lfilter([np.sqrt(1 - rho**2)], [1, -rho], shocks, axis=-1)
+
+
+def generate_ensemble(net_data, n_members, seed=0, load_sigma=0.0, load_rho=0.9, hydro_sigma=0.0, hydro_rho=0.99, node_corr=0.5,
+                      demand_growth=(0.0, 0.0), drought=(1.0, 1.0), drought_types=('coal_st', 'oil_st'), dtype='float64'):
+    """
+    n_members perturbed versions of the hourly inputs of net_data, drawn at once from a seeded generator:
+    - load: multiplied by (1 + g) * (1 + load_sigma * noise), with g the demand growth of the member, uniform in
+      demand_growth, and noise from ar1_noise(load_rho, node_corr);
+    - hydro and hydro_import: multiplied by d * (1 + hydro_sigma * noise), with d the drought factor of the member,
+      uniform in drought, and noise from ar1_noise(hydro_rho, node_corr);
+    - deratef: multiplied by d for the units of drought_types (e.g. steam units short of cooling water);
+    - reserves: recomputed as res_margin times the total perturbed load of each period.
+    Series are clipped at 0. Returns a dict with the node names of each series ('nodes'), the arrays of each series
+    (member x node x period), 'deratef' (member x unit, in the order of df_gen) and the 'growth' and 'drought' of
+    each member. See ensemble_member for the inputs of one member.
+    """
+    rng = np.random.default_rng(seed)
+    series = base_series(net_data)
+    growth = rng.uniform(*demand_growth, size=n_members)
+    dry = rng.uniform(*drought, size=n_members)
+    ensemble = {'nodes': {name: nodes for name, (nodes, _) in series.items()}, 'growth': growth, 'drought': dry}
+
+    nodes, load = series['load']
+    noise = ar1_noise(rng, n_members, len(nodes), load.shape[1], load_rho, node_corr) if load_sigma > 0 else 0.0
+    ensemble['load'] = np.clip((1 + growth[:, None, None]) * load[None] * (1 + load_sigma * noise), 0, None).astype(dtype)
+    for name in ['hydro', 'hydro_import']:
+        if name in series:
+            nodes, base = series[name]
+            noise = ar1_noise(rng, n_members, len(nodes), base.shape[1], hydro_rho, node_corr) if hydro_sigma > 0 else 0.0
+            ensemble[name] = np.clip(dry[:, None, None] * base[None] * (1 + hydro_sigma * noise), 0, None).astype(dtype)
+    ensemble['nodes']['reserves'] = ['system']
+    ensemble['reserves'] = (ensemble['load'].sum(axis=1, keepdims=True) * net_data.res_margin).astype(dtype)
+
+    scaled = net_data.df_gen['typ'].isin(drought_types).to_numpy()
+    deratef = net_data.df_gen['deratef'].to_numpy(dtype=float)
+    ensemble['deratef'] = np.where(scaled[None], dry[:, None] * deratef[None], deratef[None])
+    return ensemble
+
+
+def ensemble_member(ensemble, k, periods_per_day=24):
+    #Hourly inputs of member k as a TimeSeriesStore held in memory, to pass as timeseries to solve_powernet
+    series = [name for name in ensemble['nodes'] if name in ensemble]
+    return ArrayTimeSeries({name: ensemble[name][k] for name in series}, ensemble['nodes'], periods_per_day)
+
+
+def solve_ensemble(net_data, ensemble, solver, start_day=1, last_day=365, members=None,
+                   constraints={'logical': True, 'up_down_time': True, 'ramp_rate': True, 'capacity': True, 'power_balance': True, 'transmission': True, 'reserve_and_zero_sum': True},
+                   **solve_kwds):
+    """
+    Solve the members of an ensemble (see generate_ensemble), all of them or the indices in members, and yield
+    (member, outputs of solve_powernet). The instance of net_data is built once and reused by all members, with
+    ini_on reset and the deratef of the member set (see _PowerNetPyomoModel.set_deratef).
+    Hours are counted from the start of the series of the ensemble, as the year of net_data.
+    """
+    pyomo_model = _PowerNetPyomoModel(net_data)
+    instance = pyomo_model.create_instance(constraints=constraints)
+    ini_on = {j: pyo.value(instance.ini_on[j]) for j in instance.Generators}
+    units = list(net_data._get_unit_names())
+    D = periods_per_day(instance)
+    for k in (range(len(ensemble['growth'])) if members is None else members):
+        pyomo_model.set_deratef(instance, dict(zip(units, ensemble['deratef'][k].tolist())))
+        for j, x in ini_on.items():
+            instance.ini_on[j] = x
+        yield k, solve_powernet(instance, None, solver, year=net_data.year, start_day=start_day, last_day=last_day,
+                                timeseries=ensemble_member(ensemble, k, D), **solve_kwds)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Solve an ensemble of perturbed load and hydro inputs')
+    parser.add_argument('data', type=str, help='Power system data')
+    parser.add_argument('year', type=int, help='year of simulation (e.g. 2016)')
+    parser.add_argument('members', type=int, help='Members of the ensemble')
+    parser.add_argument('solver', type=str, nargs='?', default='glpk', help='Solver used by Pyomo Solver Factory (e.g. glpk, gurobi, cplex)')
+    parser.add_argument('--start', type=int, default=1, help='start day of simulation (1-365)')
+    parser.add_argument('--last', type=int, default=365, help='last day of simulation (1-365)')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the perturbations')
+    parser.add_argument('--load-sigma', type=float, default=0.05, help='Standard deviation of the relative load noise')
+    parser.add_argument('--hydro-sigma', type=float, default=0.1, help='Standard deviation of the relative hydro noise')
+    parser.add_argument('--node-corr', type=float, default=0.5, help='Share of the noise variance common to all nodes')
+    parser.add_argument('--demand-growth', type=float, nargs=2, default=[0.0, 0.0], help='Range of the demand growth of the members (e.g. 0.0 0.1)')
+    parser.add_argument('--drought', type=float, nargs=2, default=[1.0, 1.0], help='Range of the drought factor of hydro and steam unit derates (e.g. 0.6 1.0)')
+    parser.add_argument('--out', type=str, default='ensemble_cost.csv', help='Output .csv of the system cost of each member and day')
+    args = parser.parse_args()
+
+    net_data = PowerNetDataCambodian(args.data, args.year)
+    ensemble = generate_ensemble(net_data, args.members, args.seed, load_sigma=args.load_sigma, hydro_sigma=args.hydro_sigma, node_corr=args.node_corr,
+                                 demand_growth=args.demand_growth, drought=args.drought)
+    rows = []
+    for k, solns in solve_ensemble(net_data, ensemble, SolverFactory(args.solver), args.start, args.last):
+        rows += [(k, ensemble['growth'][k], ensemble['drought'][k], day, cost) for day, cost in solns['system_cost']]
+    pd.DataFrame(rows, columns=['Member', 'Growth', 'Drought', 'Day', 'Value']).to_csv(args.out)
+    print(f'Complete: {args.members} members are saved to {args.out}')
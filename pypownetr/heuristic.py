@@ -0,0 +1,124 @@
+import pyomo.environ as pyo
+
+
+def round_commitment(on_lp, ini_on, minup, mindn, threshold=0.5):
+    """
+    Binary on/off schedule of one unit from the hourly on values of an LP relaxation (on_lp[0] is hour 1).
+    Hours at or above threshold are on; the schedule is then repaired from hour 1 onward to the min up/down
+    windows of the model (see attach_model_constraints_up_down_time): a unit started in hour s stays on
+    through hour s+minup-2 and a unit shut down in hour s stays off through hour s+mindn-2, the last hour
+    of the horizon being free. Runs that end too early are extended and off gaps that are too short are
+    filled (the unit stays on), so the repair never starts a unit the LP did not. ini_on is the state of hour 0.
+    Returns the list of on values of hours 1..H.
+    """
+    H = len(on_lp)
+    on = [1 if x >= threshold else 0 for x in on_lp]
+    prev = int(round(ini_on))
+    start = down = None #hour of the last start-up / shut-down within the horizon
+    for i in range(1, H+1):
+        if prev == 1 and on[i-1] == 0 and start is not None and i <= min(start+minup-2, H-1):
+            on[i-1] = 1 #too short a run
+        elif prev == 0 and on[i-1] == 1 and down is not None and i <= min(down+mindn-2, H-1):
+            for k in range(down, i):
+                on[k-1] = 1 #too short an off gap: the shut-down is cancelled and the run goes on
+            prev, down = 1, None
+        if on[i-1] != prev:
+            if on[i-1] == 1:
+                start = i
+            else:
+                down = i
+        prev = on[i-1]
+    return on
+
+
+def fix_commitment(instance, schedules):
+    """
+    Fix on and switch of hours 1..H to the given schedules ({unit: on values of hours 1..H}),
+    switch marking the start-ups. They are fixed through their bounds: persistent solvers (and appsi
+    solvers between solves) update bounds in place but remove and re-add the constraints of fixed variables.
+    """
+    for j, on in schedules.items():
+        prev = pyo.value(instance.ini_on[j])
+        for i, x in enumerate(on, start=1):
+            instance.on[j,i].setlb(x)
+            instance.on[j,i].setub(x)
+            start = 1 if x > prev else 0
+            instance.switch[j,i].setlb(start)
+            instance.switch[j,i].setub(start)
+            prev = x
+
+
+def fix_integral_commitment(instance, on_lp, tol=1e-6):
+    #Fix on (through its bounds) in the hours where the LP relaxation is already integral ({unit: on values of hours 1..H})
+    for j, values in on_lp.items():
+        for i, x in enumerate(values, start=1):
+            if abs(x - round(x)) <= tol:
+                instance.on[j,i].setlb(round(x))
+                instance.on[j,i].setub(round(x))
+
+
+def relax_commitment(instance, relax=True):
+    #on and switch are relaxed to [0, 1] (relax=True) or made binary again
+    for var in [instance.on, instance.switch]:
+        for v in var.values():
+            v.domain = pyo.UnitInterval if relax else pyo.Binary
+
+
+def free_commitment(instance):
+    H = pyo.value(instance.HorizonHours)
+    for var in [instance.on, instance.switch]:
+        for (j, i), v in var.items():
+            if 0 < i <= H:
+                v.setlb(None)
+                v.setub(None)
+
+
+def solve_day_heuristic(instance, solver, max_gap=None, thresholds=(0.5, 0.25, 0.1, 0.01)):
+    """
+    Relax-and-repair dispatch of the day loaded in instance:
+    1. solve the LP relaxation of on and switch (its cost bounds the MIP optimum from below);
+    2. round and repair each unit's commitment (see round_commitment) and fix it;
+    3. solve the resulting LP for the dispatch.
+    Rounding at 0.5 often commits too little capacity, so the thresholds are tried in turn (each one commits
+    more units) until the fixed LP is feasible. Rounding can still miss the spinning reserve or line limits;
+    the commitment is then fixed only where the LP relaxation is integral and the remaining binaries are
+    solved as a (much smaller) MIP. If the gap to the bound exceeds max_gap (if given), the full MIP of
+    the day is solved instead.
+    The solution is left loaded in instance and on and switch are binary and free again.
+    Returns (LP bound, cost, gap to the bound, step), step being 'rounded', 'partial_mip' or 'mip'.
+    """
+    H = pyo.value(instance.HorizonHours)
+    relax_commitment(instance)
+    result = solver.solve(instance)
+    instance.solutions.load_from(result)
+    bound = pyo.value(instance.SystemCost)
+    on_lp = {j: [pyo.value(instance.on[j,i]) for i in range(1, H+1)] for j in instance.Generators}
+
+    step = None
+    for threshold in thresholds:
+        schedules = {j: round_commitment(on_lp[j], pyo.value(instance.ini_on[j]), pyo.value(instance.minup[j]), pyo.value(instance.mindn[j]), threshold)
+                     for j in instance.Generators}
+        fix_commitment(instance, schedules)
+        result = solver.solve(instance, load_solutions=False)
+        if pyo.check_optimal_termination(result):
+            instance.solutions.load_from(result)
+            step = 'rounded'
+            break
+    free_commitment(instance)
+    relax_commitment(instance, relax=False)
+    if step is None:
+        fix_integral_commitment(instance, on_lp)
+        result = solver.solve(instance, load_solutions=False)
+        free_commitment(instance)
+        if pyo.check_optimal_termination(result):
+            instance.solutions.load_from(result)
+            step = 'partial_mip'
+
+    cost = pyo.value(instance.SystemCost) if step is not None else float('nan')
+    gap = (cost - bound) / abs(cost) if step is not None and cost != 0 else float('nan')
+    if step is not None and (max_gap is None or gap <= max_gap):
+        return bound, cost, gap, step
+    result = solver.solve(instance)
+    instance.solutions.load_from(result)
+    cost = pyo.value(instance.SystemCost)
+    return bound, cost, (cost - bound) / abs(cost) if cost != 0 else float('nan'), 'mip'
@@ -5,8 +5,13 @@ from pyomo.environ import *
 from pyomo.core import Var
 from pyomo.core import Param
 from pyomo.opt import SolverFactory
+from pyomo.core.expr.numeric_expr import LinearExpression
 import itertools
 from .data import PowerNetDataCambodian
+from .network import ptdf_matrix
+from .cache import InstanceCache, hash_files, hash_params
+import pyomo.version
+import inspect
 import os
 import tempfile
 
@@ -97,7 +102,8 @@ class _PowerNetPyomoModel():
         model.mindn = Param(model.Generators,within=Any)
 
         #Derate_factor as percent of maximum capacity of water-dependant generators
-        model.deratef = Param(model.Generators,within=NonNegativeReals)
+        #(mutable, so that an instance can be reused with other derates: set them with set_deratef)
+        model.deratef = Param(model.Generators,within=NonNegativeReals, mutable=True)
 
         #heat rates and import unit costs
         model.gen_cost = Param(model.Generators,within=NonNegativeReals)
@@ -107,17 +113,71 @@ class _PowerNetPyomoModel():
         model = self.attach_transmission(model)
         model = self.attach_model_simulation_conditions(model)
         model = self.attach_model_data_import(model)
-        model = self.attach_decision_variables(model)
+        network = constraints.get('network', 'angle')
+        model = self.attach_decision_variables(model, angles='kron' if network == 'kron' else network == 'angle')
         model = self.attach_model_objective_function(model)
-        model = self.attach_model_constraints(model)
+        model = self.attach_model_constraints(model, **constraints)
 
         return model
 
 
+    #Scalar parameters of the data written to the model besides the dataset files
+    instance_params = ['SimHours', 'SimDays', 'HorizonHours', 'TransLoss', 'n1criterion', 'spin_margin', 'h_import_cost']
+
+    def get_instance_cache_slot_and_key(self, rename_map, constraints):
+        """
+        Slot of the instances of a dataset and formulation (rename_map and constraints), and key of everything they are
+        built from: the dataset content (see get_cache_slot_and_key of the data), the scalar parameters, the model, data and
+        network modules (the last computes the PTDF and Kron matrices of the ptdf and kron rows) and the Pyomo version.
+        """
+        if not hasattr(self.net_data, 'get_cache_slot_and_key'):
+            raise ValueError(f'{type(self.net_data).__name__} cannot be cached (it is not read from a dataset directory)')
+        data_slot, data_key = self.net_data.get_cache_slot_and_key()
+        slot = hash_params({'data': data_slot, 'rename_map': rename_map, 'constraints': constraints})[:16]
+        key = hash_params({
+            'data': data_key,
+            'params': {name: getattr(self.net_data, name) for name in self.instance_params},
+            'code': hash_files([__file__, inspect.getfile(PowerNetDataCambodian), inspect.getfile(ptdf_matrix)]),
+            'pyomo': pyomo.version.version})
+        return slot, key
+
+
+    def create_instance(
+        self,
+        rename_map={'imp_viet': 'Imp_Viet', 'imp_thai': 'Imp_Thai'},
+        constraints={'logical': True, 'up_down_time': True, 'ramp_rate': True, 'capacity': True, 'power_balance': True, 'transmission': True, 'reserve_and_zero_sum': True},
+        cache_dir=None):
+        """
+        Instance of create_model(rename_map, constraints) built with the data of get_data_dict.
+        cache_dir: optional directory of an InstanceCache; an instance built before from the same dataset, formulation and
+        code is loaded instead of constructed. The rules of a loaded instance are not available (see cache.InstanceCache).
+        """
+        if cache_dir is not None:
+            cache = InstanceCache(cache_dir)
+            slot, key = self.get_instance_cache_slot_and_key(rename_map, constraints)
+            instance = cache.load(slot, key)
+            if instance is not None:
+                return instance
+        instance = self.create_model(rename_map, constraints).create_instance(self.get_data_dict())
+        if cache_dir is not None:
+            cache.store(slot, key, instance)
+        return instance
+
+
     def attach_transmission(self, model):
         ######==== Transmission line parameters =======#######
-        model.linemva = Param(model.sources, model.sinks)
-        model.linesus = Param(model.sources, model.sinks)
+        #Directed lines (both directions of each physical line are listed)
+        model.lines = Set(within=model.sources*model.sinks)
+        model.linemva = Param(model.lines)
+        model.linesus = Param(model.lines)
+
+        #Sinks of the lines leaving each node
+        def adjacent_init(model):
+            adjacency = {z: [] for z in model.nodes}
+            for s, k in model.lines:
+                adjacency[s].append(k)
+            return adjacency
+        model.adjacent = Set(model.nodes, within=model.sinks, initialize=adjacent_init)
 
         ### Transmission Loss as a %discount on production
         model.TransLoss = Param(within=NonNegativeReals)
@@ -143,35 +203,44 @@ class _PowerNetPyomoModel():
         model.HorizonHours = Param(within=PositiveIntegers)
         model.HH_periods = RangeSet(0, model.HorizonHours)
         model.hh_periods = RangeSet(1, model.HorizonHours)
-        model.ramp_periods = RangeSet(2,24)
+        model.ramp_periods = RangeSet(2, model.HorizonHours)
         return model
 
 
     def attach_model_data_import(self, model):
+        #Series over the simulation period are left out when they are read from a TimeSeriesStore
+        sim_series = self.net_data.timeseries is None
+
         #Demand over simulation period
-        model.SimDemand = Param(model.d_nodes*model.SH_periods, within=NonNegativeReals)
+        if sim_series:
+            model.SimDemand = Param(model.d_nodes*model.SH_periods, within=NonNegativeReals)
         #Horizon demand
         model.HorizonDemand = Param(model.d_nodes*model.hh_periods, within=NonNegativeReals,mutable=True)
 
         #Reserve for the entire system
-        model.SimReserves = Param(model.SH_periods, within=NonNegativeReals)
+        if sim_series:
+            model.SimReserves = Param(model.SH_periods, within=NonNegativeReals)
         model.HorizonReserves = Param(model.hh_periods, within=NonNegativeReals,mutable=True)
 
         ##Variable resources over simulation period and over horizon
         if len(self.net_data.node_lists['h_nodes']) > 0: #hydropower
-            model.SimHydro = Param(model.h_nodes, model.SH_periods, within=NonNegativeReals)
+            if sim_series:
+                model.SimHydro = Param(model.h_nodes, model.SH_periods, within=NonNegativeReals)
             model.HorizonHydro = Param(model.h_nodes, model.hh_periods, within=NonNegativeReals,mutable=True)
 
         if len(self.net_data.node_lists['s_nodes']) > 0: #solar power
-            model.SimSolar = Param(model.s_nodes, model.SH_periods, within=NonNegativeReals)
+            if sim_series:
+                model.SimSolar = Param(model.s_nodes, model.SH_periods, within=NonNegativeReals)
             model.HorizonSolar = Param(model.s_nodes, model.hh_periods, within=NonNegativeReals,mutable=True)
 
         if len(self.net_data.node_lists['w_nodes']) > 0: #wind power
-            model.SimWind = Param(model.w_nodes, model.SH_periods, within=NonNegativeReals)
+            if sim_series:
+                model.SimWind = Param(model.w_nodes, model.SH_periods, within=NonNegativeReals)
             model.HorizonWind = Param(model.w_nodes, model.hh_periods, within=NonNegativeReals,mutable=True)
 
         if len(self.net_data.node_lists['h_imports']) > 0: #hydro import
-            model.SimHydroImport = Param(model.h_imports, model.SH_periods, within=NonNegativeReals)
+            if sim_series:
+                model.SimHydroImport = Param(model.h_imports, model.SH_periods, within=NonNegativeReals)
             model.HorizonHydroImport = Param(model.h_imports, model.hh_periods, within=NonNegativeReals,mutable=True)
 
         ##Initial conditions
@@ -179,7 +248,7 @@ class _PowerNetPyomoModel():
         return model
 
 
-    def attach_decision_variables(self, model):
+    def attach_decision_variables(self, model, angles=True):
         ######=======================Decision variables======================########
         ##Amount of day-ahead energy generated by each generator at each hour
         model.mwh = Var(model.Generators, model.HH_periods, within=NonNegativeReals)
@@ -215,76 +284,85 @@ class _PowerNetPyomoModel():
             #dispatch of wind-power in each hour
             model.wind = Var(model.w_nodes, model.HH_periods, within=NonNegativeReals)
 
-        #Voltage angle at each node in each hour
-        model.vlt_angle = Var(model.nodes, model.HH_periods)
+        if angles == 'kron':
+            #Voltage angle at each node kept by the network equivalent in each hour
+            model.bus_nodes = Set(within=model.nodes, initialize=self.net_data.get_network_equivalent()['nodes'])
+            model.vlt_angle = Var(model.bus_nodes, model.HH_periods)
+        elif angles: #not needed by the PTDF network formulation
+            #Voltage angle at each node in each hour
+            model.vlt_angle = Var(model.nodes, model.HH_periods)
         return model
 
 
+    #Fuel-type sets by the form of their generation cost per MWh
+    heat_rate_fuels = ['Coal_st', 'Oil_ic', 'Oil_st', 'Biomass_st', 'Gas_cc', 'Gas_st'] #heat rate x fuel cost + variable O&M
+    import_fuels = ['Imp_Viet', 'Imp_Thai'] #import cost
+    slack_fuels = ['Slack'] #heat rate x fuel cost
+
     def attach_model_objective_function(self, model):
         ######================Objective function=============########
         def SysCost(model):
-            total = 0
-
-            fixed = sum(model.maxcap[j]*model.fix_om[j]*model.on[j,i] for i in model.hh_periods for j in model.Generators)
-            total += fixed
-
-            starts = sum(model.maxcap[j]*model.st_cost[j]*model.switch[j,i] for i in model.hh_periods for j in model.Generators)
-            total += starts
-
-            coal_st = sum(model.mwh[j,i]*(model.heat_rate[j]*model.gen_cost[j] + model.var_om[j]) for i in model.hh_periods for j in model.Coal_st)  
-            total += coal_st
-
-            oil_ic = sum(model.mwh[j,i]*(model.heat_rate[j]*model.gen_cost[j] + model.var_om[j]) for i in model.hh_periods for j in model.Oil_ic)
-            total += oil_ic
-
-            oil_st = sum(model.mwh[j,i]*(model.heat_rate[j]*model.gen_cost[j] + model.var_om[j]) for i in model.hh_periods for j in model.Oil_st)
-            total += oil_st
-
-            if hasattr(model, 'Imp_Viet'):
-                imprt_v = sum(model.mwh[j,i]*model.gen_cost[j] for i in model.hh_periods for j in model.Imp_Viet)
-                total += imprt_v
-
-            if hasattr(model, 'Imp_Thai'):
-                imprt_t = sum(model.mwh[j,i]*model.gen_cost[j] for i in model.hh_periods for j in model.Imp_Thai)
-                total += imprt_t
+            #Cost coefficients are computed once per generator and the cost is built as one flat linear expression
+            mwh_cost = {}
+            for fuel in self.heat_rate_fuels + self.import_fuels + self.slack_fuels:
+                if hasattr(model, fuel):
+                    for j in getattr(model, fuel):
+                        if fuel in self.heat_rate_fuels:
+                            mwh_cost[j] = value(model.heat_rate[j]*model.gen_cost[j] + model.var_om[j])
+                        elif fuel in self.import_fuels:
+                            mwh_cost[j] = value(model.gen_cost[j])
+                        else:
+                            mwh_cost[j] = value(model.heat_rate[j]*model.gen_cost[j])
+
+            coefs = []
+            variables = []
+            for j in model.Generators:
+                fixed = value(model.maxcap[j]*model.fix_om[j])
+                start = value(model.maxcap[j]*model.st_cost[j])
+                for i in model.hh_periods:
+                    coefs += [fixed, start]
+                    variables += [model.on[j,i], model.switch[j,i]]
+                    if j in mwh_cost:
+                        coefs.append(mwh_cost[j])
+                        variables.append(model.mwh[j,i])
 
             if hasattr(model, 'h_imports'):
-                import_hydro = sum(model.hydro_import[j,i]*model.h_import_cost for i in model.hh_periods for j in model.h_imports) 
-                total += import_hydro
-
-            if hasattr(model, 'Biomass_st'):
-                biomass_st = sum(model.mwh[j,i]*(model.heat_rate[j]*model.gen_cost[j] + model.var_om[j]) for i in model.hh_periods for j in model.Biomass_st)
-                total += biomass_st
-                
-            if hasattr(model, 'Gas_cc'):
-                gas_cc = sum(model.mwh[j,i]*(model.heat_rate[j]*model.gen_cost[j] + model.var_om[j]) for i in model.hh_periods for j in model.Gas_cc)
-                total += gas_cc
-
-            if hasattr(model, 'Gas_st'):
-                gas_st = sum(model.mwh[j,i]*(model.heat_rate[j]*model.gen_cost[j] + model.var_om[j]) for i in model.hh_periods for j in model.Gas_st)  
-                total += gas_st
-                
-            slack = sum(model.mwh[j,i]*model.heat_rate[j]*model.gen_cost[j] for i in model.hh_periods for j in model.Slack)
-            total += slack
-
-            return total #fixed +starts +coal_st +oil_ic +oil_st +imprt_v +imprt_t +import_hydro +slack  ## +biomass_st +gas_cc +gas_st
+                import_hydro = value(model.h_import_cost)
+                for j in model.h_imports:
+                    for i in model.hh_periods:
+                        coefs.append(import_hydro)
+                        variables.append(model.hydro_import[j,i])
+
+            return LinearExpression(constant=0, linear_coefs=coefs, linear_vars=variables)
 
         model.SystemCost = Objective(rule=SysCost, sense=minimize)
         return model
 
 
-    def attach_model_constraints(self, model, logical=True, up_down_time=True, ramp_rate=True, capacity=True, power_balance=True, transmission=True, reserve_and_zero_sum=True):
-        if logical:
+    def attach_model_constraints(self, model, logical=True, up_down_time=True, ramp_rate=True, capacity=True, power_balance=True, transmission=True, reserve_and_zero_sum=True, network='angle'):
+        if logical == 'tight':
+            model = self.attach_model_constraints_logical_tight(model, capacity=capacity)
+        elif logical:
             model = self.attach_model_constraints_logical(model)
-        if up_down_time:
+        if up_down_time == 'aggregated':
+            model = self.attach_model_constraints_up_down_time_aggregated(model)
+        elif up_down_time:
             model = self.attach_model_constraints_up_down_time(model)
         if ramp_rate:
             model = self.attach_model_constraints_ramp_rate(model)
         if capacity:
             model = self.attach_model_constraints_capacity(model)
-        if power_balance:
-            model = self.attach_model_constraints_power_balance(model)
-        if transmission:
+        if network not in ['angle', 'ptdf', 'kron']:
+            raise ValueError(f"Unknown network formulation {network} (expected 'angle', 'ptdf' or 'kron')")
+        if power_balance and network == 'ptdf':
+            model = self.attach_model_constraints_power_balance_ptdf(model)
+        elif power_balance:
+            model = self.attach_model_constraints_power_balance(model, kron=network == 'kron')
+        if transmission and network == 'ptdf':
+            model = self.attach_model_constraints_transmission_ptdf(model)
+        elif transmission and network == 'kron':
+            model = self.attach_model_constraints_transmission_kron(model)
+        elif transmission:
             model = self.attach_model_constraints_transmission(model)
         if reserve_and_zero_sum:
             model = self.attach_model_constraints_reserve_and_zero_sum(model)
@@ -317,6 +395,58 @@ class _PowerNetPyomoModel():
         return model
 
 
+    def attach_model_constraints_logical_tight(self, model, capacity=True):
+        ######========== Logical Constraint (tight form) =========#############
+        #Same logic as attach_model_constraints_logical without the big-M: dispatch is bounded by the
+        #derated capacity of each unit and switch is linked to on with unit coefficients.
+
+        ##Upper bound of each unit's dispatch
+        def MwhBounds(model):
+            for j in model.Generators:
+                ub = value(model.maxcap[j] * model.deratef[j])
+                for i in model.HH_periods:
+                    model.mwh[j,i].setub(ub)
+        model.MwhBounds = BuildAction(rule=MwhBounds)
+
+        ##Dispatch only when on (MaxCap already states it for hh_periods when capacity constraints are attached)
+        def OnCon(model,j,i):
+            if capacity and i > 0:
+                return Constraint.Skip
+            return model.mwh[j,i] <= model.on[j,i] * model.maxcap[j] * model.deratef[j]
+        model.OnConstraint = Constraint(model.Generators, model.HH_periods,rule = OnCon)
+
+        def OnCon_initial(model,j,i):
+            if i == 0:
+                return (model.on[j,i] == model.ini_on[j])
+            return Constraint.Skip
+        model.initial_value_constr = Constraint(model.Generators, model.HH_periods, rule=OnCon_initial)
+
+        def SwitchCon2(model,j,i):
+            return model.switch[j,i] <= model.on[j,i]
+        model.Switch2Constraint = Constraint(model.Generators, model.hh_periods,rule = SwitchCon2)
+
+        def SwitchCon3(model,j,i):
+            return  model.switch[j,i] <= 1 - model.on[j,i-1]
+        model.Switch3Constraint = Constraint(model.Generators, model.hh_periods,rule = SwitchCon3)
+
+        def SwitchCon4(model,j,i):
+            return  model.on[j,i] - model.on[j,i-1] <= model.switch[j,i]
+        model.Switch4Constraint = Constraint(model.Generators, model.hh_periods,rule = SwitchCon4)
+        return model
+
+
+    def set_deratef(self, instance, deratef):
+        #deratef of the units of instance ({unit: derate factor}). The dispatch bounds of the tight logical constraints
+        #are computed from deratef when the instance is built (MwhBounds), so they are updated with it.
+        for j, x in deratef.items():
+            instance.deratef[j] = x
+        if hasattr(instance, 'MwhBounds'):
+            for j in deratef:
+                ub = value(instance.maxcap[j] * instance.deratef[j])
+                for i in instance.HH_periods:
+                    instance.mwh[j,i].setub(ub)
+
+
     def attach_model_constraints_up_down_time(self, model):
         ######========== Up/Down Time Constraint =========#############
         ##Min Up time
@@ -337,6 +467,31 @@ class _PowerNetPyomoModel():
         return model
 
 
+    def attach_model_constraints_up_down_time_aggregated(self, model):
+        ######========== Up/Down Time Constraint (aggregated window form) =========#############
+        #One constraint per unit-hour over the start-ups (switch) of the last minup/mindn hours.
+        #It admits the same schedules as the pairwise form above (which leaves hour HorizonHours free
+        #and binds minup-1 hours after a start) with far fewer rule calls and a tighter LP relaxation.
+
+        ##Min Up time: a unit started in the window is still on
+        def MinUp(model,j,i):
+            minup = value(model.minup[j])
+            if minup <= 2 or i >= value(model.HorizonHours):
+                return Constraint.Skip
+            return sum(model.switch[j,s] for s in range(max(1, i-minup+2), i+1)) <= model.on[j,i]
+        model.MinimumUp = Constraint(model.Generators, model.hh_periods, rule=MinUp)
+
+        ##Min Down time: a unit on before the window is not started again (i.e. not shut down and restarted) in it
+        def MinDown(model,j,i):
+            mindn = value(model.mindn[j])
+            if mindn <= 2 or i >= value(model.HorizonHours):
+                return Constraint.Skip
+            first = max(1, i-mindn+2)
+            return sum(model.switch[j,s] for s in range(first, i+1)) <= 1 - model.on[j,first-1]
+        model.MinimumDown = Constraint(model.Generators, model.hh_periods, rule=MinDown)
+        return model
+
+
     def attach_model_constraints_ramp_rate(self, model):
         ######==========Ramp Rate Constraints =========#############
         def Ramp1(model,j,i):
@@ -395,25 +550,55 @@ class _PowerNetPyomoModel():
 
         return model
 
-    def attach_model_constraints_power_balance(self, model):
+    def _net_injection(self, model, z, i, supply=()):
+        #(1 - TransLoss) * supply - sum(linesus[z,k] * (vlt_angle[z,i] - vlt_angle[k,i]) for k in adjacent[z])
+        #as one flat linear expression (the angle of z collects the sum of the susceptances)
+        loss_factor = 1 - value(model.TransLoss)
+        susceptances = [value(model.linesus[z,k]) for k in model.adjacent[z]]
+        coefs = [loss_factor] * len(supply) + [-sum(susceptances)] + susceptances
+        variables = list(supply) + [model.vlt_angle[z,i]] + [model.vlt_angle[k,i] for k in model.adjacent[z]]
+        return LinearExpression(constant=0, linear_coefs=coefs, linear_vars=variables)
+
+
+    def _net_injection_kron(self, model, z, i, supply=()):
+        #_net_injection over the lines of the network equivalent (see get_network_equivalent of the data),
+        #whose adjacency and susceptances are collected once per instance
+        if getattr(model, '_equivalent_adjacent', None) is None:
+            adjacent = {k: [] for k in model.bus_nodes}
+            lines = self.net_data.get_network_equivalent()['lines']
+            for s, k, sus in zip(lines['source'], lines['sink'], lines['linesus']):
+                adjacent[s].append((k, sus))
+            model._equivalent_adjacent = adjacent
+        loss_factor = 1 - value(model.TransLoss)
+        adjacent = model._equivalent_adjacent[z]
+        coefs = [loss_factor] * len(supply) + [-sum(sus for _, sus in adjacent)] + [sus for _, sus in adjacent]
+        variables = list(supply) + [model.vlt_angle[z,i]] + [model.vlt_angle[k,i] for k, _ in adjacent]
+        return LinearExpression(constant=0, linear_coefs=coefs, linear_vars=variables)
+
+
+    def attach_model_constraints_power_balance(self, model, kron=False):
         ######=================================================########
         ######               Segment B.11.1                    ########
         ######=================================================########
 
+        #Each balance reads (1 - TransLoss) * supply - demand == impedance, with the impedance
+        #sum(linesus[z,k] * (vlt_angle[z,i] - vlt_angle[k,i]) for k in adjacent[z]) moved to the left (see _net_injection)
+        #With kron, the transformers without demand are eliminated and the balances are over the network equivalent
+        net_injection = self._net_injection_kron if kron else self._net_injection
+
         #########======================== Power balance in sub-station nodes (with/without demand) ====================#######
-        ###With demand
-        def TDnodes_Balance(model,z,i):
-            demand = model.HorizonDemand[z,i]
-            impedance = sum(model.linesus[z,k] * (model.vlt_angle[z,i] - model.vlt_angle[k,i]) for k in model.sinks)   
-            return - demand == impedance
-        model.TDnodes_BalConstraint= Constraint(model.td_nodes,model.hh_periods,rule= TDnodes_Balance)
+        if len(self.net_data.node_lists['td_nodes']) > 0:
+            ###With demand
+            def TDnodes_Balance(model,z,i):
+                return net_injection(model, z, i) == model.HorizonDemand[z,i]
+            model.TDnodes_BalConstraint= Constraint(model.td_nodes,model.hh_periods,rule= TDnodes_Balance)
 
-        ###Without demand
-        def TNnodes_Balance(model,z,i):
-            #demand = model.HorizonDemand[z,i]
-            impedance = sum(model.linesus[z,k] * (model.vlt_angle[z,i] - model.vlt_angle[k,i]) for k in model.sinks)   
-            return 0 == impedance
-        model.TNnodes_BalConstraint= Constraint(model.tn_nodes,model.hh_periods,rule= TNnodes_Balance)
+        tn_nodes = [z for z in self.net_data.node_lists['tn_nodes'] if not kron or z == self.net_data.ref_node]
+        if len(tn_nodes) > 0:
+            ###Without demand
+            def TNnodes_Balance(model,z,i):
+                return net_injection(model, z, i) == 0
+            model.TNnodes_BalConstraint= Constraint(tn_nodes if kron else model.tn_nodes,model.hh_periods,rule= TNnodes_Balance)
 
 
 
@@ -423,46 +608,37 @@ class _PowerNetPyomoModel():
 
         ######=================== Power balance in nodes of variable resources (without demand in this case) =================########
 
-        ###Hydropower Plants
-        def HPnodes_Balance(model,z,i):
-            dis_hydro = model.hydro[z,i]
-            #demand = model.HorizonDemand[z,i]
-            impedance = sum(model.linesus[z,k] * (model.vlt_angle[z,i] - model.vlt_angle[k,i]) for k in model.sinks)
-            return (1 - model.TransLoss) * dis_hydro == impedance ##- demand
-        model.HPnodes_BalConstraint= Constraint(model.h_nodes,model.hh_periods,rule= HPnodes_Balance)
+        if len(self.net_data.node_lists['h_nodes']) > 0:
+            ###Hydropower Plants
+            def HPnodes_Balance(model,z,i):
+                return net_injection(model, z, i, [model.hydro[z,i]]) == 0
+            model.HPnodes_BalConstraint= Constraint(model.h_nodes,model.hh_periods,rule= HPnodes_Balance)
 
-        ###Hydropower Imports
-        def HP_Imports_Balance(model,z,i):
-            hp_import = model.hydro_import[z,i]
-            #demand = model.HorizonDemand[z,i]
-            impedance = sum(model.linesus[z,k] * (model.vlt_angle[z,i] - model.vlt_angle[k,i]) for k in model.sinks)
-            return (1 - model.TransLoss) * hp_import == impedance ##- demand
-        model.HP_Imports_BalConstraint= Constraint(model.h_imports,model.hh_periods,rule= HP_Imports_Balance)
+        if len(self.net_data.node_lists['h_imports']) > 0:
+            ###Hydropower Imports
+            def HP_Imports_Balance(model,z,i):
+                return net_injection(model, z, i, [model.hydro_import[z,i]]) == 0
+            model.HP_Imports_BalConstraint= Constraint(model.h_imports,model.hh_periods,rule= HP_Imports_Balance)
 
         # ####Solar Plants
         # def Solarnodes_Balance(model,z,i):
-        #    dis_solar = model.solar[z,i]
-        #    impedance = sum(model.linesus[z,k] * (model.vlt_angle[z,i] - model.vlt_angle[k,i]) for k in model.sinks)
-        #    return (1 - model.TransLoss) * dis_solar == impedance ##- demand
+        #    return net_injection(model, z, i, [model.solar[z,i]]) == 0
         # model.Solarnodes_BalConstraint= Constraint(model.s_nodes,model.hh_periods,rule= Solarnodes_Balance)
         
         # #####Wind Plants
         # def Windnodes_Balance(model,z,i):
-        #    dis_wind = model.wind[z,i]
-        #    impedance = sum(model.linesus[z,k] * (model.vlt_angle[z,i] - model.vlt_angle[k,i]) for k in model.sinks)
-        #    return (1 - model.TransLoss) * dis_wind == impedance ##- demand
+        #    return net_injection(model, z, i, [model.wind[z,i]]) == 0
         # model.Windnodes_BalConstraint= Constraint(model.w_nodes,model.hh_periods,rule= Windnodes_Balance)
 
         ######=================================================########
         ######               Segment B.11.3                    ########
         ######=================================================########
 
-        ##########============ Power balance in nodes of dispatchable resources with demand ==============############        
+        ##########============ Power balance in nodes of dispatchable resources with demand ==============############
         def GD_Balance_Rule(gd, model, i):
-            thermo = sum(model.mwh[j,i] for j in getattr(model, f'GD{gd+1}Gens'))
-            demand = model.HorizonDemand[self.net_data.node_lists['gd_nodes'][gd], i]
-            impedance = sum(model.linesus[self.net_data.node_lists['gd_nodes'][gd], k] * (model.vlt_angle[self.net_data.node_lists['gd_nodes'][gd],i] - model.vlt_angle[k,i]) for k in model.sinks)   
-            return (1 - model.TransLoss) * thermo - demand == impedance
+            z = self.net_data.node_lists['gd_nodes'][gd]
+            thermo = [model.mwh[j,i] for j in getattr(model, f'GD{gd+1}Gens')]
+            return net_injection(model, z, i, thermo) == model.HorizonDemand[z, i]
 
         for gd_idx, gd_node in enumerate(self.net_data.node_lists['gd_nodes']):
             bal_constraint_rule = lambda model, i, gd_idx=gd_idx: GD_Balance_Rule(gd=gd_idx, model=model, i=i) #Beware of the closure
@@ -472,10 +648,9 @@ class _PowerNetPyomoModel():
 
         ##########============ Power balance in nodes of dispatchable resources without demand ==============############
         def GN_Balance_Rule(gn, model, i):
-            thermo = sum(model.mwh[j,i] for j in getattr(model, f'GN{gn+1}Gens'))
-            gn_node_name = self.net_data.node_lists['gn_nodes'][gn]
-            impedance = sum(model.linesus[gn_node_name, k] * (model.vlt_angle[gn_node_name,i] - model.vlt_angle[k,i]) for k in model.sinks)   
-            return (1 - model.TransLoss) * thermo == impedance #- demand
+            z = self.net_data.node_lists['gn_nodes'][gn]
+            thermo = [model.mwh[j,i] for j in getattr(model, f'GN{gn+1}Gens')]
+            return net_injection(model, z, i, thermo) == 0
 
         for gn_idx, gn_node in enumerate(self.net_data.node_lists['gn_nodes']):
             bal_constraint_rule = lambda model, i, gn_idx=gn_idx: GN_Balance_Rule(gn=gn_idx, model=model, i=i) #Beware of the closure
@@ -490,14 +665,14 @@ class _PowerNetPyomoModel():
         ###With demand
         def TDnodes_Balance(model,z,i):
             demand = model.HorizonDemand[z,i]
-            impedance = sum(model.linesus[z,k] * (model.vlt_angle[z,i] - model.vlt_angle[k,i]) for k in model.sinks)   
+            impedance = sum(model.linesus[z,k] * (model.vlt_angle[z,i] - model.vlt_angle[k,i]) for k in model.adjacent[z])   
             return - demand == impedance
         model.TDnodes_BalConstraint= Constraint(model.td_nodes, model.hh_periods,rule= TDnodes_Balance)
 
         ###Without demand
         def TNnodes_Balance(model,z,i):
             #demand = model.HorizonDemand[z,i]
-            impedance = sum(model.linesus[z,k] * (model.vlt_angle[z,i] - model.vlt_angle[k,i]) for k in model.sinks)   
+            impedance = sum(model.linesus[z,k] * (model.vlt_angle[z,i] - model.vlt_angle[k,i]) for k in model.adjacent[z])   
             return 0 == impedance
         model.TNnodes_BalConstraint= Constraint(model.tn_nodes, model.hh_periods,rule= TNnodes_Balance)
 
@@ -514,7 +689,7 @@ class _PowerNetPyomoModel():
             def HPnodes_Balance(model,z,i):
                 dis_hydro = model.hydro[z,i]
                 #demand = model.HorizonDemand[z,i]
-                impedance = sum(model.linesus[z,k] * (model.vlt_angle[z,i] - model.vlt_angle[k,i]) for k in model.sinks)
+                impedance = sum(model.linesus[z,k] * (model.vlt_angle[z,i] - model.vlt_angle[k,i]) for k in model.adjacent[z])
                 return (1 - model.TransLoss) * dis_hydro == impedance ##- demand
             model.HPnodes_BalConstraint= Constraint(model.h_nodes, model.hh_periods,rule= HPnodes_Balance)
 
@@ -523,7 +698,7 @@ class _PowerNetPyomoModel():
             def HP_Imports_Balance(model,z,i):
                 hp_import = model.hydro_import[z,i]
                 #demand = model.HorizonDemand[z,i]
-                impedance = sum(model.linesus[z,k] * (model.vlt_angle[z,i] - model.vlt_angle[k,i]) for k in model.sinks)
+                impedance = sum(model.linesus[z,k] * (model.vlt_angle[z,i] - model.vlt_angle[k,i]) for k in model.adjacent[z])
                 return (1 - model.TransLoss) * hp_import == impedance ##- demand
             model.HP_Imports_BalConstraint= Constraint(model.h_imports, model.hh_periods,rule= HP_Imports_Balance)
 
@@ -531,7 +706,7 @@ class _PowerNetPyomoModel():
             ####Solar Plants
             def Solarnodes_Balance(model,z,i):
                 dis_solar = model.solar[z,i]
-                impedance = sum(model.linesus[z,k] * (model.vlt_angle[z,i] - model.vlt_angle[k,i]) for k in model.sinks)
+                impedance = sum(model.linesus[z,k] * (model.vlt_angle[z,i] - model.vlt_angle[k,i]) for k in model.adjacent[z])
                 return (1 - model.TransLoss) * dis_solar == impedance ##- demand
             model.Solarnodes_BalConstraint= Constraint(model.s_nodes, model.hh_periods,rule= Solarnodes_Balance)
         
@@ -539,7 +714,7 @@ class _PowerNetPyomoModel():
             #####Wind Plants
             def Windnodes_Balance(model,z,i):
                 dis_wind = model.wind[z,i]
-                impedance = sum(model.linesus[z,k] * (model.vlt_angle[z,i] - model.vlt_angle[k,i]) for k in model.sinks)
+                impedance = sum(model.linesus[z,k] * (model.vlt_angle[z,i] - model.vlt_angle[k,i]) for k in model.adjacent[z])
                 return (1 - model.TransLoss) * dis_wind == impedance ##- demand
             model.Windnodes_BalConstraint= Constraint(model.w_nodes, model.hh_periods,rule= Windnodes_Balance)
 
@@ -547,7 +722,7 @@ class _PowerNetPyomoModel():
         def GD_Balance_Rule(gd, model, i):
             thermo = sum(model.mwh[j,i] for j in getattr(model, f'GD{gd+1}Gens'))
             demand = model.HorizonDemand[self.net_data.node_lists['gd_nodes'][gd], i]
-            impedance = sum(model.linesus[self.net_data.node_lists['gd_nodes'][gd], k] * (model.vlt_angle[self.net_data.node_lists['gd_nodes'][gd],i] - model.vlt_angle[k,i]) for k in model.sinks)   
+            impedance = sum(model.linesus[self.net_data.node_lists['gd_nodes'][gd], k] * (model.vlt_angle[self.net_data.node_lists['gd_nodes'][gd],i] - model.vlt_angle[k,i]) for k in model.adjacent[self.net_data.node_lists['gd_nodes'][gd]])   
             return (1 - model.TransLoss) * thermo - demand == impedance
 
         for gd_idx, gd_node in enumerate(self.net_data.node_lists['gd_nodes']):
@@ -559,7 +734,7 @@ class _PowerNetPyomoModel():
         ##########============ Power balance in nodes of dispatchable resources without demand ==============############
         def GN_Balance_Rule(gn, model, i):
             thermo = sum(model.mwh[j,i] for j in getattr(model, f'GN{gn+1}Gens'))
-            impedance = sum(model.linesus[self.net_data.node_lists['gn_nodes'][gn],k] * (model.vlt_angle[self.net_data.node_lists['gn_nodes'][gn],i] - model.vlt_angle[k,i]) for k in model.sinks)   
+            impedance = sum(model.linesus[self.net_data.node_lists['gn_nodes'][gn],k] * (model.vlt_angle[self.net_data.node_lists['gn_nodes'][gn],i] - model.vlt_angle[k,i]) for k in model.adjacent[self.net_data.node_lists['gn_nodes'][gn]])   
             return (1 - model.TransLoss) * thermo == impedance #- demand
 
         for gn_idx, gn_node in enumerate(self.net_data.node_lists['gn_nodes']):
@@ -575,7 +750,7 @@ class _PowerNetPyomoModel():
 
         ####=== Reference Node =====#####
         def ref_node(model,i):
-            return model.vlt_angle['GS1',i] == 0
+            return model.vlt_angle[self.net_data.ref_node,i] == 0
         model.Ref_NodeConstraint= Constraint(model.hh_periods,rule= ref_node)
 
 
@@ -585,14 +760,121 @@ class _PowerNetPyomoModel():
                 return (model.n1criterion) * model.linemva[s,k] >= model.linesus[s,k] * (model.vlt_angle[s,i] - model.vlt_angle[k,i])
             else:
                 return Constraint.Skip
-        model.MaxLineConstraint= Constraint(model.sources, model.sinks, model.hh_periods,rule=MaxLine)
+        model.MaxLineConstraint= Constraint(model.lines, model.hh_periods,rule=MaxLine)
 
         def MinLine(model,s,k,i):
             if model.linemva[s,k] > 0:
                 return (-model.n1criterion) * model.linemva[s,k] <= model.linesus[s,k] * (model.vlt_angle[s,i] - model.vlt_angle[k,i])
             else:
                 return Constraint.Skip
-        model.MinLineConstraint= Constraint(model.sources, model.sinks, model.hh_periods,rule=MinLine)
+        model.MinLineConstraint= Constraint(model.lines, model.hh_periods,rule=MinLine)
+        return model
+
+
+    def attach_model_constraints_transmission_kron(self, model):
+        ######========== Transmission constraints on the network equivalent =========#############
+        #The angles of the eliminated transformers are linear in the kept ones (see network.kron_reduction),
+        #so the flow of every line of the original network is sum(flow_factors[s,k][z] * vlt_angle[z,i] for z in bus_nodes)
+        equivalent = self.net_data.get_network_equivalent()
+        flow_factors = equivalent['flow_factors']
+        line_factors = {}
+        for (s, k), row in zip(flow_factors.index, flow_factors.to_numpy()):
+            nonzero = row.nonzero()[0]
+            line_factors[s, k] = [(flow_factors.columns[n], row[n]) for n in nonzero]
+
+        def ref_node(model,i):
+            return model.vlt_angle[self.net_data.ref_node,i] == 0
+        model.Ref_NodeConstraint= Constraint(model.hh_periods,rule= ref_node)
+
+        def line_flow(model,s,k,i):
+            return LinearExpression(constant=0, linear_coefs=[factor for _, factor in line_factors[s, k]],
+                                    linear_vars=[model.vlt_angle[z,i] for z, _ in line_factors[s, k]])
+
+        def MaxLine(model,s,k,i):
+            if model.linemva[s,k] > 0:
+                return line_flow(model,s,k,i) <= (model.n1criterion) * model.linemva[s,k]
+            else:
+                return Constraint.Skip
+        model.MaxLineConstraint= Constraint(model.lines, model.hh_periods,rule=MaxLine)
+
+        def MinLine(model,s,k,i):
+            if model.linemva[s,k] > 0:
+                return line_flow(model,s,k,i) >= (-model.n1criterion) * model.linemva[s,k]
+            else:
+                return Constraint.Skip
+        model.MinLineConstraint= Constraint(model.lines, model.hh_periods,rule=MinLine)
+        return model
+
+
+    def _node_supplies(self, model):
+        #Supply variables (without the hour index) injected at each node, as in the nodal balances
+        #of attach_model_constraints_power_balance (solar and wind are not balanced there either).
+        #Collected once per instance.
+        if getattr(model, '_supplies', None) is None:
+            supplies = {z: [] for z in model.nodes}
+            for prefix, node_type in [('GD', 'gd_nodes'), ('GN', 'gn_nodes')]:
+                for n, z in enumerate(self.net_data.node_lists[node_type]):
+                    supplies[z] += [(model.mwh, j) for j in getattr(model, f'{prefix}{n+1}Gens')]
+            if len(self.net_data.node_lists['h_nodes']) > 0:
+                for z in model.h_nodes:
+                    supplies[z].append((model.hydro, z))
+            if len(self.net_data.node_lists['h_imports']) > 0:
+                for z in model.h_imports:
+                    supplies[z].append((model.hydro_import, z))
+            model._supplies = supplies
+        return model._supplies
+
+
+    def attach_model_constraints_power_balance_ptdf(self, model):
+        ######========== System power balance (PTDF network formulation) =========#############
+        #The nodal balances of the angle formulation sum to one balance per hour, since the line flows
+        #cancel out: (1 - TransLoss) * supply == demand over all nodes. The flows are expressed through
+        #the PTDF in attach_model_constraints_transmission_ptdf.
+        def SysBalance(model,i):
+            supplies = self._node_supplies(model)
+            loss_factor = 1 - value(model.TransLoss)
+            variables = [var[key,i] for z in model.nodes for var, key in supplies[z]]
+            supply = LinearExpression(constant=0, linear_coefs=[loss_factor]*len(variables), linear_vars=variables)
+            return supply == sum(model.HorizonDemand[z,i] for z in model.d_nodes)
+        model.SystemBalance = Constraint(model.hh_periods,rule=SysBalance)
+        return model
+
+
+    def attach_model_constraints_transmission_ptdf(self, model):
+        ######========== Transmission Capacity Constraints (N-1 Criterion) on PTDF flows =========#############
+        #flow[s,k,i] = sum(ptdf[s,k][z] * net_injection[z,i] for z in nodes), with
+        #net_injection[z,i] = (1 - TransLoss) * supply[z,i] - HorizonDemand[z,i]
+        ptdf = self.net_data.get_ptdf()
+        line_factors = {}
+        for (s, k), row in zip(ptdf.index, ptdf.to_numpy()):
+            nonzero = row.nonzero()[0]
+            line_factors[s, k] = [(ptdf.columns[n], row[n]) for n in nonzero]
+
+        def line_flow(model,s,k,i):
+            supplies = self._node_supplies(model)
+            loss_factor = 1 - value(model.TransLoss)
+            coefs = []
+            variables = []
+            for z, factor in line_factors[s, k]:
+                for var, key in supplies[z]:
+                    coefs.append(factor * loss_factor)
+                    variables.append(var[key,i])
+            flow = LinearExpression(constant=0, linear_coefs=coefs, linear_vars=variables)
+            return flow - sum(factor * model.HorizonDemand[z,i] for z, factor in line_factors[s, k] if z in model.d_nodes)
+
+        def MaxLine(model,s,k,i):
+            if model.linemva[s,k] > 0:
+                return line_flow(model,s,k,i) <= (model.n1criterion) * model.linemva[s,k]
+            else:
+                return Constraint.Skip
+        model.MaxLineConstraint= Constraint(model.lines, model.hh_periods,rule=MaxLine)
+
+        def MinLine(model,s,k,i):
+            if model.linemva[s,k] > 0:
+                return line_flow(model,s,k,i) >= (-model.n1criterion) * model.linemva[s,k]
+            else:
+                return Constraint.Skip
+        model.MinLineConstraint= Constraint(model.lines, model.hh_periods,rule=MinLine)
         return model
 
 
@@ -633,8 +915,12 @@ class _PowerNetPyomoModel():
         tf.close()
         return tf.name
 
+
+    def get_data_dict(self):
+        return self.net_data.export_model_data_dict()
+
 class PowerNetPyomoModelCambodian(_PowerNetPyomoModel):
-    def __init__(self, dataset_dir=os.path.join("datasets", "kamal0013", "camb_2016"), year=2016):
-        pownet_data = PowerNetDataCambodian(dataset_dir=dataset_dir, year=year)
+    def __init__(self, dataset_dir=os.path.join("datasets", "kamal0013", "camb_2016"), year=2016, cache_dir=None, timeseries_dir=None):
+        pownet_data = PowerNetDataCambodian(dataset_dir=dataset_dir, year=year, cache_dir=cache_dir, timeseries_dir=timeseries_dir)
         
         super(PowerNetPyomoModelCambodian, self).__init__(pownet_data)
\ No newline at end of file
@@ -0,0 +1,130 @@
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from scipy.sparse.linalg import splu
+
+
+def susceptance_matrix(nodes, df_paths):
+    """
+    Nodal susceptance matrix B (sparse, len(nodes) x len(nodes)) of the directed lines in df_paths.
+    Both directions of each physical line are listed in df_paths, so each direction adds its
+    susceptance to the row of its source: B[s,s] += linesus, B[s,k] -= linesus.
+    """
+    position = {z: n for n, z in enumerate(nodes)}
+    src = df_paths['source'].map(position).to_numpy()
+    snk = df_paths['sink'].map(position).to_numpy()
+    sus = df_paths['linesus'].to_numpy(dtype=float)
+    return sp.csr_matrix((np.concatenate([sus, -sus]), (np.concatenate([src, src]), np.concatenate([src, snk]))),
+                         shape=(len(nodes), len(nodes)))
+
+
+def ptdf_matrix(nodes, df_paths, ref_node, tol=1e-10):
+    """
+    Power transfer distribution factors of the DC network: the flow on each directed line of df_paths,
+    linesus * (vlt_angle[source] - vlt_angle[sink]), per unit of net injection at each node, with the
+    injections balanced at ref_node (whose column is 0). Factors below tol in magnitude are set to 0.
+
+    With B the susceptance matrix and B_r its reduction without ref_node, the angles are
+    B_r^-1 * injections, so the factors of the lines are diag(linesus) * A * B_r^-1 with A the
+    line-node incidence matrix. The sparse LU factors of B_r are solved for the columns of (A_r)^T * diag(linesus).
+
+    Returns a DataFrame with one row per line (MultiIndex source, sink) and one column per node.
+    """
+    nodes = list(nodes)
+    ref = nodes.index(ref_node)
+    keep = [n for n in range(len(nodes)) if n != ref]
+    B = susceptance_matrix(nodes, df_paths).tocsc()
+    B_r = B[keep, :][:, keep]
+
+    position = {z: n for n, z in enumerate(nodes)}
+    n_lines = len(df_paths)
+    src = df_paths['source'].map(position).to_numpy()
+    snk = df_paths['sink'].map(position).to_numpy()
+    sus = df_paths['linesus'].to_numpy(dtype=float)
+    incidence = sp.csr_matrix((np.concatenate([sus, -sus]), (np.concatenate([np.arange(n_lines)]*2), np.concatenate([src, snk]))),
+                              shape=(n_lines, len(nodes)))
+
+    try:
+        lu = splu(B_r)
+    except RuntimeError as e:
+        raise ValueError(f'The network is not connected to reference node {ref_node} (singular susceptance matrix)') from e
+    factors = np.zeros((n_lines, len(nodes)))
+    factors[:, keep] = lu.solve(incidence[:, keep].T.toarray()).T
+    factors[np.abs(factors) < tol] = 0.0
+    index = pd.MultiIndex.from_arrays([df_paths['source'].to_numpy(), df_paths['sink'].to_numpy()], names=['source', 'sink'])
+    return pd.DataFrame(factors, index=index, columns=nodes)
+
+
+def kron_reduction(nodes, df_paths, eliminate, tol=1e-10):
+    """
+    Network equivalent of the DC network without the nodes in eliminate, which must have no injection (e.g. transformers
+    without demand). With the susceptance matrix B split into kept (K) and eliminated (E) nodes, the angles of the
+    eliminated nodes follow from the kept ones as theta_E = W * theta_K with W = -B_EE^-1 * B_EK, and the balances of the
+    kept nodes read B_red * theta_K = injections with B_red = B_KK + B_KE * W (Kron reduction). Factors below tol in
+    magnitude are set to 0.
+
+    Returns a dict with
+    - 'nodes': the kept nodes;
+    - 'lines': DataFrame (source, sink, linesus) of the directed lines of the equivalent, whose susceptance -B_red[s,k]
+      sums the direct line and the paths through eliminated nodes;
+    - 'angle_factors': W as a DataFrame (one row per eliminated node, one column per kept node);
+    - 'flow_factors': flow of each directed line of df_paths, linesus * (theta[source] - theta[sink]), per unit of
+      kept angle (one row per line (MultiIndex source, sink), one column per kept node).
+    """
+    nodes = list(nodes)
+    eliminate = set(eliminate)
+    eliminated = [z for z in nodes if z in eliminate]
+    kept = [z for z in nodes if z not in eliminate]
+    position = {z: n for n, z in enumerate(nodes)}
+    K = [position[z] for z in kept]
+    E = [position[z] for z in eliminated]
+    B = susceptance_matrix(nodes, df_paths).tocsc()
+
+    W = np.zeros((len(E), len(K)))
+    if E:
+        try:
+            lu = splu(B[E, :][:, E])
+        except RuntimeError as e:
+            raise ValueError('Some of the eliminated nodes are not connected to a kept node (singular susceptance matrix)') from e
+        W = -lu.solve(B[E, :][:, K].toarray())
+        W[np.abs(W) < tol] = 0.0
+    B_red = B[K, :][:, K].toarray() + B[K, :][:, E] @ W
+
+    src, snk = np.nonzero((np.abs(B_red) > tol) & ~np.eye(len(K), dtype=bool))
+    lines = pd.DataFrame({'source': np.array(kept, dtype=object)[src], 'sink': np.array(kept, dtype=object)[snk], 'linesus': -B_red[src, snk]})
+
+    #angles of all nodes from the kept ones, then the flows of the lines
+    T = np.zeros((len(nodes), len(K)))
+    T[K, np.arange(len(K))] = 1.0
+    T[E, :] = W
+    n_lines = len(df_paths)
+    path_src = df_paths['source'].map(position).to_numpy()
+    path_snk = df_paths['sink'].map(position).to_numpy()
+    sus = df_paths['linesus'].to_numpy(dtype=float)
+    incidence = sp.csr_matrix((np.concatenate([sus, -sus]), (np.concatenate([np.arange(n_lines)]*2), np.concatenate([path_src, path_snk]))),
+                              shape=(n_lines, len(nodes)))
+    flows = incidence @ T
+    flows[np.abs(flows) < tol] = 0.0
+    index = pd.MultiIndex.from_arrays([df_paths['source'].to_numpy(), df_paths['sink'].to_numpy()], names=['source', 'sink'])
+    return {
+        'nodes': kept,
+        'lines': lines,
+        'angle_factors': pd.DataFrame(W, index=eliminated, columns=kept),
+        'flow_factors': pd.DataFrame(flows, index=index, columns=kept),
+    }
+
+
+def expand_equivalent_angles(vlt_angle, equivalent):
+    """
+    Angles of all nodes and flows of all lines of the original network from the angles of a network equivalent
+    (see kron_reduction). vlt_angle is a list of (node, time, value) over the kept nodes; returns the list extended
+    with the eliminated nodes and the list of (source, sink, time, flow) of the lines.
+    """
+    kept = equivalent['angle_factors'].columns
+    theta = pd.DataFrame(vlt_angle, columns=['node', 'time', 'value']).pivot(index='node', columns='time', values='value').reindex(kept)
+    eliminated = equivalent['angle_factors'].to_numpy() @ theta.to_numpy()
+    flows = equivalent['flow_factors'].to_numpy() @ theta.to_numpy()
+    times = list(theta.columns)
+    angles = list(vlt_angle) + [(z, t, eliminated[n, m]) for n, z in enumerate(equivalent['angle_factors'].index) for m, t in enumerate(times)]
+    line_flow = [(s, k, t, flows[l, m]) for l, (s, k) in enumerate(equivalent['flow_factors'].index) for m, t in enumerate(times)]
+    return angles, line_flow
@@ -0,0 +1,154 @@
+import time
+import pyomo.environ as pyo
+from concurrent.futures import ProcessPoolExecutor
+from pyomo.opt import SolverFactory
+from .model import _PowerNetPyomoModel
+from .heuristic import relax_commitment
+from .solver import solve_powernet, periods_per_day, set_window_inputs
+
+
+# Outputs of solve_powernet keyed by day (first field) rather than by hour (second field)
+day_keyed_outputs = ['system_cost', 'reduction']
+
+# Instance, solver and inputs of the process (set by _init_worker in the workers of the pool)
+_worker = {}
+
+
+def _init_worker(net_data, constraints, solver_name, solver_options, cache_dir):
+    #Each process builds its instance once (or loads it from the instance cache) and solves all its blocks with it
+    _worker['instance'] = _PowerNetPyomoModel(net_data).create_instance(constraints=constraints, cache_dir=cache_dir)
+    _worker['solver'] = SolverFactory(solver_name)
+    for key, value in (solver_options or {}).items():
+        _worker['solver'].options[key] = value
+    _worker['timeseries'] = net_data.timeseries
+    _worker['year'] = net_data.year
+
+
+def split_days(solns, D):
+    #{day: outputs of the day} of the outputs of solve_powernet over consecutive days of D hours (without their arrays)
+    names = [name for name in solns if name != 'arrays']
+    days = {}
+    for name in names:
+        for row in solns[name]:
+            day = row[0] if name in day_keyed_outputs else (row[1] - 1) // D + 1
+            days.setdefault(day, {key: [] for key in names})[name].append(row)
+    return days
+
+
+def end_commitment(day_solns, day, D):
+    #{unit: ini_on of the next day}, rounded from the on status of the last hour of the day as in solve_powernet
+    return {j: round(x) for j, i, x in day_solns['on'] if i == day*D}
+
+
+def set_ini_on(instance, ini_on):
+    for j, x in ini_on.items():
+        instance.ini_on[j] = x
+
+
+def predict_ini_on_lp(instance, solver, day, timeseries=None):
+    """
+    Predicted ini_on of day: the rounded on status of the last hour of the LP relaxation of the previous day,
+    solved from the ini_on currently set in instance. The commitment of the end of a day mostly follows its
+    demand, so the prediction rarely depends on the (unknown) state the previous day starts from.
+    """
+    D = periods_per_day(instance)
+    set_window_inputs(instance, (day-2)*D, timeseries)
+    relax_commitment(instance)
+    try:
+        solver.solve(instance)
+    finally:
+        relax_commitment(instance, relax=False)
+    return {j: round(pyo.value(instance.on[j,D])) for j in instance.Generators}
+
+
+def predicted_ini_on_from_run(on, D):
+    #{day: predicted ini_on} from the 'on' output of a previous run (e.g. of another year or formulation)
+    predicted = {}
+    for j, i, x in on:
+        if i % D == 0:
+            predicted.setdefault(i // D + 1, {})[j] = round(x)
+    return predicted
+
+
+def _solve_block(first_day, last_day, ini_on, predict, solve_kwds):
+    #Solved in a worker: the days of the block in sequence from ini_on, or from the LP prediction of the block's first day
+    instance, solver, timeseries = _worker['instance'], _worker['solver'], _worker['timeseries']
+    set_ini_on(instance, ini_on)
+    if predict:
+        ini_on = predict_ini_on_lp(instance, solver, first_day, timeseries)
+        set_ini_on(instance, ini_on)
+    t0 = time.perf_counter()
+    solns = solve_powernet(instance, None, solver, year=_worker['year'], start_day=first_day, last_day=last_day, timeseries=timeseries, **solve_kwds)
+    return ini_on, solns, time.perf_counter() - t0
+
+
+def solve_powernet_parallel(net_data, solver_name, start_day=1, last_day=365, workers=2, block_days=None,
+                            constraints={'logical': True, 'up_down_time': True, 'ramp_rate': True, 'capacity': True, 'power_balance': True, 'transmission': True, 'reserve_and_zero_sum': True},
+                            solver_options=None, predicted_ini_on=None, cache_dir=None, reduction=False, ptdf=None):
+    """
+    solve_powernet over the days of net_data, with blocks of consecutive days solved at the same time by a pool of
+    workers. Days are only coupled through ini_on, the on status of the last hour of the previous day, so each block
+    is started from a predicted ini_on: predicted_ini_on[day] if given (e.g. predicted_ini_on_from_run of a previous
+    run), otherwise the LP relaxation of the day before the block (see predict_ini_on_lp). The first block starts
+    from the ini_on of the data.
+
+    A reconciliation sweep then goes through the days in order and re-solves the days whose actual ini_on (from the
+    result of the previous day) differs from the one they were solved from, so the outputs are those of the
+    sequential run. Days of a block after a re-solved day stay valid as soon as the re-solved day ends in the same
+    commitment as before.
+
+    block_days: days of each block (default: the days split evenly over the workers); reduction and ptdf as in solve_powernet.
+    Returns the outputs of solve_powernet, with 'parallel' listing (Day, Resolved, Solve_s) of each day: whether the
+    day was re-solved by the sweep and the time of its block (first day) or re-solve.
+    The HorizonHours of net_data must be a day: a longer window is a rolling horizon, whose state at the end of a day
+    (run hours and last output, besides ini_on) is not reconciled between blocks.
+    """
+    D = net_data.SimHours // net_data.SimDays
+    if net_data.HorizonHours != D:
+        raise ValueError(f'solve_powernet_parallel needs a HorizonHours of one day ({D}), not {net_data.HorizonHours}')
+    n_days = last_day - start_day + 1
+    if block_days is None:
+        block_days = -(-n_days // workers)
+    blocks = [(first, min(first + block_days - 1, last_day)) for first in range(start_day, last_day+1, block_days)]
+    solve_kwds = {'reduction': reduction, 'ptdf': ptdf}
+
+    #instance of the main process: initial ini_on, hours per day and re-solves of the sweep
+    _init_worker(net_data, constraints, solver_name, solver_options, cache_dir)
+    instance, solver = _worker['instance'], _worker['solver']
+    D = periods_per_day(instance)
+    initial = {j: pyo.value(instance.ini_on[j]) for j in instance.Generators}
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(net_data, constraints, solver_name, solver_options, cache_dir)) as pool:
+        futures = []
+        for first, last in blocks:
+            given = first != start_day and predicted_ini_on is not None and first in predicted_ini_on
+            ini_on = predicted_ini_on[first] if given else initial
+            futures.append(pool.submit(_solve_block, first, last, ini_on, first != start_day and not given, solve_kwds))
+        results = [future.result() for future in futures]
+
+    #outputs and starting ini_on of each day
+    days = {}
+    started = {}
+    solve_s = {}
+    for (first, last), (ini_on, solns, elapsed) in zip(blocks, results):
+        days.update(split_days(solns, D))
+        started[first] = ini_on
+        solve_s[first] = elapsed
+        for day in range(first+1, last+1):
+            started[day] = end_commitment(days[day-1], day-1, D)
+
+    parallel = []
+    actual = initial
+    for day in range(start_day, last_day+1):
+        resolved = started[day] != actual
+        if resolved:
+            set_ini_on(instance, actual)
+            t0 = time.perf_counter()
+            days.update(split_days(solve_powernet(instance, None, solver, year=net_data.year, start_day=day, last_day=day, timeseries=net_data.timeseries, **solve_kwds), D))
+            solve_s[day] = time.perf_counter() - t0
+        parallel.append((day, int(resolved), solve_s.get(day, 0.0)))
+        actual = end_commitment(days[day], day, D)
+
+    solns = {name: [row for day in range(start_day, last_day+1) for row in days[day][name]] for name in days[start_day]}
+    solns['parallel'] = parallel
+    return solns
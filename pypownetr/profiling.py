@@ -0,0 +1,185 @@
+import json
+import time
+import logging
+import argparse
+import tracemalloc
+import pyomo.environ as pyo
+from pyomo.core.expr.visitor import identify_variables
+from .data import PowerNetDataCambodian
+from .model import _PowerNetPyomoModel
+
+
+class _BuildProfiler:
+    """
+    Records which attach_* block of a _PowerNetPyomoModel declares each component of the abstract model, with
+    the wall time and memory of the block, and then the construction time and memory of each component
+    in create_instance (from the construction timers that Pyomo logs, as for pyomo.common.timing.report_timing).
+    """
+    construction_logger = 'pyomo.common.timing.construction'
+
+    def __init__(self, pyomo_model):
+        self.pyomo_model = pyomo_model
+        self.blocks = []
+        self.component_blocks = {}
+        self.constructed = []
+
+
+    def _wrap(self, name, method):
+        def profiled(model, *args, **kwds):
+            names = set(model.component_map())
+            start_mem = tracemalloc.get_traced_memory()[0]
+            t0 = time.perf_counter()
+            try:
+                return method(model, *args, **kwds)
+            finally:
+                #times and memory of a block include those of the attach_* blocks it calls, but components
+                #declared by a nested block are already attributed to it
+                elapsed = time.perf_counter() - t0
+                for c in model.component_map():
+                    if c not in names and c not in self.component_blocks:
+                        self.component_blocks[c] = name
+                self.blocks.append({'block': name, 'declare_s': elapsed, 'declare_mb': (tracemalloc.get_traced_memory()[0] - start_mem) / 2**20})
+        return profiled
+
+
+    def create_model(self, rename_map, constraints):
+        #The attach_* methods are shadowed on the object for the time of the call
+        names = [name for name in dir(self.pyomo_model) if name.startswith('attach_')]
+        for name in names:
+            setattr(self.pyomo_model, name, self._wrap(name, getattr(self.pyomo_model, name)))
+        try:
+            model = self.pyomo_model.create_model(rename_map, constraints)
+        finally:
+            for name in names:
+                delattr(self.pyomo_model, name)
+        for c in model.component_map():
+            self.component_blocks.setdefault(c, 'create_model')
+        return model
+
+
+    def emit(self, record):
+        #Called by Pyomo when a component is constructed: its time, and the memory allocated and peak since the previous one
+        timer = record.msg
+        if not hasattr(timer, 'obj'):
+            return
+        current, peak = tracemalloc.get_traced_memory()
+        name = timer.obj.local_name if hasattr(timer.obj, 'local_name') else str(timer.obj)
+        self.constructed.append({'component': name, 'construct_s': timer.timer, 'construct_mb': (current - self._mem) / 2**20, 'construct_peak_mb': (peak - self._mem) / 2**20})
+        self._mem = current
+        tracemalloc.reset_peak()
+
+
+    def create_instance(self, model, model_data):
+        handler = logging.Handler()
+        handler.emit = self.emit
+        logger = logging.getLogger(self.construction_logger)
+        level, propagate = logger.level, logger.propagate
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        logger.addHandler(handler)
+        tracemalloc.reset_peak()
+        self._mem = tracemalloc.get_traced_memory()[0]
+        try:
+            return model.create_instance(model_data)
+        finally:
+            logger.removeHandler(handler)
+            logger.setLevel(level)
+            logger.propagate = propagate
+
+
+def component_sizes(instance):
+    """
+    Variables, constraints and nonzeros (variables in the constraint bodies and the objective) of each component.
+    """
+    sizes = {}
+    for var in instance.component_objects(pyo.Var, active=True):
+        sizes[var.local_name] = {'type': 'Var', 'variables': len(var), 'constraints': 0, 'nonzeros': 0}
+    for con in instance.component_objects(pyo.Constraint, active=True):
+        nonzeros = sum(len(list(identify_variables(c.body, include_fixed=False))) for c in con.values())
+        sizes[con.local_name] = {'type': 'Constraint', 'variables': 0, 'constraints': len(con), 'nonzeros': nonzeros}
+    for obj in instance.component_objects(pyo.Objective, active=True):
+        sizes[obj.local_name] = {'type': 'Objective', 'variables': 0, 'constraints': 0, 'nonzeros': len(list(identify_variables(obj.expr, include_fixed=False)))}
+    return sizes
+
+
+def profile_model_build(
+    pyomo_model,
+    rename_map={'imp_viet': 'Imp_Viet', 'imp_thai': 'Imp_Thai'},
+    constraints={'logical': True, 'up_down_time': True, 'ramp_rate': True, 'capacity': True, 'power_balance': True, 'transmission': True, 'reserve_and_zero_sum': True},
+    out_json=None):
+    """
+    Build report of a _PowerNetPyomoModel: for each attach_* block, the time and memory of declaring its components
+    in create_model and of constructing them in create_instance; for each component, its block, construction time and
+    memory, and its variables, constraints (one family per Constraint component) and nonzeros. Memory is that of the
+    Python allocations (tracemalloc) in MB. The report is written to out_json if given.
+    """
+    profiler = _BuildProfiler(pyomo_model)
+    started = tracemalloc.is_tracing()
+    if not started:
+        tracemalloc.start()
+    try:
+        t0 = time.perf_counter()
+        model = profiler.create_model(rename_map, constraints)
+        t1 = time.perf_counter()
+        model_data = pyomo_model.get_data_dict()
+        t2 = time.perf_counter()
+        instance = profiler.create_instance(model, model_data)
+        t3 = time.perf_counter()
+    finally:
+        if not started:
+            tracemalloc.stop()
+
+    sizes = component_sizes(instance)
+    components = []
+    for row in profiler.constructed:
+        if row['component'] not in profiler.component_blocks:
+            continue #the instance itself and implicit sets
+        row = dict(block=profiler.component_blocks[row['component']], **row)
+        row.update(sizes.get(row['component'], {'type': type(getattr(instance, row['component'])).__name__, 'variables': 0, 'constraints': 0, 'nonzeros': 0}))
+        components.append(row)
+
+    blocks = []
+    for block in profiler.blocks + [{'block': 'create_model', 'declare_s': None, 'declare_mb': None}]:
+        rows = [row for row in components if row['block'] == block['block']]
+        block = dict(block, construct_s=sum(row['construct_s'] for row in rows), construct_mb=sum(row['construct_mb'] for row in rows),
+                     construct_peak_mb=max([row['construct_peak_mb'] for row in rows], default=0.0))
+        for total in ['variables', 'constraints', 'nonzeros']:
+            block[total] = sum(row[total] for row in rows)
+        blocks.append(block)
+
+    report = {
+        'create_model_s': t1 - t0,
+        'data_dict_s': t2 - t1,
+        'create_instance_s': t3 - t2,
+        'variables': sum(row['variables'] for row in sizes.values()),
+        'constraints': sum(row['constraints'] for row in sizes.values()),
+        'nonzeros': sum(row['nonzeros'] for row in sizes.values()),
+        'blocks': blocks,
+        'components': components,
+    }
+    if out_json is not None:
+        with open(out_json, 'w') as f:
+            json.dump(report, f, indent=1)
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Profile the construction of the PyPowNet model')
+    parser.add_argument('data', type=str, help='Power system data')
+    parser.add_argument('out', type=str, help='Output .json report')
+    parser.add_argument('--year', type=int, default=2016, help='year of simulation (e.g. 2016)')
+    parser.add_argument('--network', type=str, default='angle', choices=['angle', 'ptdf', 'kron'], help='Network formulation')
+    parser.add_argument('--logical', type=str, default='big_m', choices=['big_m', 'tight'], help='Logical constraints formulation')
+    parser.add_argument('--up-down-time', type=str, default='pairwise', choices=['pairwise', 'aggregated'], help='Min up/down time formulation')
+    parser.add_argument('--top', type=int, default=10, help='Slowest components to print')
+    args = parser.parse_args()
+    constraints = {'logical': True if args.logical == 'big_m' else 'tight', 'up_down_time': True if args.up_down_time == 'pairwise' else 'aggregated',
+                   'ramp_rate': True, 'capacity': True, 'power_balance': True, 'transmission': True, 'reserve_and_zero_sum': True, 'network': args.network}
+    report = profile_model_build(_PowerNetPyomoModel(PowerNetDataCambodian(args.data, args.year)), constraints=constraints, out_json=args.out)
+    print(f"create_model {report['create_model_s']:.2f}s, data dict {report['data_dict_s']:.2f}s, create_instance {report['create_instance_s']:.2f}s: "
+          f"{report['variables']} variables, {report['constraints']} constraints, {report['nonzeros']} nonzeros")
+    for block in sorted(report['blocks'], key=lambda block: -block['construct_s']):
+        print(f"{block['block']:50s} {block['construct_s']:8.2f}s {block['construct_peak_mb']:8.1f}MB {block['constraints']:10d} constraints {block['nonzeros']:10d} nonzeros")
+    for row in sorted(report['components'], key=lambda row: -row['construct_s'])[:args.top]:
+        print(f"  {row['component']:48s} {row['construct_s']:8.2f}s {row['construct_mb']:8.1f}MB ({row['block']})")
+    print(f'Complete: report is saved to {args.out}')
@@ -0,0 +1,131 @@
+import numpy as np
+import pyomo.environ as pyo
+from pyomo.core import Constraint
+
+
+# (variable, Horizon param, capacity constraint) of the variable resources
+resource_capacities = [
+    ('hydro', 'HorizonHydro', 'HydroConstraint'),
+    ('hydro_import', 'HorizonHydroImport', 'HydroImportConstraint'),
+    ('solar', 'HorizonSolar', 'SolarConstraint'),
+    ('wind', 'HorizonWind', 'WindConstraint'),
+]
+
+# Variables of a unit
+unit_variables = ['on', 'switch', 'mwh', 'srsv', 'nrsv']
+
+
+def idle_units(instance):
+    #Units without capacity in the year (maxcap * deratef of 0): with the capacity constraints they never generate or offer reserves
+    if not hasattr(instance, 'MaxCap'):
+        return []
+    return [j for j in instance.Generators if pyo.value(instance.maxcap[j] * instance.deratef[j]) <= 0]
+
+
+def unit_constraints(instance):
+    #Constraint components indexed by unit first (all of their rows hold the variables of that unit only)
+    return [c for c in instance.component_objects(Constraint, active=True)
+            if c.is_indexed() and c.index_set().dimen and c.index_set().dimen > 1 and next(iter(c.index_set().subsets(expand_all_set_operators=False))) is instance.Generators]
+
+
+def line_flow_bounds(instance, ptdf):
+    """
+    Data to bound the flow of the lines with a limit (see never_binding_line_limits): their PTDF over the nodes of
+    the instance, the thermal capacity at each node and the nodes of the hydro resources (solar and wind are not
+    part of the balances). None if the capacities are not constrained in the model.
+    """
+    if not hasattr(instance, 'MaxCap') or not hasattr(instance, 'MaxLineConstraint'):
+        return None
+    nodes = list(instance.nodes)
+    position = {z: n for n, z in enumerate(nodes)}
+    lines = [(s, k) for s, k in instance.lines if pyo.value(instance.linemva[s,k]) > 0]
+    thermal = np.zeros(len(nodes))
+    for j in instance.Generators:
+        thermal[position[instance.node[j]]] += pyo.value(instance.maxcap[j] * instance.deratef[j])
+    resources = [(horizon, [(position[z], z) for z in getattr(instance, node_set)])
+                 for horizon, node_set in [('HorizonHydro', 'h_nodes'), ('HorizonHydroImport', 'h_imports')] if hasattr(instance, horizon)]
+    demand = [(position[z], z) for z in instance.d_nodes]
+    return {'lines': lines, 'factors': ptdf.loc[lines, nodes].to_numpy(), 'thermal': thermal, 'resources': resources, 'demand': demand}
+
+
+def never_binding_line_limits(instance, bounds):
+    """
+    Rows of the active line limits that no dispatch of the window can reach. The flow of a line
+    is sum(ptdf[z] * ((1 - TransLoss) * supply[z,i] - HorizonDemand[z,i])) with each supply between 0 and its
+    capacity, so its range follows from the positive and negative factors.
+    """
+    H = pyo.value(instance.HorizonHours)
+    K = range(1, H+1)
+    factors = bounds['factors']
+    capacity = np.repeat(bounds['thermal'][:, None], H, axis=1)
+    for horizon, nodes in bounds['resources']:
+        param = getattr(instance, horizon)
+        for n, z in nodes:
+            capacity[n] += [pyo.value(param[z,i]) for i in K]
+    demand = np.zeros_like(capacity)
+    for n, z in bounds['demand']:
+        demand[n] = [pyo.value(instance.HorizonDemand[z,i]) for i in K]
+    supply = (1 - pyo.value(instance.TransLoss)) * capacity
+    base = factors @ demand
+    upper = np.clip(factors, 0, None) @ supply - base
+    lower = np.clip(factors, None, 0) @ supply - base
+
+    unreachable = []
+    n1criterion = pyo.value(instance.n1criterion)
+    for l, (s, k) in enumerate(bounds['lines']):
+        limit = n1criterion * pyo.value(instance.linemva[s,k])
+        for i in K:
+            if upper[l, i-1] <= limit and instance.MaxLineConstraint[s,k,i].active:
+                unreachable.append(instance.MaxLineConstraint[s,k,i])
+            if lower[l, i-1] >= -limit and instance.MinLineConstraint[s,k,i].active:
+                unreachable.append(instance.MinLineConstraint[s,k,i])
+    return unreachable
+
+
+def reduce_window(instance, idle=(), families=(), bounds=None, tol=1e-9):
+    """
+    Reduce the window loaded in instance before it is solved:
+    - the variables of the idle units (see idle_units) are fixed to 0 in hours 1..H and their rows of the unit
+      constraint families (see unit_constraints) are deactivated;
+    - each hour of a variable resource without capacity (Horizon value of 0) fixes its dispatch to 0 and
+      deactivates its capacity row;
+    - the line limits that cannot bind (see never_binding_line_limits, if bounds are given) are deactivated.
+    Fixed variables are left out of the problem passed to the solver and keep their value of 0 in the outputs.
+    Returns the fixed variables and deactivated constraints, to undo with restore_window.
+    """
+    H = pyo.value(instance.HorizonHours)
+    fixed = []
+    deactivated = []
+    for j in idle:
+        for name in unit_variables:
+            var = getattr(instance, name)
+            fixed += [var[j,i] for i in range(1, H+1) if not var[j,i].fixed]
+    idle = set(idle)
+    for con in families:
+        deactivated += [c for index, c in con.items() if index[0] in idle and index[1] > 0 and c.active]
+
+    for var_name, horizon_name, con_name in resource_capacities:
+        if hasattr(instance, var_name) and hasattr(instance, con_name):
+            var, horizon, con = getattr(instance, var_name), getattr(instance, horizon_name), getattr(instance, con_name)
+            for (z, i), c in con.items():
+                if pyo.value(horizon[z,i]) <= tol and c.active:
+                    deactivated.append(c)
+                    if not var[z,i].fixed:
+                        fixed.append(var[z,i])
+
+    if bounds is not None:
+        deactivated += never_binding_line_limits(instance, bounds)
+
+    for var in fixed:
+        var.fix(0)
+    for c in deactivated:
+        c.deactivate()
+    return fixed, deactivated
+
+
+def restore_window(reduced):
+    fixed, deactivated = reduced
+    for var in fixed:
+        var.unfix()
+    for c in deactivated:
+        c.activate()
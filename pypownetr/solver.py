@@ -1,167 +1,450 @@
 import os
+import time
 from pyomo.opt import SolverFactory
-from pyomo.core import Var
 from pyomo.core import Param
 from operator import itemgetter
+from itertools import repeat
+import numpy as np
 import pandas as pd
 from datetime import datetime
 import pyomo.environ as pyo
-from .model import PowerNetPyomoModelCambodian
+from pyomo.core import Constraint
+from pyomo.common.collections import ComponentMap
+from pyomo.core.expr.visitor import identify_mutable_parameters
+from pyomo.repn import generate_standard_repn
+from pyomo.solvers.plugins.solvers.persistent_solver import PersistentSolver
+from .data import PowerNetDataCambodian, PowerNetDataCambodianYears
+from .model import _PowerNetPyomoModel
+from .heuristic import solve_day_heuristic
+from .warmstart import enable_warm_start, previous_commitment, build_warm_start
+from .reduction import idle_units, unit_constraints, line_flow_bounds, reduce_window, restore_window
+from .network import expand_equivalent_angles
+from .checkpoint import save_checkpoint, load_checkpoint, carry_over_state, restore_carry_over_state
 import argparse
 
 
-def solve_powernet(pyomo_model, model_data_path, solver, year=2016, start_day=1, last_day=365):
+# (Horizon param, Sim param, node set, TimeSeriesStore series) of the hourly inputs
+horizon_inputs = [
+    ('HorizonDemand', 'SimDemand', 'd_nodes', 'load'),
+    ('HorizonHydro', 'SimHydro', 'h_nodes', 'hydro'),
+    ('HorizonSolar', 'SimSolar', 's_nodes', 'solar'),
+    ('HorizonWind', 'SimWind', 'w_nodes', 'wind'),
+    ('HorizonHydroImport', 'SimHydroImport', 'h_imports', 'hydro_import'),
+]
+
+
+def periods_per_day(instance):
+    #Hours (periods) of a simulation day, which the horizon may exceed
+    return pyo.value(instance.SimHours) // pyo.value(instance.SimDays)
+
+
+def set_window_inputs(instance, offset, timeseries=None):
+    """
+    Load the demand, reserve and variable resource series of the window starting after simulation hour offset
+    into the Horizon params, either from the Sim params of the instance or from a TimeSeriesStore.
+    Hours of a lookahead past the end of the simulation period repeat its last hour.
+    """
+    H = pyo.value(instance.HorizonHours)
+    last = pyo.value(instance.SimHours)
+    K = range(1, H+1)
+    if timeseries is None:
+        if hasattr(instance, 'd_nodes'):
+            for i in K:
+                instance.HorizonReserves[i] = instance.SimReserves[min(offset+i, last)]
+        for horizon_name, sim_name, node_set, _ in horizon_inputs:
+            if hasattr(instance, node_set) and hasattr(instance, horizon_name):
+                horizon_param = getattr(instance, horizon_name)
+                sim_param = getattr(instance, sim_name)
+                for z in getattr(instance, node_set):
+                    for i in K:
+                        horizon_param[z, i] = sim_param[z, min(offset+i, last)]
+        return
+
+    def read_window(series, nodes=None):
+        window = timeseries.window(series, offset, min(offset+H, last), nodes)
+        return np.pad(window, ((0, 0), (0, H - window.shape[1])), mode='edge')
+
+    if hasattr(instance, 'd_nodes'):
+        reserves = read_window('reserves')[0]
+        for i in K:
+            instance.HorizonReserves[i] = float(reserves[i-1])
+    for horizon_name, _, node_set, series in horizon_inputs:
+        if hasattr(instance, node_set) and hasattr(instance, horizon_name):
+            horizon_param = getattr(instance, horizon_name)
+            nodes = list(getattr(instance, node_set))
+            window = read_window(series, nodes)
+            for n, z in enumerate(nodes):
+                for i in K:
+                    horizon_param[z, i] = float(window[n, i-1])
+
+
+def set_horizon_inputs(instance, day, timeseries=None):
+    """
+    Load the demand, reserve and variable resource series of the window starting with a day into the Horizon params
+    (see set_window_inputs).
+    """
+    set_window_inputs(instance, (day-1)*periods_per_day(instance), timeseries)
+
+
+def update_rolling_state(instance, state, hours):
+    """
+    State of each unit at the end of the first hours of the window loaded in instance, from the state at its start:
+    {unit: (on, hours in that on/off state, mwh)}. The hours in state are None while the run started before the
+    first window (unknown, so not bounded by the min up/down times). state is None for the first window.
+    """
+    new_state = {}
+    for j in instance.Generators:
+        on, run, _ = state[j] if state is not None else (round(pyo.value(instance.ini_on[j])), None, None)
+        for i in range(1, hours+1):
+            x = round(instance.on[j,i].value)
+            if x != on:
+                run = 1
+            elif run is not None:
+                run += 1
+            on = x
+        new_state[j] = (on, run, instance.mwh[j,hours].value)
+    return new_state
+
+
+def set_carry_over_bounds(instance, state):
+    """
+    Bound the first hours of a window by the state at the end of the previous step (see update_rolling_state),
+    as the in-window constraints would: a run started less than minup-1 (mindn-1) hours ago keeps the unit on (off)
+    and the output of hour 1 is within the ramp of the last output. Bounds are set on the variables, the model being
+    shared by all windows. Returns the previous bounds to restore with restore_bounds (in a ComponentMap, since
+    Pyomo variables are not hashable).
+    """
+    H = pyo.value(instance.HorizonHours)
+    saved = ComponentMap()
+    for j, (on, run, mwh) in state.items():
+        if run is not None:
+            remaining = (pyo.value(instance.minup[j]) if on else pyo.value(instance.mindn[j])) - 1 - run
+            for i in range(1, int(min(remaining, H))+1):
+                saved[instance.on[j,i]] = instance.on[j,i].bounds
+                instance.on[j,i].setlb(on)
+                instance.on[j,i].setub(on)
+        if hasattr(instance, 'RampCon1'):
+            var = instance.mwh[j,1]
+            saved[var] = lb, ub = var.bounds
+            ramp = pyo.value(instance.ramp[j])
+            var.setlb(max(lb or 0, mwh - ramp))
+            var.setub(mwh + ramp if ub is None else min(ub, mwh + ramp))
+    return saved
+
+
+def restore_bounds(saved):
+    for var, (lb, ub) in saved.items():
+        var.setlb(lb)
+        var.setub(ub)
+
+
+def committed_cost(instance, hours):
+    #Part of the system cost incurred in the first hours of the window
+    repn = generate_standard_repn(instance.SystemCost.expr, compute_values=True)
+    return sum(coef * var.value for coef, var in zip(repn.linear_coefs, repn.linear_vars) if var.index()[1] <= hours)
+
+
+# Variables in the outputs of solve_powernet, with the set of their units or nodes (None: the nodes of the voltage angles)
+output_variables = [('on', 'Generators'), ('switch', 'Generators'), ('mwh', 'Generators'), ('hydro', 'h_nodes'), ('solar', 's_nodes'),
+                    ('wind', 'w_nodes'), ('hydro_import', 'h_imports'), ('srsv', 'Generators'), ('nrsv', 'Generators'), ('vlt_angle', None)]
+
+
+def extraction_index(instance, extract=None, hours=24):
+    """
+    {variable: (units or nodes, variables of hours 1..hours)} of the output variables in extract (default: all of
+    them) that the instance has. Variables are listed hour by hour, so their values reshape to (hour x unit).
+    """
+    names = [name for name, _ in output_variables]
+    if extract is not None and set(extract) - set(names):
+        raise ValueError(f'Unknown output variables {sorted(set(extract) - set(names))} (expected some of {names})')
+    index = {}
+    for name, node_set in output_variables:
+        if (extract is not None and name not in extract) or not hasattr(instance, name):
+            continue
+        if node_set is None:
+            node_set = 'bus_nodes' if hasattr(instance, 'bus_nodes') else 'nodes'
+        keys = list(getattr(instance, node_set))
+        var = getattr(instance, name)
+        index[name] = (keys, [var[z,i] for i in range(1, hours+1) for z in keys])
+    return index
+
+
+def extract_values(variables, hours, n_keys):
+    #(hour x unit) values of the variables of extraction_index (nan for variables without a value)
+    return np.array([v.value for v in variables], dtype=float).reshape(hours, n_keys)
+
+
+def output_tuples(keys, values, offsets, end):
+    """
+    (unit or node, hour, value) tuples of a (step x hour x unit) array of solve_powernet, for the steps starting
+    after the hours in offsets and the hours before end, in the order of the outputs: step, unit, hour.
+    """
+    rows = []
+    step = values.shape[1]
+    for k, offset in enumerate(offsets):
+        committed = min(step, end - offset)
+        hours = range(offset+1, offset+committed+1)
+        for key, row in zip(keys, values[k, :committed].T.tolist()):
+            rows += zip(repeat(key), hours, row)
+    return rows
+
+
+# Change detection of persistent solvers that is not needed between days (only mutable param values change)
+persistent_skipped_updates = [
+    'check_for_new_or_removed_constraints', 'check_for_new_or_removed_vars', 'check_for_new_or_removed_params',
+    'check_for_new_objective', 'update_constraints', 'update_vars', 'update_named_expressions', 'update_objective']
+
+
+def set_persistent_instance(solver, instance):
+    """
+    Hand the instance to a persistent solver once. Between days only the values of the mutable params
+    (the Horizon inputs and ini_on) change, so the solver is told to skip its scans for new, removed or
+    modified components and to push the param values only.
+    Returns the function to call before each solve:
+    - appsi solvers (e.g. appsi_highs) and pyomo.contrib.solver solvers (e.g. highs) track the params and
+      update the coefficients and right-hand sides in place on solve(), so there is nothing to do;
+    - legacy persistent solvers (e.g. gurobi_persistent, cplex_persistent) do not, so the constraints
+      holding mutable params are removed and added again.
+    """
+    if hasattr(solver, 'update_config'): #appsi
+        solver.set_instance(instance)
+        for option in persistent_skipped_updates:
+            setattr(solver.update_config, option, False)
+        solver.update_config.update_params = True
+        return lambda: None
+    if hasattr(solver, 'config') and hasattr(solver.config, 'auto_updates'): #pyomo.contrib.solver
+        solver.set_instance(instance)
+        for option in persistent_skipped_updates:
+            setattr(solver.config.auto_updates, option, False)
+        solver.config.auto_updates.update_parameters = True
+        return lambda: None
+    if isinstance(solver, PersistentSolver):
+        solver.set_instance(instance)
+        mutable_cons = [c for c in instance.component_data_objects(Constraint, active=True) if any(True for _ in identify_mutable_parameters(c.expr))]
+        def push_updates():
+            for c in mutable_cons:
+                solver.remove_constraint(c)
+                solver.add_constraint(c)
+        return push_updates
+    raise ValueError(f'{type(solver).__name__} is not a persistent solver')
+
+
+# Line limits left out of the model until violated by the lazy_lines loop of solve_powernet
+line_limit_constraints = ['MaxLineConstraint', 'MinLineConstraint']
+
+
+def violated_line_limits(instance, tol=1e-6):
+    """
+    (constraint name, index) of the inactive line limits violated by the loaded solution, i.e. of the
+    lines whose flow exceeds n1criterion * linemva in either direction (tol is relative to the limit).
+    """
+    violated = []
+    for name in line_limit_constraints:
+        con = getattr(instance, name)
+        for index in con:
+            if con[index].active:
+                continue
+            flow = pyo.value(con[index].body)
+            upper = pyo.value(con[index].upper) if con[index].has_ub() else None
+            lower = pyo.value(con[index].lower) if con[index].has_lb() else None
+            if (upper is not None and flow > upper + tol*max(1, abs(upper))) or (lower is not None and flow < lower - tol*max(1, abs(lower))):
+                violated.append((name, index))
+    return violated
+
+
+def solve_powernet(pyomo_model, model_data, solver, year=2016, start_day=1, last_day=365, timeseries=None, persistent=False, lazy_lines=False, heuristic=False, heuristic_max_gap=None, warm_start=False, step=None, reduction=False, ptdf=None, network_equivalent=None, checkpoint=None, checkpoint_every=1, resume=False, extract=None):
     """
     simulation year, start(1-365) and end(1-365) days of simulation
+    model_data is either the path of a .dat file or a Pyomo data dict (see get_data_dict), or None when pyomo_model
+    is already an instance (e.g. from _PowerNetPyomoModel.create_instance with a cache_dir)
+    timeseries: TimeSeriesStore to read the hourly inputs of each day from (for models built without Sim params)
+    persistent: hand the model to a persistent solver once and push only the changed params each day (see set_persistent_instance)
+    lazy_lines: start without line limits, add the limits violated by each solution and re-solve until the flows
+    are feasible; limits added on a day stay in the model for the following days. The iterations, added and
+    active limits of each day are returned as 'line_limits'.
+    heuristic: dispatch from a repaired rounding of the LP relaxation instead of the MIP (see heuristic.solve_day_heuristic);
+    days whose gap to the LP bound exceeds heuristic_max_gap (if given) are solved as MIPs. The LP bound, cost, gap and
+    step that gave the dispatch ('rounded', 'partial_mip' or 'mip') of each day are returned as 'heuristic'.
+    warm_start: seed each day's MIP with an incumbent built from the previous day's commitment (see warmstart.build_warm_start);
+    whether a day was warm started, the time to build its incumbent and the time of its MIP solve are returned as 'warm_start'.
+    step: rolling horizon committing the first step hours of each window of HorizonHours (set in the model data,
+    e.g. 48 or 72) and moving on by step hours. Only the committed hours are recorded, and the on status, the hours
+    since the last switch and the last output of each unit carry over to the next window (see set_carry_over_bounds).
+    The system cost of each step is the cost of its committed hours and the outputs are keyed by step instead of day.
+    Without step, windows move on by one day: with a HorizonHours of one day each day is solved on its own window
+    as before, and a longer HorizonHours is a lookahead of which only the day is committed.
+    reduction: before each solve, fix the variables of the idle units and of the resources without capacity to 0 and
+    leave out their rows, and the line limits that cannot bind if the PTDF of the lines is given as ptdf
+    (net_data.get_ptdf()); see reduction.reduce_window. The fixed variables and left out constraints of each day
+    are returned as 'reduction'.
+    network_equivalent: for models built with the 'kron' network (see network.kron_reduction), the equivalent of
+    net_data.get_network_equivalent(); the angles of the eliminated nodes are added to 'vlt_angle' and the flows
+    of all lines are returned as 'line_flow'.
+    checkpoint: path of a file where the outputs so far and the state carried over to the next day (ini_on, the rolling
+    horizon state, the last commitment and the line limits added by lazy_lines; see checkpoint.carry_over_state) are
+    saved every checkpoint_every days (or steps) and after the last one. With resume, a run continues after the last
+    day saved in checkpoint (the same start_day, last_day, step and extract) and returns the outputs of all days. The solves of
+    persistent solvers may start from another basis after a resume.
+    extract: output variables to record (see output_variables; default: all of them), the others are returned empty.
+    Their values are also returned in 'arrays' as {variable: (units or nodes, step x hour x unit array)}, with nan
+    for the hours past last_day.
     """
-    #model_data_path = 'temp.dat'
-    #print(f'Save the transformed model data to {model_data_path}')
-    
-    instance = pyomo_model.create_instance(model_data_path)
+    instance = pyomo_model if model_data is None else pyomo_model.create_instance(model_data)
+    push_updates = None
+    if heuristic and (persistent or lazy_lines):
+        raise ValueError('heuristic cannot be combined with persistent or lazy_lines')
+    if warm_start and (persistent or heuristic):
+        raise ValueError('warm_start cannot be combined with persistent or heuristic')
+    H = pyo.value(instance.HorizonHours)
+    D = periods_per_day(instance)
+    #a window longer than a day is a rolling horizon even without step
+    rolling = step is not None or H != D
+    if rolling and (persistent or heuristic or warm_start):
+        raise ValueError('step (or a HorizonHours other than a day) cannot be combined with persistent, heuristic or warm_start')
+    if reduction and persistent:
+        raise ValueError('reduction cannot be combined with persistent')
+    warm_start_kwds = enable_warm_start(solver) if warm_start else {}
+    if lazy_lines:
+        if not all(hasattr(instance, name) for name in line_limit_constraints):
+            raise ValueError('lazy_lines needs a model with the transmission constraints')
+        if persistent and not hasattr(solver, 'add_constraints'):
+            raise ValueError(f'lazy_lines cannot add constraints to {type(solver).__name__} (use an appsi or pyomo.contrib.solver solver)')
+        for name in line_limit_constraints:
+            for c in getattr(instance, name).values():
+                c.deactivate()
 
     ###solver and number of threads to use for simulation
-    H = instance.HorizonHours
-    K = range(1, H+1)
+    if step is None:
+        step = D
+    if not 0 < step <= H:
+        raise ValueError(f'step must be between 1 and HorizonHours ({H})')
+    state = None
+
+    if reduction:
+        #idle units and the data bounding the line flows do not change within a year
+        idle = idle_units(instance)
+        families = unit_constraints(instance) if idle else []
+        flow_bounds = line_flow_bounds(instance, ptdf) if ptdf is not None else None
 
     ###Run simulation and save outputs
-    #Containers to store results
-    on = []
-    switch = []
+    #Arrays of the variables (step x hour x unit or node), filled from indices collected once (see extraction_index)
+    extraction = extraction_index(instance, extract, step)
+    offsets = list(range((start_day-1)*D, last_day*D, step))
+    arrays = {name: np.full((len(offsets), step, len(keys)), np.nan) for name, (keys, _) in extraction.items()}
 
-    mwh = []
-    hydro = []
-    solar = []
-    wind = []
+    #Containers of the other outputs
+    system_cost = []
 
-    hydro_import = []
+    line_limits = []
 
-    srsv = []
-    nrsv = []
+    heuristic_days = []
 
-    vlt_angle = []
+    warm_start_days = []
 
-    system_cost = []
+    reduced_days = []
 
-    for day in range(start_day, last_day+1):
-        if hasattr(instance, 'd_nodes'):
-            for z in instance.d_nodes:
-                # Load Demand and Reserve time series data
-                for i in K:
-                    instance.HorizonDemand[z, i] = instance.SimDemand[z, (day-1)*24+i]
-                    instance.HorizonReserves[i] = instance.SimReserves[(day-1)*24+i] 
-                
-        if hasattr(instance, 'h_nodes'):
-            for z in instance.h_nodes:
-                # Load Hydropower time series data
-                for i in K:
-                    instance.HorizonHydro[z, i] = instance.SimHydro[z, (day-1)*24+i]
-                
-        if hasattr(instance, 's_nodes'):
-            for z in instance.s_nodes:
-                # Load Solar time series data
-                for i in K:
-                    instance.HorizonSolar[z, i] = instance.SimSolar[z, (day-1)*24+i]
-                
-        if hasattr(instance, 'w_nodes'):
-            for z in instance.w_nodes:
-                # Load Wind time series data
-                for i in K:
-                    instance.HorizonWind[z, i] = instance.SimWind[z, (day-1)*24+i]
-                
-        if hasattr(instance, 'h_imports'):
-            for z in instance.h_imports:
-                # Load Hydropower time series data
-                for i in K:
-                    instance.HorizonHydroImport[z,i] = instance.SimHydroImport[z,(day-1)*24+i]     
-        
-        result = solver.solve(instance) ##,tee=True to check number of variables
-        # instance.display()
-        instance.solutions.load_from(result)
-        system_cost.append((day, instance.SystemCost.value()))
+    outputs = {'system_cost': system_cost, 'line_limits': line_limits, 'heuristic': heuristic_days, 'warm_start': warm_start_days, 'reduction': reduced_days}
+    run = {'start_day': start_day, 'last_day': last_day, 'step': step, 'extract': extract}
+    lazy_limits = line_limit_constraints if lazy_lines else ()
+    first_offset = (start_day-1)*D
+    saved = load_checkpoint(checkpoint) if checkpoint is not None and resume else None
+    if saved is not None:
+        if saved['run'] != run:
+            raise ValueError(f"checkpoint {checkpoint} is of another run ({saved['run']})")
+        for name, rows in saved['outputs'].items():
+            outputs[name].extend(rows)
+        for name, values in saved['arrays'].items():
+            arrays[name][:] = values
+        restore_carry_over_state(instance, saved['carry_over'], lazy_limits)
+        state = saved['rolling_state']
+        first_offset = saved['next_offset']
+
+    for n_done, offset in enumerate(range(first_offset, last_day*D, step), 1):
+        #hours committed from the window, and the day (or step) keying its outputs
+        committed = min(step, last_day*D - offset)
+        day = offset // step + 1
+        set_window_inputs(instance, offset, timeseries)
+        saved_bounds = set_carry_over_bounds(instance, state) if state is not None else {}
+        if reduction:
+            reduced = reduce_window(instance, idle, families, flow_bounds)
+            reduced_days.append((day, len(reduced[0]), len(reduced[1])))
+        if persistent and push_updates is None:
+            #handed to the solver once the inputs of the first day are set
+            push_updates = set_persistent_instance(solver, instance)
+        elif persistent:
+            push_updates()
+
+        if heuristic:
+            heuristic_days.append((day,) + solve_day_heuristic(instance, solver, heuristic_max_gap))
+        elif warm_start:
+            #the previous day's solution is still loaded (none on the first day)
+            schedules = previous_commitment(instance)
+            t0 = time.perf_counter()
+            warm = schedules is not None and build_warm_start(instance, solver, schedules)
+            t1 = time.perf_counter()
+            result = solver.solve(instance, **(warm_start_kwds if warm else {}))
+            instance.solutions.load_from(result)
+            warm_start_days.append((day, int(warm), t1 - t0, time.perf_counter() - t1))
+        else:
+            result = solver.solve(instance) ##,tee=True to check number of variables
+            # instance.display()
+            instance.solutions.load_from(result)
+        if lazy_lines:
+            iterations, added = 1, 0
+            violated = violated_line_limits(instance)
+            while violated:
+                cons = [getattr(instance, name)[index] for name, index in violated]
+                for c in cons:
+                    c.activate()
+                if persistent:
+                    solver.add_constraints(cons)
+                added += len(cons)
+                result = solver.solve(instance)
+                instance.solutions.load_from(result)
+                iterations += 1
+                violated = violated_line_limits(instance)
+            active = sum(c.active for name in line_limit_constraints for c in getattr(instance, name).values())
+            line_limits.append((day, iterations, added, active))
+        restore_bounds(saved_bounds)
+        if reduction:
+            restore_window(reduced)
+        system_cost.append((day, committed_cost(instance, committed) if rolling else pyo.value(instance.SystemCost)))
     
-        #The following section is for storing and sorting results
-        for v in instance.component_objects(Var, active=True):
-            varobject = getattr(instance, str(v))
-            a = str(v)
-            if a=='hydro':      
-                for index in varobject:
-                    if int(index[1]>0 and index[1]<25):
-                        if index[0] in instance.h_nodes:
-                            hydro.append((index[0],index[1]+((day-1)*24),varobject[index].value))
-
-            elif a=='solar':
-                for index in varobject:
-                    if int(index[1]>0 and index[1]<25):
-                        if index[0] in instance.s_nodes:
-                            solar.append((index[0],index[1]+((day-1)*24),varobject[index].value))   
-
-            elif a=='wind':
-                for index in varobject:
-                    if int(index[1]>0 and index[1]<25):
-                        if index[0] in instance.w_nodes:
-                            wind.append((index[0],index[1]+((day-1)*24),varobject[index].value))   
-
-            elif a=='hydro_import':      
-                for index in varobject:
-                    if int(index[1]>0 and index[1]<25):
-                        if index[0] in instance.h_imports:
-                            hydro_import.append((index[0],index[1]+((day-1)*24),varobject[index].value))   
-
-            elif a=='vlt_angle':
-                for index in varobject:
-                    if int(index[1]>0 and index[1]<25):
-                        if index[0] in instance.nodes:
-                            vlt_angle.append((index[0],index[1]+((day-1)*24),varobject[index].value))   
-
-            elif a=='mwh':  
-                for index in varobject:
-                    if int(index[1]>0 and index[1]<25):
-                        mwh.append((index[0],index[1]+((day-1)*24),varobject[index].value))                            
-
-            elif a=='on':       
-                ini_on_ = {}  
-                for index in varobject:
-                    if int(index[1]>0 and index[1]<25):
-                        on.append((index[0],index[1]+((day-1)*24),varobject[index].value))
-                    if int(index[1])==24:
-                        ini_on_[index[0]] = varobject[index].value    
-
-            elif a=='switch':  
-                for index in varobject:
-                    if int(index[1]>0 and index[1]<25):
-                        switch.append((index[0],index[1]+((day-1)*24),varobject[index].value))
-
-            elif a=='srsv':    
-                for index in varobject:
-                    if int(index[1]>0 and index[1]<25):
-                        srsv.append((index[0],index[1]+((day-1)*24),varobject[index].value))
-                            
-            elif a=='nrsv':   
-                for index in varobject:
-                    if int(index[1]>0 and index[1]<25):
-                        nrsv.append((index[0],index[1]+((day-1)*24),varobject[index].value))                             
-        
+        #Values of the committed hours
+        k = (offset - offsets[0]) // step
+        for name, (keys, variables) in extraction.items():
+            arrays[name][k, :committed] = extract_values(variables, step, len(keys))[:committed]
+        ini_on_ = {j: instance.on[j,committed].value for j in instance.Generators}
+
+        if rolling:
+            state = update_rolling_state(instance, state, committed)
+
         # Update initialization values for "on" 
         for z in instance.Generators:
             instance.ini_on[z] = round(ini_on_[z])
 
         
+        if checkpoint is not None and (n_done % checkpoint_every == 0 or offset + step >= last_day*D):
+            save_checkpoint(checkpoint, {'run': run, 'next_offset': offset + step, 'outputs': outputs, 'arrays': arrays, 'rolling_state': state,
+                                         'carry_over': carry_over_state(instance, lazy_limits)})
+
         print(day)
         print(str(datetime.now()))
 
-    return {
-        'on': on,
-        'switch': switch, 
-        'mwh': mwh,
-        'hydro': hydro, 
-        'solar': solar, 
-        'wind': wind, 
-        'hydro_import': hydro_import, 
-        'srsv': srsv, 
-        'nrsv': nrsv, 
-        'vlt_angle': vlt_angle,
-        'system_cost': system_cost
-    }
+    solns = {name: output_tuples(extraction[name][0], arrays[name], offsets, last_day*D) if name in extraction else [] for name, _ in output_variables}
+    solns['system_cost'] = system_cost
+    solns['arrays'] = {name: (extraction[name][0], values) for name, values in arrays.items()}
+    if network_equivalent is not None:
+        solns['vlt_angle'], solns['line_flow'] = expand_equivalent_angles(solns['vlt_angle'], network_equivalent)
+    if lazy_lines:
+        solns['line_limits'] = line_limits
+    if heuristic:
+        solns['heuristic'] = heuristic_days
+    if warm_start:
+        solns['warm_start'] = warm_start_days
+    if reduction:
+        solns['reduction'] = reduced_days
+    return solns
 
 
 def save_node_result(soln_data, out_csv_fpath, cols):
@@ -170,31 +453,124 @@ def save_node_result(soln_data, out_csv_fpath, cols):
     soln_pd.to_csv(out_csv_fpath)
 
 
+def save_solns(solns, csv_prefix):
+    #Save each output of solve_powernet to {csv_prefix}_{output}.csv
+    for soln_node in solns:
+        csv_path = f'{csv_prefix}_{soln_node}.csv'
+        if soln_node in ['hydro', 'hydro_import', 'solar', 'wind', 'vlt_angle']:
+            save_node_result(solns[soln_node], csv_path, ('Node','Time','Value'))
+        elif soln_node in ['mwh', 'on', 'switch', 'srsv', 'nrsv']:
+            save_node_result(solns[soln_node], csv_path, ('Generator','Time','Value'))
+        elif soln_node == 'line_flow':
+            save_node_result(solns[soln_node], csv_path, ('Source','Sink','Time','Value'))
+        elif soln_node == 'line_limits':
+            save_node_result(solns[soln_node], csv_path, ('Day','Iterations','Added','Active'))
+        elif soln_node == 'heuristic':
+            save_node_result(solns[soln_node], csv_path, ('Day','Bound','Cost','Gap','Step'))
+        elif soln_node == 'warm_start':
+            save_node_result(solns[soln_node], csv_path, ('Day','Warm','Repair_s','Solve_s'))
+        elif soln_node == 'reduction':
+            save_node_result(solns[soln_node], csv_path, ('Day','Fixed','Deactivated'))
+        elif soln_node == 'arrays':
+            np.savez(f'{csv_prefix}_arrays.npz', **{name: values for name, (_, values) in solns[soln_node].items()},
+                     **{f'{name}_keys': np.array(keys, dtype=str) for name, (keys, _) in solns[soln_node].items()})
+        elif soln_node == 'parallel':
+            save_node_result(solns[soln_node], csv_path, ('Day','Resolved','Solve_s'))
+        else:
+            save_node_result(solns[soln_node], csv_path, ('Time','Value'))
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Run PyPowNet Solving Procedure')
     parser.add_argument('data', type=str, default=os.path.join("datasets", "kamal0013", "camb_2016"), help='Power system data')
     parser.add_argument('year', type=int, help='year of simulation (e.g. 2016)')
-    parser.add_argument('start', type=int, help='start day of simulation (1-365)')
-    parser.add_argument('last', type=int, help='last day of simulation (1-365)')
-    parser.add_argument('run_no', type=int, help='Run number')
-    parser.add_argument('solver', type=str, help='Solver used by Pyomo Solver Factory (e.g. glpk, gurobi, cplex)')
+    parser.add_argument('start', type=int, nargs='?', default=1, help='start day of simulation (1-365)')
+    parser.add_argument('last', type=int, nargs='?', default=365, help='last day of simulation (1-365)')
+    parser.add_argument('run_no', type=int, nargs='?', default=1, help='Run number')
+    parser.add_argument('solver', type=str, nargs='?', default='glpk', help='Solver used by Pyomo Solver Factory (e.g. glpk, gurobi, cplex)')
+    parser.add_argument('--years', type=int, nargs='+', default=None, help='Sweep over these years instead of year, reading the static data once (e.g. 2016 2017 2018)')
+    parser.add_argument('--export-dat', type=str, default=None, help='Also write the model data to this .dat file (for debugging; suffixed with the year with --years)')
+    parser.add_argument('--cache-dir', type=str, default=os.environ.get('PYPOWNETR_CACHE_DIR'), help='Cache of the parsed dataset (default: $PYPOWNETR_CACHE_DIR, no cache if unset)')
+    parser.add_argument('--no-cache', action='store_true', help='Bypass the dataset cache')
+    parser.add_argument('--cache-instances', action='store_true', help='Also cache the constructed model instances in the instances directory of --cache-dir')
+    parser.add_argument('--warm-cache', action='store_true', help='Only fill the dataset cache and exit')
+    parser.add_argument('--timeseries', type=str, default=None, help='Memory-mapped time series store replacing the hourly .csv series (see pypownetr.timeseries)')
+    parser.add_argument('--network', type=str, default='angle', choices=['angle', 'ptdf', 'kron'], help='Network formulation: voltage angles with nodal balances, PTDF line flows with one system balance per hour, or voltage angles without the pass-through transformer nodes')
+    parser.add_argument('--lazy-lines', action='store_true', help='Add line limits only when violated, re-solving each day until the flows are feasible')
+    parser.add_argument('--heuristic', action='store_true', help='Dispatch from a repaired rounding of the LP relaxation instead of solving the MIP (for screening runs)')
+    parser.add_argument('--heuristic-max-gap', type=float, default=None, help='With --heuristic, solve the MIP of the days whose gap to the LP bound exceeds this (e.g. 0.01)')
+    parser.add_argument('--warm-start', action='store_true', help="Seed each day's MIP with the previous day's commitment repaired for the new day (solvers accepting warm starts, e.g. cplex, gurobi, cbc)")
+    parser.add_argument('--window', type=int, default=None, help='Hours of each optimization window of the rolling horizon (default: HorizonHours of the data, 24)')
+    parser.add_argument('--step', type=int, default=None, help='Hours committed from each window before moving on (e.g. --window 48 --step 24; default: one window per day)')
+    parser.add_argument('--reduce', action='store_true', help='Fix idle units and resources without capacity and leave out the line limits that cannot bind before each solve')
+    parser.add_argument('--workers', type=int, default=None, help='Solve blocks of days at the same time on this many processes, re-solving the days whose predicted ini_on was wrong (see pypownetr.parallel)')
+    parser.add_argument('--predict-from', type=str, default=None, help="With --workers, the on .csv of a previous run predicting the ini_on of each block (default: the LP relaxation of the day before)")
+    parser.add_argument('--extract', type=str, nargs='+', default=None, choices=[name for name, _ in output_variables], help='Output variables to record (default: all of them)')
+    parser.add_argument('--checkpoint', type=str, default=None, help='Save the outputs so far and the carried over state to this file during the run (suffixed with the year with --years)')
+    parser.add_argument('--checkpoint-every', type=int, default=10, help='Days (or steps) between two checkpoints')
+    parser.add_argument('--resume', action='store_true', help='Continue the run saved in --checkpoint after its last saved day')
+    parser.add_argument('--persistent', action='store_true', help='Hand the model to a persistent solver once and update only the changed params each day (e.g. appsi_highs, gurobi_persistent)')
     args = parser.parse_args()
 
     run_no = args.run_no
-    year = args.year
-    pownet_pyomo = PowerNetPyomoModelCambodian(dataset_dir=args.data, year=year)
+    cache_dir = None if args.no_cache else args.cache_dir
+    if args.warm_cache and cache_dir is None:
+        parser.error('--warm-cache requires --cache-dir (or $PYPOWNETR_CACHE_DIR)')
+    if args.cache_instances and cache_dir is None:
+        parser.error('--cache-instances requires --cache-dir (or $PYPOWNETR_CACHE_DIR)')
+    if args.workers is not None and (args.persistent or args.lazy_lines or args.heuristic or args.warm_start or args.step is not None or args.window is not None or args.network == 'kron'):
+        parser.error('--workers cannot be combined with --persistent, --lazy-lines, --heuristic, --warm-start, --window, --step or --network kron')
+    if args.resume and args.checkpoint is None:
+        parser.error('--resume requires --checkpoint')
+    if args.checkpoint is not None and args.workers is not None:
+        parser.error('--checkpoint cannot be combined with --workers')
+    if args.years is None:
+        year_data = [PowerNetDataCambodian(dataset_dir=args.data, year=args.year, cache_dir=cache_dir, timeseries_dir=args.timeseries)]
+    elif args.timeseries is not None:
+        parser.error('--timeseries holds its own record of years and cannot be combined with --years')
+    else:
+        year_data = PowerNetDataCambodianYears(dataset_dir=args.data, years=args.years, cache_dir=cache_dir)
+    if args.warm_cache:
+        print(f'Dataset cache is up to date in {cache_dir}')
+        exit()
     solver = SolverFactory(args.solver)
-    model_data_path = pownet_pyomo.get_data_path()
-    print(f'Save the transformed model data to {model_data_path}')
-    pyomo_model = pownet_pyomo.create_model(constraints={'logical': True, 'up_down_time': True, 'ramp_rate': True, 'capacity': True, 'power_balance': True, 'transmission': True, 'reserve_and_zero_sum': True})
-    solns = solve_powernet(pyomo_model, model_data_path, solver=solver, year=year, start_day=args.start, last_day=args.last)
-    for soln_node in solns:
-        csv_path = f'out_camb_R{run_no}_{year}_{soln_node}.csv'
-        if soln_node in ['hydro', 'hydro_import', 'solar', 'wind', 'vlt_angle']:
-            save_node_result(solns[soln_node], csv_path, ('Node','Time','Value'))
-        elif soln_node in ['mwh', 'on', 'switch', 'srsv', 'nrsv']:
-            save_node_result(solns[soln_node], csv_path, ('Generator','Time','Value'))
+    constraints = {'logical': True, 'up_down_time': True, 'ramp_rate': True, 'capacity': True, 'power_balance': True, 'transmission': True, 'reserve_and_zero_sum': True, 'network': args.network}
+    pyomo_model = None
+    for net_data in year_data:
+        year = net_data.year
+        if args.window is not None:
+            net_data.HorizonHours = args.window
+        pownet_pyomo = _PowerNetPyomoModel(net_data)
+        if args.export_dat is not None:
+            dat_root, dat_ext = os.path.splitext(args.export_dat)
+            net_data.export_model_data(args.export_dat if args.years is None else f'{dat_root}_{year}{dat_ext}')
+        checkpoint = None
+        if args.checkpoint is not None:
+            checkpoint_root, checkpoint_ext = os.path.splitext(args.checkpoint)
+            checkpoint = args.checkpoint if args.years is None else f'{checkpoint_root}_{year}{checkpoint_ext}'
+        if args.workers is not None:
+            from .parallel import solve_powernet_parallel, predicted_ini_on_from_run
+            predicted = None
+            if args.predict_from is not None:
+                df_on = pd.read_csv(args.predict_from)
+                #periods per day of the data, as periods_per_day of its instance
+                predicted = predicted_ini_on_from_run(zip(df_on['Generator'], df_on['Time'], df_on['Value']), net_data.SimHours // net_data.SimDays)
+            solns = solve_powernet_parallel(net_data, args.solver, start_day=args.start, last_day=args.last, workers=args.workers, constraints=constraints,
+                                            predicted_ini_on=predicted, cache_dir=os.path.join(cache_dir, 'instances') if args.cache_instances else None,
+                                            reduction=args.reduce, ptdf=net_data.get_ptdf() if args.reduce else None)
         else:
-            save_node_result(solns[soln_node], csv_path, ('Time','Value'))
-     
-    print(solns['system_cost']) #Paco
\ No newline at end of file
+            if args.cache_instances:
+                instance, model_data = pownet_pyomo.create_instance(constraints=constraints, cache_dir=os.path.join(cache_dir, 'instances')), None
+            else:
+                model_data = pownet_pyomo.get_data_dict()
+                if pyomo_model is None:
+                    #the abstract model depends on the node and generator sets only, which all years share
+                    pyomo_model = pownet_pyomo.create_model(constraints=constraints)
+            solns = solve_powernet(instance if args.cache_instances else pyomo_model, model_data, solver=solver, year=year, start_day=args.start, last_day=args.last, timeseries=net_data.timeseries, persistent=args.persistent, lazy_lines=args.lazy_lines,
+                                   heuristic=args.heuristic, heuristic_max_gap=args.heuristic_max_gap, warm_start=args.warm_start, step=args.step,
+                                   reduction=args.reduce, ptdf=net_data.get_ptdf() if args.reduce else None,
+                                   network_equivalent=net_data.get_network_equivalent() if args.network == 'kron' else None,
+                                   checkpoint=checkpoint, checkpoint_every=args.checkpoint_every, resume=args.resume, extract=args.extract)
+        save_solns(solns, f'out_camb_R{run_no}_{year}')
+
+        print(solns['system_cost']) #Paco
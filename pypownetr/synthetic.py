@@ -0,0 +1,181 @@
+import os
+import argparse
+import numpy as np
+import pandas as pd
+from .data import _PowerNetData
+
+
+def generate_power_system(h_nodes=6, h_imports=1, gd_nodes=9, gn_nodes=3, td_nodes=7, tn_nodes=4,
+                          units_per_node=2, line_density=1.0, sim_hours=8760, year=2016, seed=0):
+    """
+    Random power system in the .csv schema read by PowerNetDataCambodian.
+
+    Thermal units (coal_st, oil_ic and oil_st in turn) sit on the gd and gn nodes, units_per_node each,
+    plus a slack unit on the first gd node (the reference node). The network is a random spanning tree
+    meshed with line_density extra lines per node. Load and hydro profiles have daily and seasonal cycles
+    with seeded noise. Thermal capacity is sized to 1.3x the peak load so that every hour is feasible.
+
+    Returns a dict of DataFrames named after the .csv files (genparams, genparams_deratef, hydro,
+    hydro_import, load, transparam, nodes).
+    """
+    rng = np.random.default_rng(seed)
+    node_lists = {
+        'h_nodes': [f'H{i+1}' for i in range(h_nodes)],
+        'h_imports': [f'HI{i+1}' for i in range(h_imports)],
+        's_nodes': [],
+        'w_nodes': [],
+        'gn_nodes': [f'GN{i+1}' for i in range(gn_nodes)],
+        'gd_nodes': [f'GD{i+1}' for i in range(gd_nodes)],
+        'tn_nodes': [f'TN{i+1}' for i in range(tn_nodes)],
+        'td_nodes': [f'TD{i+1}' for i in range(td_nodes)],
+    }
+    all_nodes = [z for node_type in node_lists for z in node_lists[node_type]]
+    demand_nodes = node_lists['gd_nodes'] + node_lists['td_nodes']
+
+    ####### time index and hourly profiles
+    times = pd.date_range(f'{year}-01-01', periods=sim_hours, freq='h')
+    df_time = pd.DataFrame({'Year': times.year, 'Month': times.month, 'Day': times.day, 'Hour': times.hour})
+    hours = np.arange(sim_hours)
+    daily = 1 + 0.25*np.sin(2*np.pi*(hours % 24 - 6)/24)
+    seasonal = 1 + 0.10*np.sin(2*np.pi*hours/8760)
+    wet_season = np.clip(np.sin(2*np.pi*(hours - 3000)/8760), 0, None)
+
+    base_load = rng.uniform(10, 100, len(demand_nodes))
+    load = base_load[None, :] * (daily*seasonal)[:, None] * rng.normal(1, 0.03, (sim_hours, len(demand_nodes)))
+    df_load = pd.concat([df_time, pd.DataFrame(load.clip(0).round(2), columns=demand_nodes)], axis=1)
+    peak_load = load.sum(axis=1).max()
+
+    def hydro_profile(nodes, low, high):
+        capacity = rng.uniform(low, high, len(nodes))
+        profile = capacity[None, :] * (0.3 + 0.7*wet_season)[:, None] * rng.normal(1, 0.05, (sim_hours, len(nodes)))
+        return pd.concat([df_time, pd.DataFrame(profile.clip(0).round(3), columns=nodes)], axis=1)
+    df_hydro = hydro_profile(node_lists['h_nodes'], 20, 300)
+    df_hydro_import = hydro_profile(node_lists['h_imports'], 5, 50)
+
+    ####### dispatchable units
+    types = ['coal_st', 'oil_ic', 'oil_st']
+    thermal_nodes = node_lists['gd_nodes'] + node_lists['gn_nodes']
+    n_units = len(thermal_nodes) * units_per_node
+    maxcap = 1.3 * peak_load / max(1, n_units) * rng.uniform(0.5, 1.5, n_units)
+    mincap = (0.3 * maxcap).round()
+    df_gen = pd.DataFrame({
+        'name': [f'{z}_U{k+1}' for z in thermal_nodes for k in range(units_per_node)],
+        'typ': [types[i % len(types)] for i in range(n_units)],
+        'node': [z for z in thermal_nodes for k in range(units_per_node)],
+        'maxcap': maxcap.round(2),
+        'mincap': mincap.astype(int),
+        'heat_rate': rng.uniform(8, 13, n_units).round(2),
+        'var_om': rng.uniform(2, 5, n_units).round(2),
+        'fix_om': 1.5,
+        'st_cost': rng.integers(20, 100, n_units),
+        'ramp': np.maximum(mincap, maxcap * rng.uniform(0.3, 1.0, n_units)).round().astype(int),
+        'minup': rng.integers(1, 7, n_units),
+        'mindn': rng.integers(1, 7, n_units),
+    })
+    slack = {'name': 'SLACK1', 'typ': 'slack', 'node': node_lists['gd_nodes'][0], 'maxcap': round(peak_load, 2),
+             'mincap': 0, 'heat_rate': 10, 'var_om': 0, 'fix_om': 0, 'st_cost': 0, 'ramp': int(peak_load)+1, 'minup': 1, 'mindn': 1}
+    df_gen = pd.concat([df_gen, pd.DataFrame([slack])], ignore_index=True)
+    df_deratef = df_gen[['name', 'typ', 'node']].copy()
+    df_deratef[f'deratef_{year}'] = 1
+
+    ####### transmission network: random spanning tree plus extra lines
+    order = rng.permutation(len(all_nodes))
+    edges = set()
+    for n in range(1, len(order)):
+        a, b = all_nodes[order[n]], all_nodes[order[rng.integers(0, n)]]
+        edges.add((a, b))
+    n_extra = int(round(line_density * len(all_nodes)))
+    for _ in range(10 * n_extra):
+        if len(edges) >= len(all_nodes) - 1 + n_extra:
+            break
+        a, b = rng.choice(len(all_nodes), 2, replace=False)
+        a, b = all_nodes[a], all_nodes[b]
+        if (a, b) not in edges and (b, a) not in edges:
+            edges.add((a, b))
+    edges = sorted(edges)
+    df_trans = pd.DataFrame(edges, columns=['source', 'sink'])
+    df_trans['linemva'] = (peak_load * rng.uniform(0.3, 1.0, len(edges))).round().astype(int)
+    df_trans['linesus'] = rng.uniform(0.02, 1.0, len(edges)).round(3)
+
+    df_nodes = pd.DataFrame([(z, node_type) for node_type in node_lists for z in node_lists[node_type]], columns=['node', 'type'])
+
+    return {
+        'genparams': df_gen,
+        'genparams_deratef': df_deratef,
+        f'hydro_{year}': df_hydro,
+        f'hydro_import_{year}': df_hydro_import,
+        f'load_{year}': df_load,
+        'transparam': df_trans,
+        'nodes': df_nodes,
+    }
+
+
+def write_synthetic_dataset(dataset_dir, **params):
+    """
+    Write a generate_power_system() dataset to dataset_dir as data_camb_*.csv files.
+    """
+    os.makedirs(dataset_dir, exist_ok=True)
+    for name, df in generate_power_system(**params).items():
+        df.to_csv(os.path.join(dataset_dir, f'data_camb_{name}.csv'), index=False)
+    return dataset_dir
+
+
+class PowerNetDataSynthetic(_PowerNetData):
+    """
+    generate_power_system() dataset held in memory (no .csv round trip), e.g. for benchmarks.
+    """
+    def __init__(self, year=2016, **params):
+        self.year = year
+        self.params = params
+        super(PowerNetDataSynthetic, self).__init__()
+
+
+    def construct_power_system(self):
+        frames = generate_power_system(year=self.year, **self.params)
+        df_nodes = frames['nodes']
+        self.node_lists = {node_type: df_nodes.loc[df_nodes['type'] == node_type, 'node'].tolist() for node_type in self.node_types}
+        self.ref_node = self.node_lists['gd_nodes'][0]
+
+        self.df_gen = frames['genparams']
+        self.df_gen['gen_cost'] = self.df_gen['typ'].map(self.gen_cost)
+        self.df_gen['ini_on'] = 0
+        self.df_gen_deratef = frames['genparams_deratef']
+        self.df_gen['deratef'] = self.df_gen_deratef[f'deratef_{self.year}']
+        self.df_hydro = frames[f'hydro_{self.year}']
+        self.df_hydro_import = frames[f'hydro_import_{self.year}']
+        self.df_load = frames[f'load_{self.year}']
+        self.df_reserves = pd.DataFrame((self.df_load.iloc[:, 4:].sum(axis=1)*self.res_margin).values, columns=['Reserve'])
+        self.df_trans1 = frames['transparam']
+        self.df_trans2 = self.df_trans1.rename(columns={'source': 'sink', 'sink': 'source'})[['source', 'sink', 'linemva', 'linesus']]
+        self.df_paths = pd.concat([self.df_trans1, self.df_trans2], axis=0)
+        self.df_paths.index = np.arange(len(self.df_paths))
+
+
+def scaled_node_counts(n_nodes):
+    """
+    Node counts per type for a system of about n_nodes nodes, with the shares of the Cambodian system.
+    """
+    shares = {'h_nodes': 6, 'h_imports': 1, 'gd_nodes': 9, 'gn_nodes': 3, 'td_nodes': 7, 'tn_nodes': 4}
+    total = sum(shares.values())
+    return {node_type: max(1, int(round(n_nodes * share / total))) for node_type, share in shares.items()}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Write a synthetic PyPowNet dataset')
+    parser.add_argument('out', type=str, help='Output dataset directory')
+    parser.add_argument('--nodes', type=int, default=None, help='Approximate number of nodes (shares of node types as in the Cambodian system)')
+    for node_type, default in [('h_nodes', 6), ('h_imports', 1), ('gd_nodes', 9), ('gn_nodes', 3), ('td_nodes', 7), ('tn_nodes', 4)]:
+        parser.add_argument(f'--{node_type}', type=int, default=default, help=f'Number of {node_type}')
+    parser.add_argument('--units-per-node', type=int, default=2, help='Thermal units on each gd/gn node')
+    parser.add_argument('--line-density', type=float, default=1.0, help='Extra lines per node on top of a spanning tree')
+    parser.add_argument('--hours', type=int, default=8760, help='Hours of the time series')
+    parser.add_argument('--year', type=int, default=2016, help='Year of the time series files')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed')
+    args = parser.parse_args()
+
+    node_counts = {node_type: getattr(args, node_type) for node_type in ['h_nodes', 'h_imports', 'gd_nodes', 'gn_nodes', 'td_nodes', 'tn_nodes']}
+    if args.nodes is not None:
+        node_counts = scaled_node_counts(args.nodes)
+    write_synthetic_dataset(args.out, units_per_node=args.units_per_node, line_density=args.line_density,
+                            sim_hours=args.hours, year=args.year, seed=args.seed, **node_counts)
+    print(f'Complete: synthetic dataset is saved to {args.out}')
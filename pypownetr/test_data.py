@@ -1,8 +1,494 @@
+import io
+import json
+import random
+import shutil
 import tempfile
+import pytest
+import pyomo.environ as pyo
 from .data import *
+from .model import _PowerNetPyomoModel
+from .solver import solve_powernet, set_horizon_inputs
+from .timeseries import convert_csv_dataset
+from .synthetic import write_synthetic_dataset, PowerNetDataSynthetic
+from .benchmark import _reference_export_model_data_fp
+from .network import expand_equivalent_angles
+from .heuristic import round_commitment
+from .warmstart import enable_warm_start, previous_commitment, build_warm_start
+from .profiling import profile_model_build
+from .reduction import idle_units, unit_constraints, line_flow_bounds, reduce_window, restore_window
+from .parallel import solve_powernet_parallel, predicted_ini_on_from_run
+from .batch import expand_sweep, run_sweep
+from .ensemble import generate_ensemble, solve_ensemble, ensemble_member
+
+
+CAMB_2016 = 'datasets/kamal0013/camb_2016'
+
+
+CONSTRAINTS = {'logical': True, 'up_down_time': True, 'ramp_rate': True, 'capacity': True, 'power_balance': True, 'transmission': True, 'reserve_and_zero_sum': True}
+
+
+@pytest.fixture(scope='module')
+def camb_data():
+    #read once for the module; tests that change the data read their own copy
+    return PowerNetDataCambodian(CAMB_2016)
+
+
+@pytest.fixture(scope='module')
+def camb_model(camb_data):
+    return _PowerNetPyomoModel(camb_data)
+
+
+@pytest.fixture(scope='module')
+def camb_data_dict(camb_model):
+    return camb_model.get_data_dict()
+
+
+@pytest.fixture(scope='module')
+def new_instance(camb_model, camb_data_dict):
+    #new instances of camb_model (solves change their inputs and ini_on), built from the data dict exported once
+    def build(constraints=CONSTRAINTS):
+        return camb_model.create_model(constraints=constraints).create_instance(camb_data_dict)
+    return build
+
+
+#a week of a synthetic system of a few units, for the multi-day tests that do not need the Cambodian system
+SMALL_SYSTEM = dict(h_nodes=2, h_imports=1, gd_nodes=3, gn_nodes=1, td_nodes=3, tn_nodes=1, units_per_node=2, line_density=0.5, sim_hours=168, seed=1)
+
+
+@pytest.fixture(scope='module')
+def small_data():
+    return PowerNetDataSynthetic(**SMALL_SYSTEM)
+
+
+@pytest.fixture(scope='module')
+def new_small_instance(small_data):
+    pyomo_model = _PowerNetPyomoModel(small_data)
+    data_dict = pyomo_model.get_data_dict()
+    def build(constraints=CONSTRAINTS):
+        return pyomo_model.create_model(constraints=constraints).create_instance(data_dict)
+    return build
+
 
 def test_pownet_data():
     pn_data = PowerNetDataCambodian('datasets/kamal0013/camb_2016')
     tf = tempfile.NamedTemporaryFile(mode="w+", delete=False, suffix=".dat")
     pn_data.export_model_data_fp(tf)
     tf.close()
+
+
+def test_bulk_export_matches_reference_writer(camb_data):
+    for pn_data in [camb_data, PowerNetDataSynthetic(sim_hours=48)]:
+        bulk_fp, ref_fp = io.StringIO(), io.StringIO()
+        pn_data.export_model_data_fp(bulk_fp)
+        _reference_export_model_data_fp(pn_data, ref_fp)
+        assert bulk_fp.getvalue() == ref_fp.getvalue()
+
+
+def test_model_data_dict(camb_data):
+    data = camb_data.export_model_data_dict()[None]
+    assert data['nodes'][None] == camb_data._get_all_nodes()
+    assert len(data['SimDemand']) == len(camb_data._get_demand_nodes()) * len(camb_data.df_load)
+    assert len(data['lines'][None]) == len(camb_data.df_paths)
+    assert data['linemva'][('GS1', 'GS3')] == 238
+    assert data['linesus'][('GS3', 'GS1')] == 0.256
+    assert data['SimReserves'][1] == camb_data.df_reserves.loc[0, 'Reserve']
+
+
+def test_dataset_cache_rebuilds_on_change(tmp_path):
+    dataset_dir = str(tmp_path / 'camb_2016')
+    cache_dir = str(tmp_path / 'cache')
+    shutil.copytree(CAMB_2016, dataset_dir)
+    pn_data = PowerNetDataCambodian(dataset_dir, cache_dir=cache_dir)
+    cached = PowerNetDataCambodian(dataset_dir, cache_dir=cache_dir)
+    pd.testing.assert_frame_equal(cached.df_paths, pn_data.df_paths)
+    pd.testing.assert_frame_equal(cached.df_reserves, pn_data.df_reserves)
+    entries = os.listdir(cache_dir)
+    assert len(entries) == 1
+
+    trans_path = os.path.join(dataset_dir, 'data_camb_transparam.csv')
+    df_trans = pd.read_csv(trans_path)
+    df_trans.loc[0, 'linemva'] = 1
+    df_trans.to_csv(trans_path, index=False)
+    rebuilt = PowerNetDataCambodian(dataset_dir, cache_dir=cache_dir)
+    assert rebuilt.df_trans1.loc[0, 'linemva'] == 1
+    assert len(os.listdir(cache_dir)) == 1 and os.listdir(cache_dir) != entries
+
+
+def test_timeseries_store_matches_csv(camb_data, tmp_path):
+    store = convert_csv_dataset(CAMB_2016, str(tmp_path / 'store'), [2016, 2016])
+    assert store.n_days == 2 * 365
+    day = store.day_window('load', 365 + 2, ['GS1', 'KPS'])
+    np.testing.assert_array_equal(day, camb_data.df_load.loc[24:47, ['GS1', 'KPS']].to_numpy().T)
+    np.testing.assert_allclose(store.day_window('reserves', 2)[0], camb_data.df_reserves['Reserve'].to_numpy()[24:48])
+
+    ts_data = PowerNetDataCambodian(CAMB_2016, timeseries_dir=str(tmp_path / 'store'))
+    assert ts_data.df_load is None and ts_data.SimDays == 2 * 365
+    assert 'SimDemand' not in ts_data.export_model_data_dict()[None]
+
+
+def test_synthetic_dataset_round_trip(tmp_path):
+    params = dict(h_nodes=3, h_imports=1, gd_nodes=4, gn_nodes=2, td_nodes=5, tn_nodes=2, units_per_node=3, line_density=0.5, sim_hours=72, seed=1)
+    write_synthetic_dataset(str(tmp_path), **params)
+    pn_data = PowerNetDataCambodian(str(tmp_path))
+    in_memory = PowerNetDataSynthetic(**params)
+    assert pn_data.node_lists == in_memory.node_lists
+    assert pn_data.ref_node == 'GD1'
+    assert len(pn_data.df_gen) == 6 * 3 + 1
+    assert len(pn_data.df_trans1) == 17 - 1 + 8
+    assert len(pn_data.df_load) == 72
+
+
+def test_year_views_share_static_data(tmp_path):
+    for fname in os.listdir(CAMB_2016):
+        shutil.copy(os.path.join(CAMB_2016, fname), tmp_path)
+    for series in ['hydro', 'hydro_import']:
+        df = pd.read_csv(os.path.join(CAMB_2016, f'data_camb_{series}_2016.csv'))
+        df.iloc[:, 4:] *= 0.5
+        df.to_csv(os.path.join(tmp_path, f'data_camb_{series}_2017.csv'), index=False)
+    years_data = PowerNetDataCambodianYears(str(tmp_path), [2016, 2017])
+    views = list(years_data)
+    assert views[1].df_trans1 is views[0].df_trans1
+    assert views[1]._series == {}
+    for view in views:
+        expected = PowerNetDataCambodian(str(tmp_path), view.year).export_model_data_dict()
+        assert view.export_model_data_dict() == expected
+    assert views[1].df_load is views[0].df_load
+
+
+def test_persistent_solver_matches_fresh_solves(new_small_instance):
+    costs = {}
+    for persistent in [False, True]:
+        solver = pyo.SolverFactory('appsi_highs')
+        solver.config.mip_gap = 0
+        solns = solve_powernet(new_small_instance(), None, solver, start_day=1, last_day=2, persistent=persistent)
+        costs[persistent] = [cost for _, cost in solns['system_cost']]
+    assert len(costs[True]) == 2
+    for persistent_cost, cost in zip(costs[True], costs[False]):
+        assert abs(persistent_cost - cost) <= 1e-6 * abs(cost)
+
+
+def test_aggregated_up_down_time_matches_pairwise(camb_data, new_instance):
+    instances = {}
+    for up_down_time in [True, 'aggregated']:
+        instances[up_down_time] = new_instance(dict(CONSTRAINTS, up_down_time=up_down_time, ramp_rate=False, capacity=False, power_balance=False, transmission=False, reserve_and_zero_sum=False))
+
+    def feasible_units(instance):
+        feasible = set(instance.Generators)
+        for con in [instance.MinimumUp, instance.MinimumDown]:
+            for index in con:
+                if pyo.value(con[index].body) > pyo.value(con[index].upper) + 1e-9:
+                    feasible.discard(index[0])
+        return feasible
+
+    rng = random.Random(0)
+    H = camb_data.HorizonHours
+    for _ in range(50):
+        #on/off runs of random length, with switch marking the start-ups
+        schedules = {}
+        for j in camb_data._get_unit_names():
+            on = []
+            while len(on) < H+1:
+                on += [rng.randint(0, 1)] * rng.randint(1, 8)
+            schedules[j] = on[:H+1]
+        for instance in instances.values():
+            for j, on in schedules.items():
+                for i in range(H+1):
+                    instance.on[j, i].value = on[i]
+                    instance.switch[j, i].value = max(0, on[i] - on[i-1]) if i > 0 else 0
+        assert feasible_units(instances[True]) == feasible_units(instances['aggregated'])
+
+
+def test_tight_logical_constraints_bound_lp_relaxation(new_instance, new_small_instance):
+    bounds = {}
+    for logical in [True, 'tight']:
+        instance = new_instance(dict(CONSTRAINTS, logical=logical))
+        set_horizon_inputs(instance, 1)
+        pyo.TransformationFactory('core.relax_integer_vars').apply_to(instance)
+        pyo.SolverFactory('appsi_highs').solve(instance)
+        bounds[logical] = pyo.value(instance.SystemCost)
+    #the tight rows cut off fractional commitments the big-M rows admit
+    assert bounds['tight'] >= bounds[True] - 1e-6 * abs(bounds[True])
+
+    #but no feasible schedule: the MIP optimum is the same
+    costs = {}
+    for logical in [True, 'tight']:
+        instance = new_small_instance(dict(CONSTRAINTS, logical=logical))
+        set_horizon_inputs(instance, 1)
+        solver = pyo.SolverFactory('appsi_highs')
+        solver.config.mip_gap = 0
+        solver.solve(instance)
+        costs[logical] = pyo.value(instance.SystemCost)
+    assert abs(costs['tight'] - costs[True]) <= 1e-6 * abs(costs[True])
+
+
+def test_ptdf_network_matches_angle_formulation(camb_data, new_instance):
+    ptdf = camb_data.get_ptdf()
+    assert (ptdf[camb_data.ref_node] == 0).all()
+    #both directions of a line carry opposite flows
+    assert np.allclose(ptdf.loc[('GS1', 'GS3')], -ptdf.loc[('GS3', 'GS1')])
+
+    costs = {}
+    for network in ['angle', 'ptdf']:
+        instance = new_instance(dict(CONSTRAINTS, network=network))
+        set_horizon_inputs(instance, 1)
+        pyo.TransformationFactory('core.relax_integer_vars').apply_to(instance)
+        pyo.SolverFactory('appsi_highs').solve(instance)
+        costs[network] = pyo.value(instance.SystemCost)
+    assert not hasattr(instance, 'vlt_angle')
+    assert abs(costs['ptdf'] - costs['angle']) <= 1e-6 * abs(costs['angle'])
+
+
+def test_kron_network_matches_angle_formulation(camb_data, new_instance):
+    equivalent = camb_data.get_network_equivalent()
+    assert not set(equivalent['nodes']) & (set(camb_data.node_lists['tn_nodes']) - {camb_data.ref_node})
+    #the susceptances of the equivalent are symmetric
+    lines = equivalent['lines'].set_index(['source', 'sink'])['linesus']
+    assert all(np.isclose(sus, lines[k, s]) for (s, k), sus in lines.items())
+
+    costs = {}
+    angles = {}
+    for network in ['angle', 'kron']:
+        instance = new_instance(dict(CONSTRAINTS, network=network))
+        set_horizon_inputs(instance, 1)
+        pyo.TransformationFactory('core.relax_integer_vars').apply_to(instance)
+        pyo.SolverFactory('appsi_highs').solve(instance)
+        costs[network] = pyo.value(instance.SystemCost)
+        angles[network] = [(z, i, instance.vlt_angle[z,i].value) for z, i in instance.vlt_angle]
+    assert len(angles['kron']) < len(angles['angle'])
+    assert abs(costs['kron'] - costs['angle']) <= 1e-6 * abs(costs['angle'])
+    #the angles of all nodes and the flows of all lines are recovered from the equivalent
+    expanded, line_flow = expand_equivalent_angles(angles['kron'], equivalent)
+    assert len(expanded) == len(angles['angle'])
+    assert len(line_flow) == len(equivalent['flow_factors']) * len({i for _, i, _ in angles['kron']})
+
+
+def test_lazy_line_limits_reach_full_model_optimum():
+    pn_data = PowerNetDataCambodian(CAMB_2016)
+    pn_data.df_paths['linemva'] = pn_data.df_paths['linemva'] * 0.8 #so that some lines bind
+    pyomo_model = _PowerNetPyomoModel(pn_data)
+    data_dict = pyomo_model.get_data_dict()
+    solver = pyo.SolverFactory('appsi_highs')
+    solver.config.mip_gap = 0
+    costs = {}
+    for lazy_lines in [False, True]:
+        model = pyomo_model.create_model(constraints=dict(CONSTRAINTS, network='ptdf'))
+        solns = solve_powernet(model, data_dict, solver, start_day=1, last_day=1, lazy_lines=lazy_lines)
+        costs[lazy_lines] = solns['system_cost'][0][1]
+    (_, iterations, added, _), = solns['line_limits']
+    assert iterations > 1 and added > 0
+    assert abs(costs[True] - costs[False]) <= 1e-6 * abs(costs[False])
+
+
+def test_heuristic_dispatch_respects_min_up_down_and_bound(camb_model, camb_data_dict):
+    #a run shorter than minup is extended; an off gap shorter than mindn is filled
+    assert round_commitment([1, 0, 0, 0, 0, 0, 0, 0], 0, 4, 1) == [1, 1, 1, 0, 0, 0, 0, 0]
+    assert round_commitment([1, 1, 0, 1, 1, 0, 0, 0], 1, 1, 4) == [1, 1, 1, 1, 1, 0, 0, 0]
+    assert round_commitment([0.3, 0.3, 0.3], 0, 1, 1, threshold=0.25) == [1, 1, 1]
+
+    solns = solve_powernet(camb_model.create_model(constraints=CONSTRAINTS), camb_data_dict, pyo.SolverFactory('appsi_highs'), start_day=1, last_day=2, heuristic=True)
+    for (day, bound, cost, gap, step), (_, system_cost) in zip(solns['heuristic'], solns['system_cost']):
+        assert step == 'rounded'
+        assert cost == system_cost
+        assert bound <= cost and 0 <= gap < 0.05
+    assert all(abs(value - round(value)) < 1e-6 for _, _, value in solns['on'])
+
+
+def test_warm_start_incumbent_from_previous_day(new_instance):
+    with pytest.raises(ValueError):
+        enable_warm_start(pyo.SolverFactory('glpk'))
+    instance = new_instance()
+    solver = pyo.SolverFactory('appsi_highs')
+    assert previous_commitment(instance) is None
+    set_horizon_inputs(instance, 1)
+    solver.solve(instance)
+    H = pyo.value(instance.HorizonHours)
+    for j in instance.Generators:
+        instance.ini_on[j] = round(instance.on[j,H].value)
+
+    set_horizon_inputs(instance, 2)
+    assert build_warm_start(instance, solver, previous_commitment(instance))
+    incumbent_cost = pyo.value(instance.SystemCost)
+    for j in instance.Generators:
+        assert abs(instance.on[j,0].value - pyo.value(instance.ini_on[j])) < 1e-6
+        assert all(abs(instance.on[j,i].value - round(instance.on[j,i].value)) < 1e-6 for i in range(1, H+1))
+    #on and switch are binary and free again for the MIP
+    assert all(instance.on[j,i].is_binary() and instance.on[j,i].bounds == (0, 1) for j in instance.Generators for i in range(1, H+1))
+    solver.solve(instance)
+    assert pyo.value(instance.SystemCost) <= incumbent_cost * (1 + 1e-6)
+
+
+def test_rolling_horizon_commits_step_and_carries_ramp():
+    pn_data = PowerNetDataSynthetic(**SMALL_SYSTEM)
+    pn_data.HorizonHours = 48
+    pyomo_model = _PowerNetPyomoModel(pn_data)
+    model = pyomo_model.create_model(constraints=CONSTRAINTS)
+    solns = solve_powernet(model, pyomo_model.get_data_dict(), pyo.SolverFactory('appsi_highs'), start_day=1, last_day=2, step=24)
+    units = pn_data._get_unit_names().tolist()
+    #only the committed 24 hours of each window are recorded
+    assert sorted({t for _, t, _ in solns['mwh']}) == list(range(1, 49))
+    assert len(solns['on']) == 48 * len(units)
+    assert [day for day, _ in solns['system_cost']] == [1, 2]
+    #the output of the last committed hour carries over to the ramp of the next window
+    mwh = {(j, t): value for j, t, value in solns['mwh']}
+    ramp = dict(zip(units, pn_data.df_gen['ramp']))
+    assert all(abs(mwh[j, 25] - mwh[j, 24]) <= ramp[j] + 1e-6 for j in units)
+
+
+def test_instance_cache_loads_same_model(tmp_path):
+    dataset_dir = str(tmp_path / 'camb_2016')
+    cache_dir = str(tmp_path / 'instances')
+    shutil.copytree(CAMB_2016, dataset_dir)
+    costs = []
+    for _ in range(2):
+        instance = _PowerNetPyomoModel(PowerNetDataCambodian(dataset_dir)).create_instance(constraints=CONSTRAINTS, cache_dir=cache_dir)
+        set_horizon_inputs(instance, 1)
+        pyo.TransformationFactory('core.relax_integer_vars').apply_to(instance)
+        pyo.SolverFactory('appsi_highs').solve(instance)
+        costs.append(pyo.value(instance.SystemCost))
+    assert abs(costs[1] - costs[0]) <= 1e-9 * abs(costs[0])
+    entries = os.listdir(cache_dir)
+    assert len(entries) == 1
+
+    trans_path = os.path.join(dataset_dir, 'data_camb_transparam.csv')
+    df_trans = pd.read_csv(trans_path)
+    df_trans.loc[0, 'linemva'] = 1
+    df_trans.to_csv(trans_path, index=False)
+    instance = _PowerNetPyomoModel(PowerNetDataCambodian(dataset_dir)).create_instance(constraints=CONSTRAINTS, cache_dir=cache_dir)
+    assert instance.linemva[df_trans.loc[0, 'source'], df_trans.loc[0, 'sink']] == 1
+    assert len(os.listdir(cache_dir)) == 1 and os.listdir(cache_dir) != entries
+
+
+def test_build_profile_attributes_components_to_blocks(camb_model, tmp_path):
+    report = profile_model_build(camb_model, out_json=str(tmp_path / 'build.json'))
+    assert json.load(open(tmp_path / 'build.json'))['constraints'] == report['constraints']
+    blocks = {row['component']: row['block'] for row in report['components']}
+    assert blocks['MaxLineConstraint'] == 'attach_model_constraints_transmission'
+    assert blocks['mwh'] == 'attach_decision_variables'
+    assert blocks['SystemCost'] == 'attach_model_objective_function'
+    #every constraint family is constructed once and counted in its block
+    assert sum(block['constraints'] for block in report['blocks']) == report['constraints'] > 0
+    assert sum(block['nonzeros'] for block in report['blocks']) == report['nonzeros']
+
+
+def test_window_reduction_keeps_the_optimum():
+    pn_data = PowerNetDataCambodian(CAMB_2016)
+    pn_data.df_gen.loc[0, 'deratef'] = 0 #a unit out of service for the year
+    pn_data.df_paths['linemva'] = pn_data.df_paths['linemva'] * 100 #so that line limits cannot bind
+    idle_unit = pn_data._get_unit_names()[0]
+    instance = _PowerNetPyomoModel(pn_data).create_instance(constraints=CONSTRAINTS)
+    set_horizon_inputs(instance, 1)
+    pyo.TransformationFactory('core.relax_integer_vars').apply_to(instance)
+    solver = pyo.SolverFactory('appsi_highs')
+    solver.solve(instance)
+    full_cost = pyo.value(instance.SystemCost)
+
+    idle = idle_units(instance)
+    assert idle == [idle_unit]
+    fixed, deactivated = reduced = reduce_window(instance, idle, unit_constraints(instance), line_flow_bounds(instance, pn_data.get_ptdf()))
+    assert instance.mwh[idle_unit, 1].fixed and not instance.MaxCap[idle_unit, 1].active
+    assert any(c.parent_component() is instance.MaxLineConstraint for c in deactivated)
+    solver.solve(instance)
+    assert abs(pyo.value(instance.SystemCost) - full_cost) <= 1e-6 * abs(full_cost)
+    assert instance.mwh[idle_unit, 1].value == 0
+    restore_window(reduced)
+    assert not instance.mwh[idle_unit, 1].fixed and all(c.active for c in deactivated)
+
+
+def test_parallel_days_match_sequential_run(small_data, new_small_instance):
+    sequential = solve_powernet(new_small_instance(), None, pyo.SolverFactory('appsi_highs'), start_day=1, last_day=4)
+
+    solns = solve_powernet_parallel(small_data, 'appsi_highs', start_day=1, last_day=4, workers=2)
+    assert [day for day, _, _ in solns['parallel']] == [1, 2, 3, 4]
+    for name in ['on', 'mwh', 'system_cost']:
+        assert solns[name] == sequential[name]
+    #with the commitment of the sequential run as the prediction no day is re-solved
+    solns = solve_powernet_parallel(small_data, 'appsi_highs', start_day=1, last_day=4, workers=2, predicted_ini_on=predicted_ini_on_from_run(sequential['on'], 24))
+    assert not any(resolved for _, resolved, _ in solns['parallel'])
+    assert solns['system_cost'] == sequential['system_cost']
+
+    #the rolling horizon state of a longer window is not reconciled
+    lookahead = PowerNetDataSynthetic(**SMALL_SYSTEM)
+    lookahead.HorizonHours = 48
+    with pytest.raises(ValueError):
+        solve_powernet_parallel(lookahead, 'appsi_highs', start_day=1, last_day=4, workers=2)
+
+
+def test_batch_sweep_reuses_instances(tmp_path):
+    data_dir = write_synthetic_dataset(str(tmp_path / 'small'), **SMALL_SYSTEM)
+    spec = {'data': data_dir, 'years': [2016], 'days': [[1, 1], [2, 2]], 'solvers': ['appsi_highs'],
+            'overrides': [{}, {'TransLoss': 0.1}]}
+    jobs = expand_sweep(spec)
+    assert [job['run_no'] for job in jobs] == [1, 2, 3, 4]
+    summary = run_sweep(spec, str(tmp_path), workers=1)
+    assert list(summary['status']) == ['ok'] * 4
+    #higher losses cost more
+    assert summary.loc[1, 'system_cost'] > summary.loc[0, 'system_cost']
+    #the instance of a job is reused by the following jobs of the same dataset and parameters
+    assert summary.loc[2, 'build_s'] < summary.loc[0, 'build_s']
+    assert len(pd.read_csv(tmp_path / 'out_camb_R3_2016_on.csv')) > 0
+
+
+def test_ensemble_members_perturb_inputs_and_reserves(camb_data, new_instance):
+    ensemble = generate_ensemble(camb_data, 3, seed=1, load_sigma=0.05, hydro_sigma=0.1, drought=(0.5, 1.0))
+    assert ensemble['load'].shape == (3, len(ensemble['nodes']['load']), len(camb_data.df_load))
+    assert np.array_equal(ensemble['hydro'], generate_ensemble(camb_data, 3, seed=1, load_sigma=0.05, hydro_sigma=0.1, drought=(0.5, 1.0))['hydro'])
+    assert np.allclose(ensemble['reserves'][:, 0], ensemble['load'].sum(axis=1) * camb_data.res_margin)
+    assert (ensemble['load'] >= 0).all() and not np.allclose(ensemble['load'][0], ensemble['load'][1])
+
+    #a member without perturbation solves as the dataset
+    solver = pyo.SolverFactory('appsi_highs')
+    unperturbed = generate_ensemble(camb_data, 1)
+    assert np.allclose(unperturbed['reserves'][0, 0], camb_data.df_reserves['Reserve'])
+    (_, solns), = solve_ensemble(camb_data, unperturbed, solver, start_day=1, last_day=1)
+    expected = solve_powernet(new_instance(), None, solver, start_day=1, last_day=1)
+    assert abs(solns['system_cost'][0][1] - expected['system_cost'][0][1]) <= 1e-6 * abs(expected['system_cost'][0][1])
+
+    #members with derates of their own reuse the instance and solve as an instance built with those derates
+    drought = generate_ensemble(camb_data, 2, drought=(0.5, 0.9))
+    costs = [solns['system_cost'][0][1] for _, solns in solve_ensemble(camb_data, drought, solver, start_day=1, last_day=1)]
+    drought_data = PowerNetDataCambodian(CAMB_2016)
+    drought_data.df_gen['deratef'] = drought['deratef'][1]
+    expected = solve_powernet(_PowerNetPyomoModel(drought_data).create_instance(), None, solver, start_day=1, last_day=1, timeseries=ensemble_member(drought, 1))
+    assert abs(costs[1] - expected['system_cost'][0][1]) <= 1e-6 * abs(expected['system_cost'][0][1])
+
+
+def test_resumed_run_matches_uninterrupted_run(new_small_instance, tmp_path):
+    solver = pyo.SolverFactory('appsi_highs')
+    expected = solve_powernet(new_small_instance(), None, solver, start_day=1, last_day=3)
+
+    class CountedSolver:
+        #fails on the solve number fail_at, if given
+        def __init__(self, fail_at=None):
+            self.solves = 0
+            self.fail_at = fail_at
+        def solve(self, instance, **kwds):
+            self.solves += 1
+            if self.solves == self.fail_at:
+                raise RuntimeError('preempted')
+            return solver.solve(instance, **kwds)
+
+    checkpoint = str(tmp_path / 'run.pkl')
+    with pytest.raises(RuntimeError):
+        solve_powernet(new_small_instance(), None, CountedSolver(fail_at=3), start_day=1, last_day=3, checkpoint=checkpoint)
+    resumed = CountedSolver()
+    solns = solve_powernet(new_small_instance(), None, resumed, start_day=1, last_day=3, checkpoint=checkpoint, resume=True)
+    assert resumed.solves == 1
+    for name in ['on', 'mwh', 'system_cost']:
+        assert solns[name] == expected[name]
+
+
+def test_outputs_are_extracted_into_arrays(new_small_instance):
+    solver = pyo.SolverFactory('appsi_highs')
+    instance = new_small_instance()
+    solns = solve_powernet(instance, None, solver, start_day=1, last_day=2)
+    units, mwh = solns['arrays']['mwh']
+    assert mwh.shape == (2, 24, len(units))
+    assert len(solns['mwh']) == mwh.size
+    #tuples are ordered by day, unit and hour as before
+    assert solns['mwh'][:2] == [(units[0], 1, mwh[0, 0, 0]), (units[0], 2, mwh[0, 1, 0])]
+    assert solns['mwh'][24] == (units[1], 1, mwh[0, 0, 1])
+    assert np.allclose([instance.mwh[units[2], i].value for i in range(1, 25)], mwh[1, :, 2])
+
+    only = solve_powernet(new_small_instance(), None, solver, start_day=1, last_day=2, extract=['mwh'])
+    assert list(only['arrays']) == ['mwh'] and only['on'] == []
+    assert only['mwh'] == solns['mwh']
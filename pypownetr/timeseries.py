@@ -0,0 +1,157 @@
+import os
+import json
+import argparse
+import numpy as np
+import pandas as pd
+
+
+class TimeSeriesStore:
+    """
+    Directory of time series stored as (node x period) .npy arrays, one per series, with a
+    store.json holding the node names of each series and the number of periods per day.
+    Arrays are memory-mapped, so reading the window of one day only touches that window.
+
+    Series: load, hydro, hydro_import, solar, wind and reserves (system-wide, a single 'system' row).
+    """
+    series_names = ['load', 'hydro', 'hydro_import', 'solar', 'wind', 'reserves']
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        with open(os.path.join(store_dir, 'store.json')) as f:
+            meta = json.load(f)
+        self.periods_per_day = meta['periods_per_day']
+        self.n_periods = meta['n_periods']
+        self.nodes = meta['nodes']
+        self._node_index = {series: {z: n for n, z in enumerate(nodes)} for series, nodes in self.nodes.items()}
+        self._arrays = {}
+
+
+    @property
+    def n_days(self):
+        return self.n_periods // self.periods_per_day
+
+
+    def has_series(self, series):
+        return series in self.nodes
+
+
+    def get_array(self, series):
+        if series not in self._arrays:
+            self._arrays[series] = np.load(os.path.join(self.store_dir, f'{series}.npy'), mmap_mode='r')
+        return self._arrays[series]
+
+
+    def window(self, series, start, stop, nodes=None):
+        """
+        Values of periods [start, stop) (0-based) as a (node x period) array, optionally for a subset of nodes.
+        """
+        array = self.get_array(series)
+        if nodes is None:
+            return np.asarray(array[:, start:stop])
+        rows = [self._node_index[series][z] for z in nodes]
+        return np.asarray(array[rows, start:stop])
+
+
+    def day_window(self, series, day, nodes=None):
+        start = (day-1) * self.periods_per_day
+        return self.window(series, start, start + self.periods_per_day, nodes)
+
+
+    @staticmethod
+    def create(store_dir, series_nodes, n_periods, periods_per_day=24, dtype='float64'):
+        """
+        Create an empty store and return its arrays opened for writing (node x period memmaps).
+        """
+        os.makedirs(store_dir, exist_ok=True)
+        arrays = {}
+        for series, nodes in series_nodes.items():
+            arrays[series] = np.lib.format.open_memmap(
+                os.path.join(store_dir, f'{series}.npy'), mode='w+', dtype=dtype, shape=(len(nodes), n_periods))
+        with open(os.path.join(store_dir, 'store.json'), 'w') as f:
+            json.dump({'periods_per_day': periods_per_day, 'n_periods': n_periods, 'nodes': series_nodes}, f)
+        return arrays
+
+
+class ArrayTimeSeries(TimeSeriesStore):
+    """
+    TimeSeriesStore held in memory: {series: (node x period) array} with the node names of each series
+    (e.g. a member of an ensemble, see ensemble.generate_ensemble). Series without an array have no nodes.
+    """
+    def __init__(self, arrays, nodes, periods_per_day=24):
+        self.store_dir = None
+        self.periods_per_day = periods_per_day
+        self.n_periods = arrays['load'].shape[1]
+        self.nodes = {series: list(nodes[series]) for series in arrays}
+        self._node_index = {series: {z: n for n, z in enumerate(nodes)} for series, nodes in self.nodes.items()}
+        self._arrays = dict(arrays)
+
+
+    def get_array(self, series):
+        if series not in self._arrays:
+            return np.zeros((0, self.n_periods))
+        return self._arrays[series]
+
+
+def _csv_node_columns(csv_path):
+    columns = pd.read_csv(csv_path, nrows=0).columns
+    return [c for c in columns if c not in ['Year', 'Month', 'Day', 'Hour', 'Minute'] and not c.startswith('Unnamed')]
+
+
+def _csv_n_rows(csv_path):
+    with open(csv_path) as f:
+        return sum(1 for _ in f) - 1
+
+
+def convert_csv_dataset(dataset_dir, store_dir, years, load_file='data_camb_load_{year}.csv', res_margin=0.15, periods_per_day=24, dtype='float64'):
+    """
+    Convert the per-year .csv series of a dataset directory into a TimeSeriesStore.
+    The years are concatenated along time (e.g. a 30-year record) and converted one file at a time,
+    so only one year of one series is held in memory. Load files that do not exist for a year fall back
+    to data_camb_load_2016.csv, as used by PowerNetDataCambodian.
+    Reserves are res_margin times the total load of each period.
+    """
+    file_patterns = {
+        'load': load_file,
+        'hydro': 'data_camb_hydro_{year}.csv',
+        'hydro_import': 'data_camb_hydro_import_{year}.csv',
+        'solar': 'data_camb_solar_{year}.csv',
+        'wind': 'data_camb_wind_{year}.csv',
+    }
+    series_files = {}
+    for series, pattern in file_patterns.items():
+        paths = [os.path.join(dataset_dir, pattern.format(year=year)) for year in years]
+        if series == 'load':
+            paths = [p if os.path.exists(p) else os.path.join(dataset_dir, 'data_camb_load_2016.csv') for p in paths]
+        if all(os.path.exists(p) for p in paths):
+            series_files[series] = paths
+
+    year_periods = [_csv_n_rows(p) for p in series_files['load']]
+    n_periods = sum(year_periods)
+    series_nodes = {series: _csv_node_columns(paths[0]) for series, paths in series_files.items()}
+    series_nodes['reserves'] = ['system']
+    arrays = TimeSeriesStore.create(store_dir, series_nodes, n_periods, periods_per_day, dtype)
+
+    for series, paths in series_files.items():
+        start = 0
+        for path, n_year in zip(paths, year_periods):
+            df = pd.read_csv(path, header=0, usecols=series_nodes[series])
+            arrays[series][:, start:start+n_year] = df[series_nodes[series]].to_numpy()[:n_year].T
+            if series == 'load':
+                arrays['reserves'][0, start:start+n_year] = df[series_nodes[series]].to_numpy()[:n_year].sum(axis=1) * res_margin
+            start += n_year
+    for array in arrays.values():
+        array.flush()
+    return TimeSeriesStore(store_dir)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Convert PyPowNet .csv time series into a memory-mapped store')
+    parser.add_argument('data', type=str, help='Power system data')
+    parser.add_argument('store', type=str, help='Output directory of the store')
+    parser.add_argument('years', type=int, nargs='+', help='Years to concatenate (e.g. 2016 2017 2018)')
+    parser.add_argument('--periods-per-day', type=int, default=24, help='Periods per day of the series (e.g. 96 for 15-minute data)')
+    parser.add_argument('--dtype', type=str, default='float64', choices=['float32', 'float64'], help='Storage precision')
+    parser.add_argument('--res-margin', type=float, default=0.15, help='Minimum reserve as a percent of system demand')
+    args = parser.parse_args()
+    store = convert_csv_dataset(args.data, args.store, args.years, res_margin=args.res_margin, periods_per_day=args.periods_per_day, dtype=args.dtype)
+    print(f'Complete: {store.n_days} days of {store.periods_per_day} periods are saved to {args.store}')
@@ -0,0 +1,52 @@
+import pyomo.environ as pyo
+from .heuristic import round_commitment, fix_commitment, free_commitment, relax_commitment
+
+
+def enable_warm_start(solver):
+    """
+    Make solver start its MIP search from the values loaded in the instance.
+    Returns the keyword arguments to pass to solver.solve:
+    - legacy solvers (e.g. cplex, gurobi, cbc) take warmstart=True when they are warm_start_capable;
+    - appsi and pyomo.contrib.solver solvers are configured once (config.warmstart or config.warmstart_discrete_vars).
+    """
+    if hasattr(solver, 'warm_start_capable'):
+        if solver.warm_start_capable():
+            return {'warmstart': True}
+    elif hasattr(solver, 'config'):
+        for option in ['warmstart_discrete_vars', 'warmstart']:
+            if option in solver.config:
+                setattr(solver.config, option, True)
+                return {}
+    raise ValueError(f'{type(solver).__name__} does not accept warm starts (use e.g. cplex, gurobi or cbc)')
+
+
+def previous_commitment(instance):
+    #{unit: on values of hours 1..H} of the solution loaded in instance (None before the first solve)
+    H = pyo.value(instance.HorizonHours)
+    schedules = {j: [instance.on[j,i].value for i in range(1, H+1)] for j in instance.Generators}
+    if any(x is None for on in schedules.values() for x in on):
+        return None
+    return schedules
+
+
+def build_warm_start(instance, solver, schedules):
+    """
+    Load a feasible incumbent of the day set in instance from the commitment of the previous day
+    (schedules, {unit: on values of hours 1..H}, see previous_commitment):
+    1. each unit's schedule is repaired to the min up/down windows from the new ini_on (see heuristic.round_commitment);
+    2. on and switch are fixed to it and the LP of the day is solved for mwh and the other dispatch variables.
+    The incumbent is left loaded in instance and on and switch are binary and free again.
+    Returns True if the fixed LP is feasible, otherwise False (the previous day's commitment cannot
+    serve the new demand, reserves or line limits and the day is solved without a warm start).
+    """
+    repaired = {j: round_commitment(on, pyo.value(instance.ini_on[j]), pyo.value(instance.minup[j]), pyo.value(instance.mindn[j]))
+                for j, on in schedules.items()}
+    relax_commitment(instance)
+    fix_commitment(instance, repaired)
+    result = solver.solve(instance, load_solutions=False)
+    feasible = pyo.check_optimal_termination(result)
+    if feasible:
+        instance.solutions.load_from(result)
+    free_commitment(instance)
+    relax_commitment(instance, relax=False)
+    return feasible
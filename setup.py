@@ -19,6 +19,7 @@ setuptools.setup(
         "License :: OSI Approved :: MIT License",
         "Operating System :: OS Independent",
     ],
-    python_requires='>=3.6',
-    install_requires=['pyomo', 'pandas'],
+    python_requires='>=3.9', #tracemalloc.reset_peak (profiling)
+    install_requires=['pyomo', 'pandas', 'numpy', 'scipy'],
+    extras_require={'test': ['pytest', 'highspy']}, #the tests solve with appsi_highs
 )
\ No newline at end of file